@@ -0,0 +1,71 @@
+"""
+Benchmark of the sustained throughput of the DataProcessingThread.
+
+Feeds synthetic IMU lines (counter/acc/gyro/angle/temp, same as the real ADCS sends them) into the processing thread
+and reports how many lines per second it manages to parse and store.
+
+Run from the `src` directory:
+    python -m benchmarks.data_processing_benchmark
+"""
+import argparse
+import time
+
+from PyQt6.QtCore import QCoreApplication
+
+from core.DataProcessingThread import DataProcessingThread
+
+
+def generate_packet_lines(packet_number: int) -> list[str]:
+    value = packet_number % 360
+    return [
+        f"counter {packet_number}",
+        f"acc({value * 0.01:.4f},{-value * 0.02:.4f},9.8100)",
+        f"gyro({value * 0.1:.4f},{value * 0.2:.4f},{value * 0.3:.4f})",
+        f"angle({value:.4f},{-value:.4f},{value * 0.5:.4f})",
+        f"temp {20 + value * 0.01:.2f}",
+    ]
+
+
+def run_benchmark(duration_s: float, chunk_size: int, max_batch_size: int, max_latency_ms: float):
+    thread = DataProcessingThread(max_batch_size, max_latency_ms)
+    thread.start()
+
+    packet_number = 0
+    lines_added = 0
+    start = time.perf_counter()
+    while time.perf_counter() - start < duration_s:
+        chunk = []
+        while len(chunk) < chunk_size:
+            chunk.extend(generate_packet_lines(packet_number))
+            packet_number += 1
+
+        thread.add_lines(chunk)
+        lines_added += len(chunk)
+
+        # don't let the producer run away from the consumer, the benchmark measures the consumer
+        while thread.queue_depth > 10 * max_batch_size:
+            time.sleep(0.001)
+
+    while thread.queue_depth:
+        time.sleep(0.001)
+    elapsed = time.perf_counter() - start
+    thread.stop()
+
+    print(f"chunk size: {chunk_size}, max batch size: {max_batch_size}, max latency: {max_latency_ms}ms")
+    print(f"lines processed: {thread.total_lines_processed} / {lines_added} in {elapsed:.2f}s")
+    print(f"sustained throughput: {thread.total_lines_processed / elapsed:,.0f} lines/s")
+    print(f"batches: {thread.total_batches_processed}, "
+          f"average batch size: {thread.total_lines_processed / max(thread.total_batches_processed, 1):.1f}")
+    print(f"last batch lag: {thread.last_batch_lag_ms:.2f}ms, max batch lag: {thread.max_batch_lag_ms:.2f}ms")
+
+
+if __name__ == '__main__':
+    arg_parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    arg_parser.add_argument("--duration", type=float, default=5, help="benchmark duration in seconds")
+    arg_parser.add_argument("--chunk-size", type=int, default=50, help="number of lines added at once")
+    arg_parser.add_argument("--max-batch-size", type=int, default=1024)
+    arg_parser.add_argument("--max-latency-ms", type=float, default=5)
+    args = arg_parser.parse_args()
+
+    app = QCoreApplication([])
+    run_benchmark(args.duration, args.chunk_size, args.max_batch_size, args.max_latency_ms)
@@ -0,0 +1,84 @@
+"""
+Benchmark of the LineFramer on synthetic 1 MB bursts of IMU lines.
+
+The burst is fed to the framer in chunks of different sizes (QSerialPort.readAll returns whatever arrived since the
+last readyRead, so the chunk size depends on the link and the event loop load). The previous implementation, which
+split the whole accumulated buffer on every read, is measured as a reference.
+
+Run from the `src` directory:
+    python -m benchmarks.line_framer_benchmark
+"""
+import argparse
+import time
+
+from benchmarks.data_processing_benchmark import generate_packet_lines
+from core.LineFramer import LineFramer
+
+# a read usually gets one packet (~110 B with the simulator at 100 Hz), the bigger ones are bursts after a stall
+CHUNK_SIZES = [64, 128, 512, 4096, 65536]
+
+
+def generate_burst(size_bytes: int) -> bytes:
+    lines = []
+    length = 0
+    packet_number = 0
+    while length < size_bytes:
+        for line in generate_packet_lines(packet_number):
+            lines.append(line)
+            length += len(line) + 2
+        packet_number += 1
+    return ("\r\n".join(lines) + "\r\n").encode()
+
+
+def split_chunks(data: bytes, chunk_size: int) -> list[bytes]:
+    return [data[i:i + chunk_size] for i in range(0, len(data), chunk_size)]
+
+
+def frame_with_line_framer(chunks: list[bytes]) -> int:
+    framer = LineFramer()
+    num_of_lines = 0
+    for chunk in chunks:
+        num_of_lines += len(framer.feed(chunk))
+    return num_of_lines
+
+
+def frame_with_split(chunks: list[bytes]) -> int:
+    # the implementation SerialManager.reader used before the LineFramer
+    data = bytearray()
+    num_of_lines = 0
+    for chunk in chunks:
+        data += chunk
+        lines = data.split(b"\n")
+        for line_bytes in lines[:-1]:
+            line_bytes.decode().strip()
+            num_of_lines += 1
+        data = lines[-1]
+    return num_of_lines
+
+
+def measure(frame, chunks: list[bytes], repeats: int) -> tuple[float, int]:
+    best = float("inf")
+    num_of_lines = 0
+    for _ in range(repeats):
+        start = time.perf_counter()
+        num_of_lines = frame(chunks)
+        best = min(best, time.perf_counter() - start)
+    return best, num_of_lines
+
+
+if __name__ == '__main__':
+    arg_parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    arg_parser.add_argument("--burst-size", type=int, default=1_000_000, help="burst size in bytes")
+    arg_parser.add_argument("--repeats", type=int, default=5)
+    args = arg_parser.parse_args()
+
+    burst = generate_burst(args.burst_size)
+    size_mb = len(burst) / 1E6
+    print(f"burst: {size_mb:.2f} MB")
+
+    for chunk_size in CHUNK_SIZES:
+        chunks = split_chunks(burst, chunk_size)
+        for name, frame in (("LineFramer", frame_with_line_framer), ("split", frame_with_split)):
+            elapsed, num_of_lines = measure(frame, chunks, args.repeats)
+            print(f"chunk {chunk_size:>6} B  {name:<10}  {elapsed * 1000:8.1f} ms  "
+                  f"{size_mb / elapsed:7.1f} MB/s  {num_of_lines / elapsed:12,.0f} lines/s")
@@ -0,0 +1,61 @@
+"""
+Microbenchmark of the SerialDataParser.
+
+Parses batches of synthetic IMU lines with the table driven batch parser and with the previous line by line parser
+(startswith chain + extract_numbers + one store call per line) as a reference.
+
+Run from the `src` directory:
+    python -m benchmarks.parser_benchmark
+"""
+import argparse
+import time
+
+from benchmarks.data_processing_benchmark import generate_packet_lines
+from core.SerialDataParser import SerialDataParser, extract_numbers
+
+BATCH_SIZES = [5, 50, 500, 5000]
+
+
+def process_line_by_line(store, lines: list[str]):
+    # the implementation SerialDataParser.process_line used before the dispatch table
+    for line in lines:
+        if line.startswith("counter"):
+            store.add_packet_number(int(line[8:]))
+        elif line.startswith("acc"):
+            store.add_IMU_acceleration_datapoint(*extract_numbers(line))
+        elif line.startswith("gyro"):
+            store.add_IMU_gyroscope_datapoint(*extract_numbers(line))
+        elif line.startswith("angle"):
+            store.add_IMU_angle_datapoint(*extract_numbers(line))
+        elif line.startswith("temp"):
+            store.add_IMU_temperature_datapoint(float(line[5:]))
+
+
+def measure(process, batches: list[list[str]]) -> float:
+    start = time.perf_counter()
+    for batch in batches:
+        process(batch)
+    return time.perf_counter() - start
+
+
+if __name__ == '__main__':
+    arg_parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    arg_parser.add_argument("--lines", type=int, default=100_000, help="total number of lines parsed per run")
+    args = arg_parser.parse_args()
+
+    parser = SerialDataParser()
+    lines = []
+    packet_number = 0
+    while len(lines) < args.lines:
+        lines.extend(generate_packet_lines(packet_number))
+        packet_number += 1
+
+    for batch_size in BATCH_SIZES:
+        batches = [lines[i:i + batch_size] for i in range(0, len(lines), batch_size)]
+        for name, process in (
+                ("batch", parser.process_lines),
+                ("line by line", lambda batch: process_line_by_line(parser.store, batch)),
+        ):
+            elapsed = measure(process, batches)
+            print(f"batch size {batch_size:>5}  {name:<12}  {elapsed * 1000:8.1f} ms  "
+                  f"{len(lines) / elapsed:12,.0f} lines/s")
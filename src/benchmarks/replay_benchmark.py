@@ -0,0 +1,118 @@
+"""
+Throughput benchmark of the whole parse -> store -> plot pipeline, without any hardware.
+
+Replays a session as fast as possible through SerialManager.feed_data with the main window open on the raw data
+graphs tab, and reports how many lines per second went through the pipeline and how many frames were rendered.
+Without a session file a synthetic one is generated.
+
+Run from the `src` directory:
+    python -m benchmarks.replay_benchmark [--session recordings/<date>/raw_session.bin]
+"""
+import argparse
+import time
+
+import numpy as np
+from PyQt6.QtCore import QTimer
+from PyQt6.QtWidgets import QApplication
+
+from benchmarks.data_processing_benchmark import generate_packet_lines
+from core.BinaryFrameDecoder import encode_frame
+from core.LatencyTracker import LatencyTracker
+from core.RawSession import RawSession, RECORD_DATA, RECORD_BINARY_MODE
+from core.RenderScheduler import RenderScheduler
+from core.SerialManager import SerialManager
+from core.SessionReplayer import SessionReplayer, AS_FAST_AS_POSSIBLE
+from stores.GlobalStore import State
+
+# the IMU sends a packet every 50ms, the records are grouped like reads from the port would be
+PACKETS_PER_RECORD = 4
+
+
+def generate_session(num_of_packets: int, is_binary: bool) -> RawSession:
+    timestamps = []
+    kinds = []
+    data = []
+
+    if is_binary:
+        timestamps.append(0.0)
+        kinds.append(RECORD_BINARY_MODE)
+        data.append(b"")
+
+    sequence = 0
+    for first_packet in range(0, num_of_packets, PACKETS_PER_RECORD):
+        record = []
+        for packet_number in range(first_packet, first_packet + PACKETS_PER_RECORD):
+            for line in generate_packet_lines(packet_number):
+                if is_binary:
+                    prefix, _, values = line.replace("(", " ").rstrip(")").partition(" ")
+                    record.append(encode_frame(prefix, [float(x) for x in values.split(",")], sequence))
+                    sequence += 1
+                else:
+                    record.append((line + "\r\n").encode())
+
+        timestamps.append(first_packet * 0.05)
+        kinds.append(RECORD_DATA)
+        data.append(b"".join(record))
+
+    return RawSession(np.array(timestamps), kinds, data)
+
+
+def run_benchmark(session: RawSession, app: QApplication):
+    from main import MainWindow
+
+    window = MainWindow()
+    window.tabs.select_tab("RawDataGraphsTab")
+
+    serial_manager = SerialManager.get_instance()
+    processing_thread = serial_manager.data_processing_thread
+    render_scheduler = RenderScheduler.get_instance()
+
+    replayer = SessionReplayer(session, AS_FAST_AS_POSSIBLE)
+    stored_samples = [0]
+    State.get_instance().add_stream_listener(
+        lambda name, timestamps, values: stored_samples.__setitem__(0, stored_samples[0] + len(timestamps))
+    )
+    frames = []
+    render_scheduler.achieved_fps.add_callback(frames.append)
+
+    start = time.perf_counter()
+
+    def wait_for_processing():
+        if processing_thread.queue_depth:
+            QTimer.singleShot(1, wait_for_processing)
+            return
+        app.quit()
+
+    replayer.is_finished.add_callback(lambda is_finished: is_finished and wait_for_processing())
+    replayer.play()
+    app.exec()
+    elapsed = time.perf_counter() - start
+
+    print(f"session: {len(session)} records, {session.size_bytes / 1E6:.2f} MB, {session.duration:.1f}s of data")
+    print(f"replayed in {elapsed:.2f}s ({session.duration / elapsed:.1f}x real time)")
+    print(f"throughput: {session.size_bytes / elapsed / 1E6:.2f} MB/s, {stored_samples[0] / elapsed:,.0f} stored samples/s")
+    if frames:
+        print(f"graphs FPS during the replay: {sum(frames) / len(frames):.1f} average, {min(frames)} min")
+
+    print("latency since the data was read, p50 / p95 / p99 / max:")
+    for stage, summary in LatencyTracker.get_instance().summary().items():
+        print(f"  {stage:>8}: {summary['p50_ms']:.2f} / {summary['p95_ms']:.2f} / {summary['p99_ms']:.2f} / "
+              f"{summary['max_ms']:.2f}ms")
+
+    processing_thread.stop()
+
+
+if __name__ == '__main__':
+    arg_parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    arg_parser.add_argument("--session", help="a recorded raw session or a text file with lines")
+    arg_parser.add_argument("--packets", type=int, default=20_000, help="packets in the generated session")
+    arg_parser.add_argument("--binary", action="store_true", help="generate a binary telemetry session")
+    args = arg_parser.parse_args()
+
+    app = QApplication([])
+    if args.session:
+        replay_session = RawSession.load(args.session)
+    else:
+        replay_session = generate_session(args.packets, args.binary)
+
+    run_benchmark(replay_session, app)
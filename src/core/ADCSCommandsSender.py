@@ -1,33 +1,123 @@
 import logging
+from typing import Hashable, Optional
 
+from .CommandAckTracker import CommandAckTracker
+from .CommandScheduler import CommandScheduler, OnSent
+from .SerialConnection import SerialConnection
 from .SingletonMeta import Singelton
-from .SerialManager import SerialManager
+from stores.GlobalStore import State
 
 log = logging.getLogger()
 
+# how often the queued commands are written, the CommandScheduler limits how many of them
+COMMAND_PUMP_INTERVAL_MS = 10
+
 
 @Singelton
 class ADCSCommandsSender:
-    def __init__(self):
-        self.serial_manager = SerialManager.get_instance()
+    """
+    The commands of one ADCS, the shared instance belongs to the default Session, see core.Session
+
+    :param serial_manager: the connection the commands are written to, the shared SerialManager if None
+    :param state: the State the sent motor speeds are published to, the shared one if None
+    :param has_command_timer: pump the commands with a QTimer, without it the owner has to call pump_commands
+        periodically (e.g. the headless mode from its asyncio loop)
+    """
+
+    def __init__(self, serial_manager: Optional[SerialConnection] = None, state=None, has_command_timer: bool = True):
+        if serial_manager is None:
+            # imported here so that the sender can be used without Qt
+            from .SerialManager import SerialManager
+            serial_manager = SerialManager.get_instance()
+
+        self.serial_manager = serial_manager
+        self.state = state if state is not None else State.get_instance()
+
+        # the commands are queued and written on the GUI thread by the timer, the setpoints (motor speeds, stepper
+        # positions) are coalesced, only the latest one is sent
+        self.command_scheduler = CommandScheduler(self._write_command)
+        # optional, the firmware has to acknowledge the tagged commands, see set_ack_tracking
+        self.ack_tracker = CommandAckTracker(self.serial_manager.write_data, self._submit_retry)
+        self.is_ack_tracking_enabled = False
+
+        self.command_timer = None
+        if has_command_timer:
+            from PyQt6.QtCore import QTimer
+
+            self.command_timer = QTimer()
+            self.command_timer.setInterval(COMMAND_PUMP_INTERVAL_MS)
+            self.command_timer.timeout.connect(self.pump_commands)
+            self.command_timer.start()
 
         # TODO: info for motor pwn, should be moved to some settings
         self.pwn_prescale = 0
         self.period = 50_000
 
+    def stop(self):
+        if self.command_timer is not None:
+            self.command_timer.stop()
+        self.command_scheduler.clear()
+        self.ack_tracker.clear()
+
+    def flush_commands(self):
+        """
+        Writes all the queued commands at once, e.g. the commands that stop the motors before the port is closed
+        """
+        if self.serial_manager.is_port_open():
+            self.command_scheduler.flush()
+
+    def pump_commands(self):
+        if not self.serial_manager.is_port_open():
+            # the commands were meant for the connection that was closed
+            if self.command_scheduler.queue_depth:
+                self.command_scheduler.clear()
+            self.ack_tracker.clear()
+            return
+
+        # the retries are queued like the other commands
+        if self.is_ack_tracking_enabled:
+            self.ack_tracker.check_timeouts()
+        # a congested link gets no more data, the commands wait in the queue and the setpoints are coalesced there
+        if self.serial_manager.is_writable():
+            self.command_scheduler.pump()
+
+    def set_ack_tracking(self, is_enabled: bool):
+        """
+        Sends the commands tagged with sequence numbers and measures the time until the ADCS acknowledges them,
+        see CommandAckTracker. The firmware has to support the tags.
+        """
+        if is_enabled == self.is_ack_tracking_enabled:
+            return
+
+        self.is_ack_tracking_enabled = is_enabled
+        if is_enabled:
+            self.serial_manager.add_listener(self.ack_tracker)
+        else:
+            self.serial_manager.remove_listener(self.ack_tracker)
+            self.ack_tracker.clear()
+
+    def _submit_retry(self, command: str, coalesce_key: Optional[Hashable], on_sent: Optional[OnSent]) -> bool:
+        # a newer setpoint that is already queued supersedes the retry
+        return self.command_scheduler.submit(command, coalesce_key, on_sent, is_superseded_by_queued=True)
+
+    def _write_command(self, command: str, coalesce_key: Optional[Hashable]) -> bool:
+        if self.is_ack_tracking_enabled:
+            return self.ack_tracker.send(command, coalesce_key)
+        return self.serial_manager.write_data(command)
+
     def imu_start_reading(self):
         if not self.serial_manager.is_port_open():
             log.debug("Can send command, now serial opet is open")
             return False
 
-        self.serial_manager.write_data("imu start")
+        return self._send("imu start", "imu")
 
     def imu_stop_reading(self):
         if not self.serial_manager.is_port_open():
             log.debug("Can send command, now serial opet is open")
             return False
 
-        self.serial_manager.write_data("imu stop")
+        return self._send("imu stop", "imu")
 
     def set_stepper(self, stepper_index: int, move_amount: float):
         if not self.serial_manager.is_port_open():
@@ -40,7 +130,7 @@ class ADCSCommandsSender:
         if move_amount < 0 or move_amount > 100:
             raise f"move_ammount {move_amount} is not an allowed value, should be a value between [0, 100]"
 
-        self.serial_manager.write_data(f"stepper {stepper_index} move {move_amount}")
+        return self._send(f"stepper {stepper_index} move {move_amount}", ("stepper", stepper_index))
 
     def set_motor_speed(self, dc_motor_index: int, speed_percentage: float):
         if not self.serial_manager.is_port_open():
@@ -63,7 +153,8 @@ class ADCSCommandsSender:
           - `period [n]` - set period to [n] [0 <= n <= 65535]
           - `prescale [n]` - set prescale to [n] [1 <= n <= 65535]
           """
-        self.serial_manager.write_data(f"pwm duty {dc_motor_index} {self.period * speed_percentage}")
+        return self._send(f"pwm duty {dc_motor_index} {self.period * speed_percentage}", ("pwm", dc_motor_index),
+                          self._create_on_motor_speed_sent(dc_motor_index, speed_percentage * 100))
 
     def stop_motor(self, dc_motor_index: int):
         if not self.serial_manager.is_port_open():
@@ -73,4 +164,46 @@ class ADCSCommandsSender:
         if dc_motor_index < 0 or dc_motor_index > 2:
             raise "DC motor index out of bounds"
 
-        self.serial_manager.write_data(f"pwm duty {dc_motor_index} 0")
+        return self._send(f"pwm duty {dc_motor_index} 0", ("pwm", dc_motor_index),
+                          self._create_on_motor_speed_sent(dc_motor_index, 0))
+
+    def _create_on_motor_speed_sent(self, dc_motor_index: int, speed_percentage: float) -> OnSent:
+        # the speed is published when it's written, not when it's queued, it can still be coalesced until then
+        def on_sent(is_data_written: bool):
+            if is_data_written:
+                self.state.add_motor_speed(dc_motor_index, speed_percentage)
+
+        return on_sent
+
+    def set_telemetry_mode(self, is_binary_mode: bool):
+        """
+        `telemetry [text|binary]`
+        Switches the IMU data the ADCS sends between text lines and binary frames (see BinaryFrameDecoder).
+        The binary frames are about four times smaller, so the IMU rate can be raised over the same link.
+        """
+        if not self.serial_manager.is_port_open():
+            log.debug("Can send command, now serial opet is open")
+            return False
+
+        def on_sent(is_data_written: bool):
+            if is_data_written:
+                self.serial_manager.set_binary_mode(is_binary_mode)
+
+        return self._send(f"telemetry {'binary' if is_binary_mode else 'text'}", "telemetry", on_sent)
+
+    def send_command(self, command: str):
+        """
+        Sends a command typed by the user, it's never coalesced
+        """
+        if not self.serial_manager.is_port_open():
+            log.debug("Can send command, now serial opet is open")
+            return False
+
+        return self._send(command)
+
+    def _send(self, command: str, coalesce_key: Optional[Hashable] = None, on_sent: Optional[OnSent] = None) -> bool:
+        """
+        Queues the command, see CommandScheduler
+        @return: False if the command was dropped
+        """
+        return self.command_scheduler.submit(command, coalesce_key, on_sent)
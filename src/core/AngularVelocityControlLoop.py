@@ -0,0 +1,195 @@
+import logging
+import threading
+import time
+from typing import Optional
+
+from core.ADCSCommandsSender import ADCSCommandsSender
+from core.LatencyTracker import LatencyHistogram
+from core.PID import PID
+from stores.GlobalStore import State, axes, MIN_ANGULAR_VELOCITY, MAX_ANGULAR_VELOCITY
+
+log = logging.getLogger()
+
+DEFAULT_PERIOD_S = 0.05
+# the last part of the wait for the deadline is spent spinning, sleep can wake up a few ms late
+SPIN_S = 0.001
+# the motors are stopped when the newest gyro sample is older than this
+MAX_SAMPLE_AGE_S = 0.5
+# a new speed is sent only when it differs from the last one by more than this (percent)
+MIN_OUTPUT_CHANGE = 0.1
+
+# a reaction wheel turns the body the other way than it spins itself
+REACTION_WHEEL_DIRECTION = -1
+
+
+class AngularVelocityControlLoop:
+    """
+    Host side closed loop control of the angular velocity.
+
+    Runs on its own thread with a fixed period. Every period it checks the newest gyro sample in the store, if it's a
+    new one it computes the PID output of each axis against its `angular_velocity_control` setpoint and sends the
+    motor speeds through ADCSCommandsSender (the commands are coalesced, so a slow link only gets the latest speeds).
+    The PID dt is the time between the gyro samples, not the period of the loop, so a loop faster than the gyro
+    doesn't integrate the same error again. The gains are read
+    from the `angular_velocity_control` PID parameters every period, so they can be changed while it's running.
+
+    The periods are scheduled on absolute deadlines, so the loop doesn't drift. An iteration that ends after the next
+    deadline is a deadline miss and the missed periods are skipped. The wake up jitter (how late the loop wakes up
+    after the deadline) and the compute time of each iteration are kept in histograms.
+
+    An iteration that raises stops the loop and the motors, the exception is kept in `error`.
+
+    :param period_s: the period of the loop in seconds
+    :param state: the State of the controlled ADCS, the shared one if None
+    :param commands_sender: the ADCSCommandsSender of the controlled ADCS, the shared one if None
+    """
+
+    def __init__(self, period_s: float = DEFAULT_PERIOD_S, state=None, commands_sender=None):
+        self.period_s = period_s
+        self.state = state if state is not None else State.get_instance()
+        self.commands_sender = commands_sender if commands_sender is not None else ADCSCommandsSender.get_instance()
+
+        self.controllers = {
+            axis: PID(output_min=MIN_ANGULAR_VELOCITY, output_max=MAX_ANGULAR_VELOCITY) for axis in axes
+        }
+        self._last_outputs: dict[str, Optional[float]] = {axis: None for axis in axes}
+        # the timestamp of the gyro sample the PID was last updated with
+        self._last_sample_timestamp: Optional[float] = None
+
+        self._thread: Optional[threading.Thread] = None
+        self._stop_event = threading.Event()
+
+        self.iterations = 0
+        self.deadline_misses = 0
+        self.stale_samples = 0
+        self.error: Optional[Exception] = None
+        self.jitter = LatencyHistogram()
+        self.compute_time = LatencyHistogram()
+
+    @property
+    def is_running(self) -> bool:
+        return self._thread is not None
+
+    def set_period(self, period_s: float):
+        # read by the loop thread at the next deadline
+        self.period_s = period_s
+
+    def start(self):
+        if self.is_running:
+            return
+
+        for controller in self.controllers.values():
+            controller.reset()
+        self._last_outputs = {axis: None for axis in axes}
+        self._last_sample_timestamp = None
+        self.iterations = 0
+        self.deadline_misses = 0
+        self.stale_samples = 0
+        self.error = None
+        self.jitter.reset()
+        self.compute_time.reset()
+
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, name="AngularVelocityControlLoop", daemon=True)
+        self._thread.start()
+        log.info(f"Angular velocity control loop started, period {self.period_s * 1000:.0f}ms")
+
+    def stop(self):
+        # the thread clears it itself when an iteration fails
+        thread = self._thread
+        if thread is None:
+            return
+
+        self._stop_event.set()
+        thread.join()
+        self._thread = None
+
+        self._stop_motors()
+        log.info(f"Angular velocity control loop stopped, {self.deadline_misses} deadline misses "
+                 f"in {self.iterations} iterations")
+
+    def _stop_motors(self):
+        for axis_index in range(len(axes)):
+            self.commands_sender.stop_motor(axis_index)
+
+    def _run(self):
+        deadline = time.perf_counter() + self.period_s
+
+        while not self._stop_event.is_set():
+            self._wait_until(deadline)
+            if self._stop_event.is_set():
+                break
+
+            start = time.perf_counter()
+            self.jitter.add(start - deadline)
+
+            try:
+                self.control()
+            except Exception as e:
+                log.exception("Angular velocity control loop failed, stopping the motors")
+                self.error = e
+                self._stop_motors()
+                self._thread = None
+                return
+
+            end = time.perf_counter()
+            self.compute_time.add(end - start)
+            self.iterations += 1
+
+            deadline += self.period_s
+            if end > deadline:
+                missed_periods = int((end - deadline) / self.period_s) + 1
+                self.deadline_misses += missed_periods
+                deadline += missed_periods * self.period_s
+
+    def _wait_until(self, deadline: float):
+        remaining_s = deadline - time.perf_counter()
+        if remaining_s > SPIN_S:
+            # wakes up early when the loop is stopped
+            self._stop_event.wait(remaining_s - SPIN_S)
+        while time.perf_counter() < deadline and not self._stop_event.is_set():
+            pass
+
+    def control(self):
+        """
+        One iteration of the loop
+        """
+        gyroscope_data = self.state.IMU_gyroscope_data
+        last_sample = gyroscope_data.last()
+        last_sample = last_sample.copy() if last_sample is not None else None
+        last_timestamp = gyroscope_data.timestamps()[-1] if len(gyroscope_data) else None
+
+        if last_sample is None or time.time() - last_timestamp > MAX_SAMPLE_AGE_S:
+            # no fresh data, the loop can't see what the motors are doing
+            self.stale_samples += 1
+            self._last_sample_timestamp = None
+            for axis_index, axis in enumerate(axes):
+                self.controllers[axis].reset()
+                self._send_output(axis_index, axis, 0)
+            return
+
+        if self._last_sample_timestamp is not None and last_timestamp <= self._last_sample_timestamp:
+            # no new sample since the last update
+            return
+        # nothing to integrate over for the first sample, it only sets the proportional part
+        dt = last_timestamp - self._last_sample_timestamp if self._last_sample_timestamp is not None else 0
+        self._last_sample_timestamp = last_timestamp
+
+        pid_parameters = self.state.dc_motor_values.angular_velocity_control["PIDParams"]
+        setpoints = self.state.dc_motor_values.angular_velocity_control["values"]
+        kp, ki, kd = float(pid_parameters.P.get()), float(pid_parameters.I.get()), float(pid_parameters.D.get())
+
+        for axis_index, axis in enumerate(axes):
+            controller = self.controllers[axis]
+            controller.set_gains(kp, ki, kd)
+            output = controller.update(float(getattr(setpoints, axis).get()), float(last_sample[axis_index]), dt)
+            self._send_output(axis_index, axis, REACTION_WHEEL_DIRECTION * output)
+
+    def _send_output(self, axis_index: int, axis: str, output: float):
+        last_output = self._last_outputs[axis]
+        if last_output is not None and abs(output - last_output) < MIN_OUTPUT_CHANGE:
+            return
+
+        # a speed that wasn't queued (e.g. the port is closed) is sent again the next period
+        if self.commands_sender.set_motor_speed(axis_index, round(output, 2)):
+            self._last_outputs[axis] = output
@@ -0,0 +1,387 @@
+import logging
+import threading
+import time
+from typing import Optional
+
+import numpy as np
+
+from core.ADCSCommandsSender import ADCSCommandsSender
+from core.AngularVelocityControlLoop import REACTION_WHEEL_DIRECTION
+from core.TelemetryRecorder import RecordingReader
+from stores.GlobalStore import State, PIDParametersData
+
+log = logging.getLogger()
+
+# the longest dead time that is tried when fitting the model
+DEFAULT_MAX_DEAD_TIME_S = 2.0
+# the data fitted around the biggest step of the input, the flat parts far from it only add noise to the fit
+DEFAULT_STEP_WINDOW_BEFORE_S = 1.0
+DEFAULT_STEP_WINDOW_AFTER_S = 10.0
+# the iterations of the instrumental variables refinement of the fit
+INSTRUMENTAL_VARIABLES_ITERATIONS = 3
+
+TUNING_SIMC = "SIMC"
+TUNING_ZIEGLER_NICHOLS = "Ziegler-Nichols"
+TUNING_RULES = (TUNING_SIMC, TUNING_ZIEGLER_NICHOLS)
+
+
+class FOPDTModel:
+    """
+    First order plus dead time model of the response of the angular velocity to the motor speed:
+    tau * dy/dt = -y + gain * u(t - dead_time) + offset
+
+    :param gain: deg/s per percent of the motor speed
+    :param time_constant: seconds
+    :param dead_time: seconds
+    :param rmse: the root mean square error of the one step ahead prediction of the fit, deg/s
+    """
+
+    def __init__(self, gain: float, time_constant: float, dead_time: float, offset: float, rmse: float):
+        self.gain = gain
+        self.time_constant = time_constant
+        self.dead_time = dead_time
+        self.offset = offset
+        self.rmse = rmse
+
+    def __str__(self):
+        return (f"K = {self.gain:.3f} deg/s/%, tau = {self.time_constant:.3f}s, theta = {self.dead_time:.3f}s, "
+                f"rmse = {self.rmse:.3f} deg/s")
+
+
+class PIDGains:
+    def __init__(self, P: float, I: float, D: float):
+        self.P = P
+        self.I = I
+        self.D = D
+
+    def __str__(self):
+        return f"P = {self.P:.4f}, I = {self.I:.4f}, D = {self.D:.4f}"
+
+    def apply(self, pid_parameters: PIDParametersData):
+        pid_parameters.P.set(round(self.P, 4))
+        pid_parameters.I.set(round(self.I, 4))
+        pid_parameters.D.set(round(self.D, 4))
+
+
+def resample(timestamps: np.ndarray, values: np.ndarray, grid: np.ndarray, zero_order_hold: bool = False) -> np.ndarray:
+    """
+    @param zero_order_hold: hold the last value (for the commanded inputs) instead of interpolating linearly
+    """
+    if zero_order_hold:
+        indices = np.clip(np.searchsorted(timestamps, grid, side="right") - 1, 0, len(values) - 1)
+        return values[indices]
+    return np.interp(grid, timestamps, values)
+
+
+def find_step_window(input_timestamps: np.ndarray, inputs: np.ndarray,
+                     before_s: float = DEFAULT_STEP_WINDOW_BEFORE_S,
+                     after_s: float = DEFAULT_STEP_WINDOW_AFTER_S) -> Optional[tuple[float, float]]:
+    """
+    @return: the time range around the biggest change of the input, None if the input never changes
+    """
+    if len(inputs) < 2:
+        return None
+
+    changes = np.abs(np.diff(inputs))
+    if not changes.any():
+        return None
+
+    step_time = float(input_timestamps[int(np.argmax(changes)) + 1])
+    return step_time - before_s, step_time + after_s
+
+
+def _simulate(a: float, b: float, c: float, first_output: float, delayed_inputs: np.ndarray) -> np.ndarray:
+    """
+    @return: the outputs of y[k + 1] = a * y[k] + b * u[k - d] + c, without the last one
+    """
+    outputs = np.empty(len(delayed_inputs))
+    output = first_output
+    for k, forcing in enumerate((b * delayed_inputs + c).tolist()):
+        outputs[k] = output
+        output = a * output + forcing
+    return outputs
+
+
+def fit_fopdt(input_timestamps: np.ndarray, inputs: np.ndarray, output_timestamps: np.ndarray, outputs: np.ndarray,
+              max_dead_time_s: float = DEFAULT_MAX_DEAD_TIME_S) -> FOPDTModel:
+    """
+    Fits a FOPDT model to a response, e.g. of a step of the motor speed.
+
+    The signals are resampled to the sample interval of the output and the discrete model
+    y[k + 1] = a * y[k] + b * u[k - d] + c is fitted with least squares for every candidate dead time d (one 3x3
+    normal equation per candidate, so the memory doesn't grow with the dead time), the dead time with the smallest
+    error wins. The noise of y[k] on the right side biases the least squares towards a too short time constant,
+    so the parameters are refined with instrumental variables: y[k] is replaced by the noise free output of the
+    model simulated from the previous estimate.
+
+    Use it on the data around a step (see find_step_window), a long flat part adds only noise.
+
+    @param input_timestamps: the times the inputs (motor speeds in percent) were set, in seconds
+    @param inputs: the inputs, each is held until the next one
+    @param output_timestamps: the times of the outputs (angular velocity in deg/s), in seconds
+    @param outputs: the outputs
+    @raise ValueError: if there isn't enough data or the response can't be described by a stable FOPDT model
+    """
+    if len(outputs) < 10 or len(inputs) == 0:
+        raise ValueError("not enough data to fit the model")
+
+    # the samples of one block share the timestamp they were stored at, they're averaged into one
+    output_timestamps, indices = np.unique(output_timestamps, return_inverse=True)
+    outputs = np.bincount(indices, weights=outputs) / np.bincount(indices)
+    if len(output_timestamps) < 10:
+        raise ValueError("not enough data to fit the model")
+
+    dt = float(np.median(np.diff(output_timestamps)))
+
+    grid = np.arange(output_timestamps[0], output_timestamps[-1], dt)
+    y = resample(output_timestamps, outputs, grid)
+    u = resample(input_timestamps, inputs, grid, zero_order_hold=True)
+    if np.ptp(u) == 0:
+        raise ValueError("the input doesn't change, there's no response to fit")
+
+    max_delay = min(int(max_dead_time_s / dt), len(grid) // 3)
+    num_of_samples = len(grid) - 1
+    previous_outputs = y[:-1]
+    targets = y[1:]
+
+    def delayed(delay: int) -> np.ndarray:
+        # u[k - d], the input before the first sample is taken to be the first input, so every delay is fitted to
+        # the same samples
+        return np.concatenate((np.full(delay, u[0]), u[:num_of_samples - delay]))
+
+    # the parts of the normal equations that don't depend on the delay
+    sum_y = previous_outputs.sum()
+    sum_yy = previous_outputs @ previous_outputs
+    sum_target = targets.sum()
+    sum_y_target = previous_outputs @ targets
+
+    best_delay = 0
+    best_parameters = np.zeros(3)
+    best_sum_of_squared_errors = np.inf
+    for delay in range(max_delay + 1):
+        delayed_inputs = delayed(delay)
+        sum_u = delayed_inputs.sum()
+        normal_matrix = np.array([
+            [sum_yy, previous_outputs @ delayed_inputs, sum_y],
+            [previous_outputs @ delayed_inputs, delayed_inputs @ delayed_inputs, sum_u],
+            [sum_y, sum_u, num_of_samples],
+        ])
+        normal_vector = np.array([sum_y_target, delayed_inputs @ targets, sum_target])
+        # the pseudo inverse, the delays that shift the step out of the data have singular matrices, they just
+        # fit badly
+        parameters = np.linalg.pinv(normal_matrix) @ normal_vector
+
+        errors = targets - (parameters[0] * previous_outputs + parameters[1] * delayed_inputs + parameters[2])
+        sum_of_squared_errors = errors @ errors
+        if sum_of_squared_errors < best_sum_of_squared_errors:
+            best_delay, best_parameters, best_sum_of_squared_errors = delay, parameters, sum_of_squared_errors
+
+    def refine(delay: int, parameters: np.ndarray) -> np.ndarray:
+        delayed_inputs = delayed(delay)
+        regressors = np.column_stack((previous_outputs, delayed_inputs, np.ones(num_of_samples)))
+        for _ in range(INSTRUMENTAL_VARIABLES_ITERATIONS):
+            a, b, c = parameters
+            if not 0 < a < 1:
+                break
+            instruments = np.column_stack((_simulate(a, b, c, y[0], delayed_inputs), delayed_inputs,
+                                           np.ones(num_of_samples)))
+            try:
+                parameters = np.linalg.solve(instruments.T @ regressors, instruments.T @ targets)
+            except np.linalg.LinAlgError:
+                break
+        return parameters
+
+    parameters = refine(best_delay, best_parameters)
+    a = parameters[0]
+    if 0 < a < 1:
+        # the least squares error also picks the dead time a bit off, with the refined time constant the responses
+        # of all the dead times are the same filtered input, only shifted, so the dead time is picked again by how
+        # well the response (not the one step prediction) fits the outputs
+        response = _simulate(a, 1 - a, 0, u[0], u[:num_of_samples])
+        sum_of_squared_errors = []
+        for delay in range(max_delay + 1):
+            regressors = np.column_stack((np.concatenate((np.full(delay, response[0]),
+                                                          response[:num_of_samples - delay])),
+                                          np.ones(num_of_samples)))
+            _, residuals, _, _ = np.linalg.lstsq(regressors, previous_outputs, rcond=None)
+            sum_of_squared_errors.append(residuals[0] if len(residuals) else np.inf)
+        delay = int(np.argmin(sum_of_squared_errors))
+        if delay != best_delay:
+            best_delay = delay
+            parameters = refine(best_delay, parameters)
+
+    a, b, c = parameters
+    if not 0 < a < 1:
+        raise ValueError(f"the response isn't a stable first order response (a = {a:.3f})")
+
+    delayed_inputs = delayed(best_delay)
+    errors = targets - (a * previous_outputs + b * delayed_inputs + c)
+    return FOPDTModel(
+        gain=float(b / (1 - a)),
+        time_constant=float(-dt / np.log(a)),
+        dead_time=float(best_delay * dt),
+        offset=float(c / (1 - a)),
+        rmse=float(np.sqrt(errors @ errors / num_of_samples)),
+    )
+
+
+def compute_pid_gains(model: FOPDTModel, tuning_rule: str = TUNING_SIMC,
+                      closed_loop_time_constant: Optional[float] = None) -> PIDGains:
+    """
+    Computes the gains of the AngularVelocityControlLoop PID from the model
+
+    @param tuning_rule: TUNING_SIMC (a PI controller, Skogestad) or TUNING_ZIEGLER_NICHOLS (the open loop rules)
+    @param closed_loop_time_constant: the desired closed loop time constant of SIMC, the dead time by default
+        (the "tight" control), at least a tenth of the model time constant
+    """
+    # the control loop flips the sign of the output for the reaction wheels, this is the gain the PID sees
+    gain = model.gain * REACTION_WHEEL_DIRECTION
+    if gain <= 0:
+        raise ValueError("the angular velocity goes the other way than the motor speed, check the motor wiring")
+
+    tau = model.time_constant
+    theta = model.dead_time
+
+    if tuning_rule == TUNING_SIMC:
+        tau_c = closed_loop_time_constant if closed_loop_time_constant is not None else max(theta, tau / 10)
+        kp = tau / (gain * (tau_c + theta))
+        integral_time = min(tau, 4 * (tau_c + theta))
+        return PIDGains(kp, kp / integral_time, 0)
+
+    if tuning_rule == TUNING_ZIEGLER_NICHOLS:
+        if theta <= 0:
+            raise ValueError("Ziegler-Nichols needs a dead time, use SIMC")
+        kp = 1.2 * tau / (gain * theta)
+        return PIDGains(kp, kp / (2 * theta), kp * 0.5 * theta)
+
+    raise ValueError(f"unknown tuning rule: {tuning_rule}")
+
+
+class StepExperiment:
+    """
+    Step response experiment of one axis: the motor is held still for `baseline_s`, then runs at `step_percent`
+    for `step_s` and is stopped again. The motor speeds that were sent (the "motor" stream, see
+    State.add_motor_speed) and the gyro samples are recorded, so the fit is the same as for a recording.
+
+    Doesn't use Qt, the owner calls `update` periodically (e.g. from a QTimer) until `is_finished`.
+    The host control loop has to be stopped, it would fight the experiment.
+
+    :param axis_index: 0 for X, 1 for Y, 2 for Z
+    :param state: the State of the ADCS, the shared one if None
+    :param commands_sender: the ADCSCommandsSender of the ADCS, the shared one if None
+    """
+
+    def __init__(self, axis_index: int, step_percent: float, baseline_s: float = 1.0, step_s: float = 5.0,
+                 state=None, commands_sender=None):
+        self.axis_index = axis_index
+        self.step_percent = step_percent
+        self.baseline_s = baseline_s
+        self.step_s = step_s
+
+        self.state = state if state is not None else State.get_instance()
+        self.commands_sender = commands_sender if commands_sender is not None else ADCSCommandsSender.get_instance()
+
+        self._lock = threading.Lock()
+        self._blocks: dict[str, list[np.ndarray]] = {"motor": [], "gyro": []}
+
+        self._start_time: Optional[float] = None
+        self._is_step_sent = False
+        self.is_finished = False
+
+    @property
+    def progress(self) -> float:
+        if self._start_time is None:
+            return 0.0
+        return min((time.time() - self._start_time) / (self.baseline_s + self.step_s), 1.0)
+
+    def start(self):
+        self._start_time = time.time()
+        self.state.add_stream_listener(self._on_samples)
+        self.commands_sender.stop_motor(self.axis_index)
+        log.info(f"Step experiment of axis {self.axis_index} started, step {self.step_percent}%")
+
+    def update(self):
+        if self._start_time is None or self.is_finished:
+            return
+
+        elapsed_s = time.time() - self._start_time
+        if not self._is_step_sent and elapsed_s >= self.baseline_s:
+            self.commands_sender.set_motor_speed(self.axis_index, self.step_percent)
+            self._is_step_sent = True
+        elif elapsed_s >= self.baseline_s + self.step_s:
+            self.stop()
+
+    def stop(self):
+        self.commands_sender.stop_motor(self.axis_index)
+        self.state.remove_stream_listener(self._on_samples)
+        self.is_finished = True
+
+    def fit(self, max_dead_time_s: float = DEFAULT_MAX_DEAD_TIME_S) -> FOPDTModel:
+        with self._lock:
+            motor_speeds = np.concatenate(self._blocks["motor"]) if self._blocks["motor"] else np.zeros((0, 3))
+            gyroscope_data = np.concatenate(self._blocks["gyro"]) if self._blocks["gyro"] else np.zeros((0, 4))
+
+        return fit_streams(motor_speeds, gyroscope_data, self.axis_index, max_dead_time_s)
+
+    def _on_samples(self, name: str, timestamps: np.ndarray, values: np.ndarray):
+        # called on the processing thread for the gyro and on the GUI thread for the motor speeds
+        if name not in self._blocks:
+            return
+        with self._lock:
+            self._blocks[name].append(np.column_stack((timestamps, values)))
+
+
+def _axis_motor_speeds(motor_speeds: np.ndarray, axis_index: int) -> np.ndarray:
+    motor_speeds = motor_speeds[motor_speeds[:, 1] == axis_index]
+    if not len(motor_speeds):
+        raise ValueError("no motor speeds of the axis were sent")
+    return motor_speeds
+
+
+def _crop_inputs(motor_speeds: np.ndarray, start_time: float, end_time: float) -> np.ndarray:
+    # the last speed sent before the window is kept, it's the input at the start of the window
+    timestamps = motor_speeds[:, 0]
+    first = max(int(np.searchsorted(timestamps, start_time, "right")) - 1, 0)
+    return motor_speeds[first:np.searchsorted(timestamps, end_time, "right")]
+
+
+def fit_streams(motor_speeds: np.ndarray, gyroscope_data: np.ndarray, axis_index: int,
+                max_dead_time_s: float = DEFAULT_MAX_DEAD_TIME_S, is_step_windowed: bool = True) -> FOPDTModel:
+    """
+    @param motor_speeds: the "motor" stream, rows of timestamp, motor index, speed
+    @param gyroscope_data: the "gyro" stream, rows of timestamp, X, Y, Z
+    @param is_step_windowed: fit only the data around the biggest step of the motor speed (see find_step_window)
+    """
+    motor_speeds = _axis_motor_speeds(motor_speeds, axis_index)
+
+    window = find_step_window(motor_speeds[:, 0], motor_speeds[:, 2]) if is_step_windowed else None
+    if window is not None:
+        start_time, end_time = window
+        motor_speeds = _crop_inputs(motor_speeds, start_time, end_time)
+        gyroscope_timestamps = gyroscope_data[:, 0]
+        gyroscope_data = gyroscope_data[np.searchsorted(gyroscope_timestamps, start_time):
+                                        np.searchsorted(gyroscope_timestamps, end_time, "right")]
+
+    return fit_fopdt(motor_speeds[:, 0], motor_speeds[:, 2], gyroscope_data[:, 0], gyroscope_data[:, 1 + axis_index],
+                     max_dead_time_s)
+
+
+def fit_recording(recording: RecordingReader, axis_index: int, start_time: Optional[float] = None,
+                  end_time: Optional[float] = None, max_dead_time_s: float = DEFAULT_MAX_DEAD_TIME_S) -> FOPDTModel:
+    """
+    Fits the model offline to a recording made by the TelemetryRecorder, the recording has to contain the motor
+    speeds sent during it (the "motor" stream), e.g. a recording of a StepExperiment or of manual steps.
+
+    Without a time range only the data around the biggest step of the motor speed is fitted, and only that part of
+    the gyroscope data is loaded, so it doesn't matter how long the recording is. Blocks, takes up to a second.
+    """
+    motor_speeds = _axis_motor_speeds(recording.read("motor", start_time, end_time), axis_index)
+
+    if start_time is None and end_time is None:
+        window = find_step_window(motor_speeds[:, 0], motor_speeds[:, 2])
+        if window is not None:
+            start_time, end_time = window
+            motor_speeds = _crop_inputs(motor_speeds, start_time, end_time)
+
+    return fit_streams(motor_speeds, recording.read("gyro", start_time, end_time), axis_index, max_dead_time_s,
+                       is_step_windowed=False)
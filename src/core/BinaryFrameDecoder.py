@@ -0,0 +1,165 @@
+import binascii
+import struct
+import time
+from collections import defaultdict
+from typing import Optional
+
+import numpy as np
+
+from core.SerialDataParser import MESSAGE_TYPES, MessageType, SampleBlock, COUNTER_PREFIX
+
+# Binary telemetry frame, all the fields are little endian:
+#
+#     | sync 0xA5 0x5A | type u8 | sequence u16 | payload length u8 | payload | CRC u16 |
+#
+# * type - `binary_type_id` of the message type (see MESSAGE_TYPES in SerialDataParser)
+# * sequence - frame counter, incremented by one for every frame, wraps around at 2^16
+# * payload - one or more messages of the type packed one after another, values in the `binary_dtype` of the type
+# * CRC - CRC-16/CCITT-FALSE (polynomial 0x1021, init 0xFFFF) of the type, sequence, length and payload bytes
+SYNC_WORD = b"\xA5\x5A"
+HEADER = struct.Struct("<BHB")
+CRC = struct.Struct("<H")
+CRC_INIT = 0xFFFF
+SEQUENCE_MODULO = 1 << 16
+
+# the shortest frame is a frame with an empty payload
+MIN_FRAME_LENGTH = len(SYNC_WORD) + HEADER.size + CRC.size
+
+BINARY_MESSAGE_TYPES: dict[int, tuple[str, MessageType]] = {
+    message_type.binary_type_id: (prefix, message_type) for prefix, message_type in MESSAGE_TYPES.items()
+}
+# the size of one message of each type in bytes, the payload of a frame is a whole number of messages
+BINARY_MESSAGE_SIZES: dict[int, int] = {
+    type_id: message_type.binary_dtype.itemsize * message_type.num_of_values
+    for type_id, (_, message_type) in BINARY_MESSAGE_TYPES.items()
+}
+COUNTER_TYPE_ID = MESSAGE_TYPES[COUNTER_PREFIX].binary_type_id
+# the packet counter is an u32, same as its binary_dtype in MESSAGE_TYPES
+COUNTER = struct.Struct("<I")
+
+
+def encode_frame(prefix: str, values, sequence: int) -> bytes:
+    """
+    Builds a binary frame, used by the simulator and for testing the decoder
+    @param prefix: the message prefix, e.g. "gyro"
+    @param values: the values of one or more messages
+    @param sequence: the frame sequence number
+    """
+    message_type = MESSAGE_TYPES[prefix]
+    payload = np.asarray(values, dtype=message_type.binary_dtype).tobytes()
+    body = HEADER.pack(message_type.binary_type_id, sequence % SEQUENCE_MODULO, len(payload)) + payload
+    return SYNC_WORD + body + CRC.pack(binascii.crc_hqx(body, CRC_INIT))
+
+
+class BinaryFrameDecoder:
+    """
+    Incrementally decodes binary telemetry frames from a byte stream.
+
+    The payloads are collected per message type and converted with np.frombuffer once per call, so every call
+    returns one block of values per message type. Frames with a wrong CRC or an unknown type are skipped and the
+    decoder looks for the next sync word. A payload that isn't a whole number of messages is cut to the whole ones,
+    so the messages of the following frames stay aligned. Every message gets the last packet counter decoded before
+    it as its device counter, like in the text protocol.
+    """
+
+    def __init__(self):
+        self._buffer = bytearray()
+        self._last_sequence = None
+        self._last_device_counter = np.nan
+
+        self.crc_errors = 0
+        self.lost_frames = 0
+        self.skipped_bytes = 0
+        # the bytes of the incomplete messages at the end of the payloads
+        self.truncated_bytes = 0
+
+    def feed(self, data: bytes, timestamp: Optional[float] = None) -> dict[str, SampleBlock]:
+        """
+        @param data: the newly received bytes
+        @param timestamp: the receive time of the bytes, it's the receive time of all the frames they complete,
+            now if None
+        @return: the blocks keyed by the message prefix
+        """
+        timestamp = time.time() if timestamp is None else timestamp
+        buffer = self._buffer
+        buffer += data
+
+        payloads: dict[int, list[bytes]] = defaultdict(list)
+        # the device counter of each frame of a type, every message of the frame gets it
+        frame_device_counters: dict[int, list[float]] = defaultdict(list)
+        position = 0
+        view = memoryview(buffer)
+        try:
+            while True:
+                frame_start = buffer.find(SYNC_WORD, position)
+                if frame_start == -1:
+                    # keep the last byte, it might be the first half of a sync word
+                    self.skipped_bytes += max(len(buffer) - 1 - position, 0)
+                    position = max(len(buffer) - 1, position)
+                    break
+
+                self.skipped_bytes += frame_start - position
+                position = frame_start
+
+                if len(buffer) - frame_start < MIN_FRAME_LENGTH:
+                    break
+
+                body_start = frame_start + len(SYNC_WORD)
+                type_id, sequence, payload_length = HEADER.unpack_from(buffer, body_start)
+                frame_end = body_start + HEADER.size + payload_length + CRC.size
+                if frame_end > len(buffer):
+                    break
+
+                body_end = frame_end - CRC.size
+                (crc,) = CRC.unpack_from(buffer, body_end)
+                message_type = BINARY_MESSAGE_TYPES.get(type_id)
+                if crc != binascii.crc_hqx(view[body_start:body_end], CRC_INIT) or message_type is None:
+                    # not a frame or a corrupted one, look for the next sync word
+                    self.crc_errors += 1
+                    position = frame_start + 1
+                    continue
+
+                self._track_sequence(sequence)
+                payload_length -= payload_length % BINARY_MESSAGE_SIZES[type_id]
+                self.truncated_bytes += body_end - body_start - HEADER.size - payload_length
+                payload = bytes(view[body_start + HEADER.size:body_start + HEADER.size + payload_length])
+                payloads[type_id].append(payload)
+                if type_id == COUNTER_TYPE_ID:
+                    if len(payload) >= COUNTER.size:
+                        (self._last_device_counter,) = COUNTER.unpack_from(payload, len(payload) - COUNTER.size)
+                else:
+                    frame_device_counters[type_id].append(self._last_device_counter)
+                position = frame_end
+        finally:
+            view.release()
+
+        del buffer[:position]
+
+        blocks = {}
+        for type_id, type_payloads in payloads.items():
+            prefix, message_type = BINARY_MESSAGE_TYPES[type_id]
+            message_size = BINARY_MESSAGE_SIZES[type_id]
+            payload = b"".join(type_payloads)
+            # every payload is a whole number of messages
+            num_of_messages = len(payload) // message_size
+            values = np.frombuffer(payload, message_type.binary_dtype) \
+                .reshape(num_of_messages, message_type.num_of_values) \
+                .astype(np.float64)
+
+            device_counters = None
+            if type_id != COUNTER_TYPE_ID:
+                messages_per_frame = [len(frame_payload) // message_size for frame_payload in type_payloads]
+                device_counters = np.repeat(frame_device_counters[type_id], messages_per_frame)
+            blocks[prefix] = SampleBlock(values, np.full(num_of_messages, timestamp), device_counters)
+
+        return blocks
+
+    def _track_sequence(self, sequence: int):
+        if self._last_sequence is not None:
+            self.lost_frames += (sequence - self._last_sequence - 1) % SEQUENCE_MODULO
+        self._last_sequence = sequence
+
+    def reset(self):
+        self._buffer.clear()
+        self._last_sequence = None
+        self._last_device_counter = np.nan
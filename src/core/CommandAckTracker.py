@@ -0,0 +1,171 @@
+import logging
+import time
+from collections import defaultdict
+from typing import Callable, Hashable, Optional
+
+import zope.interface
+
+from core.CommandScheduler import OnSent
+from core.ISerialDataListener import ISerialDataListener
+from core.LatencyTracker import LatencyHistogram
+
+log = logging.getLogger()
+
+# a tagged command is `#<sequence number> <command>`, the ADCS answers with `ack <sequence number>`
+TAG_PREFIX = "#"
+ACK_PREFIX = "ack"
+SEQUENCE_MODULUS = 2 ** 16
+
+DEFAULT_ACK_TIMEOUT_S = 0.5
+DEFAULT_MAX_RETRIES = 2
+
+
+class PendingCommand:
+    def __init__(self, sequence: int, command: str, coalesce_key: Optional[Hashable], sent_time: float):
+        self.sequence = sequence
+        self.command = command
+        self.coalesce_key = coalesce_key
+        # the round trip time is measured from the first send, so it includes the retries
+        self.first_sent_time = sent_time
+        self.last_sent_time = sent_time
+        self.retries = 0
+        # the retry waits in the command queue, it's not retried again until it's written
+        self.is_retry_queued = False
+
+    @property
+    def command_type(self) -> str:
+        return self.command.split(" ", 1)[0]
+
+
+@zope.interface.implementer(ISerialDataListener)
+class CommandAckTracker:
+    """
+    Tags the commands with sequence numbers and matches them with the acknowledgements the ADCS sends back, so the
+    round trip time of the commands can be measured. Needs a firmware that answers `#<seq> <command>` with
+    `ack <seq>`, e.g. the simulator, that's why it's optional (see ADCSCommandsSender.set_ack_tracking).
+
+    Commands that aren't acknowledged in `timeout_s` are sent again, at most `max_retries` times. The retries keep
+    their sequence number and go through the command queue like any other command (see CommandScheduler), so they
+    respect its budget and aren't written to a congested link. A command that is superseded by a newer command with
+    the same coalesce key (e.g. a newer motor speed) isn't retried.
+
+    Used on the GUI thread, the acks are read in `on_new_lines`.
+
+    :param write: writes a command, returns True if it was written
+    :param submit_retry: queues an already tagged command, gets the command, its coalesce key and the callback called
+        after it's written, returns False if it was dropped
+    """
+
+    def __init__(self, write: Callable[[str], bool],
+                 submit_retry: Callable[[str, Optional[Hashable], Optional[OnSent]], bool],
+                 timeout_s: float = DEFAULT_ACK_TIMEOUT_S, max_retries: int = DEFAULT_MAX_RETRIES):
+        self.write = write
+        self.submit_retry = submit_retry
+        self.timeout_s = timeout_s
+        self.max_retries = max_retries
+
+        self._next_sequence = 0
+        self._pending: dict[int, PendingCommand] = {}
+        self._pending_by_key: dict[Hashable, PendingCommand] = {}
+
+        # round trip times keyed by the command type (the first word of the command)
+        self.round_trip_times: defaultdict[str, LatencyHistogram] = defaultdict(LatencyHistogram)
+        self.acknowledged_commands = 0
+        self.retried_commands = 0
+        self.timed_out_commands = 0
+        self.superseded_commands = 0
+        self.unexpected_acks = 0
+
+    @property
+    def pending_commands(self) -> int:
+        return len(self._pending)
+
+    def send(self, command: str, coalesce_key: Optional[Hashable] = None) -> bool:
+        """
+        Writes the command with a sequence number tag, a retry is already tagged and is written as it is
+        """
+        if command.startswith(TAG_PREFIX):
+            return self.write(command)
+
+        sequence = self._next_sequence
+        self._next_sequence = (self._next_sequence + 1) % SEQUENCE_MODULUS
+
+        if not self.write(f"{TAG_PREFIX}{sequence} {command}"):
+            return False
+
+        superseded_command = self._pending_by_key.pop(coalesce_key, None) if coalesce_key is not None else None
+        if superseded_command is not None:
+            del self._pending[superseded_command.sequence]
+            self.superseded_commands += 1
+
+        pending_command = PendingCommand(sequence, command, coalesce_key, time.perf_counter())
+        self._pending[sequence] = pending_command
+        if coalesce_key is not None:
+            self._pending_by_key[coalesce_key] = pending_command
+        return True
+
+    def on_new_lines(self, lines: list[str]):
+        for line in lines:
+            if line.startswith(ACK_PREFIX):
+                self.on_ack(line)
+
+    def on_ack(self, line: str):
+        try:
+            sequence = int(line[len(ACK_PREFIX):])
+        except ValueError:
+            log.warning(f"malformed ack: {line!r}")
+            return
+
+        pending_command = self._pending.pop(sequence, None)
+        if pending_command is None:
+            # e.g. the ack of a superseded command, or an ack that came after the command timed out
+            self.unexpected_acks += 1
+            return
+
+        if pending_command.coalesce_key is not None:
+            self._pending_by_key.pop(pending_command.coalesce_key, None)
+
+        self.round_trip_times[pending_command.command_type].add(time.perf_counter() - pending_command.first_sent_time)
+        self.acknowledged_commands += 1
+
+    def check_timeouts(self, now: Optional[float] = None):
+        """
+        Queues the commands that weren't acknowledged in time again, gives up on them after max_retries
+        """
+        now = time.perf_counter() if now is None else now
+
+        timed_out_commands = [c for c in self._pending.values()
+                              if not c.is_retry_queued and now - c.last_sent_time >= self.timeout_s]
+        for pending_command in timed_out_commands:
+            if pending_command.retries >= self.max_retries:
+                self._forget(pending_command)
+                self.timed_out_commands += 1
+                log.warning(f"command not acknowledged: {pending_command.command}")
+                continue
+
+            pending_command.retries += 1
+            # the timeout of a dropped retry starts again, it's retried once more after it
+            pending_command.last_sent_time = now
+            self.retried_commands += 1
+            pending_command.is_retry_queued = self.submit_retry(
+                f"{TAG_PREFIX}{pending_command.sequence} {pending_command.command}",
+                pending_command.coalesce_key,
+                self._create_on_retry_sent(pending_command),
+            )
+
+    @staticmethod
+    def _create_on_retry_sent(pending_command: PendingCommand) -> OnSent:
+        def on_retry_sent(is_data_written: bool):
+            pending_command.is_retry_queued = False
+            pending_command.last_sent_time = time.perf_counter()
+
+        return on_retry_sent
+
+    def clear(self):
+        self._pending.clear()
+        self._pending_by_key.clear()
+
+    def _forget(self, pending_command: PendingCommand):
+        del self._pending[pending_command.sequence]
+        if pending_command.coalesce_key is not None:
+            self._pending_by_key.pop(pending_command.coalesce_key, None)
@@ -0,0 +1,151 @@
+import threading
+import time
+from collections import deque
+from typing import Callable, Hashable, Optional
+
+# the default budget of the commands sent to the ADCS, the Bluetooth link can't take much more
+DEFAULT_MAX_COMMANDS_PER_SECOND = 20
+# the max number of commands sent at once after a pause, on top of the budget
+DEFAULT_BURST = 3
+DEFAULT_MAX_QUEUE_LENGTH = 256
+
+# called after the command was written with True if it was written successfully
+OnSent = Callable[[bool], None]
+
+
+class QueuedCommand:
+    def __init__(self, command: str, coalesce_key: Optional[Hashable], on_sent: Optional[OnSent]):
+        self.command = command
+        self.coalesce_key = coalesce_key
+        self.on_sent = on_sent
+
+
+class CommandScheduler:
+    """
+    Queue of the commands sent to the ADCS.
+
+    Commands with a coalesce key (e.g. the duty cycle of one motor) supersede the queued command with the same key,
+    the latest value replaces the old one in its place in the queue, so dragging a slider sends only the values the
+    link has time for. The commands are written by `pump`, at most `max_commands_per_second` of them per second
+    (token bucket), the owner calls it periodically (see ADCSCommandsSender).
+
+    Doesn't depend on Qt, `submit` is thread safe, `pump` writes the commands on the thread it's called from.
+
+    :param write: writes a command, it gets the command and its coalesce key, returns True if it was written
+    :param max_commands_per_second: the budget, 0 for unlimited
+    :param max_queue_length: the commands submitted when the queue is full are dropped
+    """
+
+    def __init__(self, write: Callable[[str, Optional[Hashable]], bool], max_commands_per_second: float = DEFAULT_MAX_COMMANDS_PER_SECOND,
+                 burst: int = DEFAULT_BURST, max_queue_length: int = DEFAULT_MAX_QUEUE_LENGTH):
+        self.write = write
+        self.max_commands_per_second = max_commands_per_second
+        self.burst = burst
+        self.max_queue_length = max_queue_length
+
+        self._lock = threading.Lock()
+        self._queue: deque[QueuedCommand] = deque()
+        self._queued_by_key: dict[Hashable, QueuedCommand] = {}
+        self._tokens = float(burst)
+        self._last_pump_time = time.perf_counter()
+
+        self.sent_commands = 0
+        self.failed_commands = 0
+        self.coalesced_commands = 0
+        self.dropped_commands = 0
+
+    @property
+    def queue_depth(self) -> int:
+        return len(self._queue)
+
+    def set_max_commands_per_second(self, max_commands_per_second: float):
+        self.max_commands_per_second = max_commands_per_second
+        self._tokens = min(max(self._tokens, 0.0), self.burst)
+
+    def submit(self, command: str, coalesce_key: Optional[Hashable] = None, on_sent: Optional[OnSent] = None,
+               is_superseded_by_queued: bool = False) -> bool:
+        """
+        @param command: the command without the line ending
+        @param coalesce_key: the queued command with the same key is replaced by this one
+        @param on_sent: called after the command was written
+        @param is_superseded_by_queued: the queued command with the same key is newer, it's kept and this one is
+            dropped, e.g. a retry of an old motor speed
+        @return: False if the command was dropped
+        """
+        with self._lock:
+            queued_command = self._queued_by_key.get(coalesce_key) if coalesce_key is not None else None
+            if queued_command is not None and is_superseded_by_queued:
+                self.coalesced_commands += 1
+                return False
+            if queued_command is not None:
+                queued_command.command = command
+                queued_command.on_sent = on_sent
+                self.coalesced_commands += 1
+                return True
+
+            if len(self._queue) >= self.max_queue_length:
+                self.dropped_commands += 1
+                return False
+
+            queued_command = QueuedCommand(command, coalesce_key, on_sent)
+            self._queue.append(queued_command)
+            if coalesce_key is not None:
+                self._queued_by_key[coalesce_key] = queued_command
+            return True
+
+    def pump(self, now: Optional[float] = None) -> int:
+        """
+        Writes the queued commands the budget allows
+        @param now: `time.perf_counter()`, now if None
+        @return: the number of written commands
+        """
+        now = time.perf_counter() if now is None else now
+        if self.max_commands_per_second > 0:
+            self._tokens = min(self._tokens + (now - self._last_pump_time) * self.max_commands_per_second,
+                               self.burst)
+        self._last_pump_time = now
+
+        num_of_written_commands = 0
+        while (self.max_commands_per_second <= 0 or self._tokens >= 1) and self._write_next():
+            if self.max_commands_per_second > 0:
+                self._tokens -= 1
+            num_of_written_commands += 1
+
+        return num_of_written_commands
+
+    def flush(self) -> int:
+        """
+        Writes all the queued commands regardless of the budget, e.g. the last ones before the connection is closed
+        @return: the number of written commands
+        """
+        num_of_written_commands = 0
+        while self._write_next():
+            num_of_written_commands += 1
+        return num_of_written_commands
+
+    def _write_next(self) -> bool:
+        """
+        @return: False if the queue was empty
+        """
+        with self._lock:
+            if not self._queue:
+                return False
+            queued_command = self._queue.popleft()
+            if queued_command.coalesce_key is not None:
+                del self._queued_by_key[queued_command.coalesce_key]
+
+        # written outside the lock, so submitting never waits for the port
+        is_written = self.write(queued_command.command, queued_command.coalesce_key)
+        if is_written:
+            self.sent_commands += 1
+        else:
+            self.failed_commands += 1
+        if queued_command.on_sent is not None:
+            queued_command.on_sent(is_written)
+        return True
+
+    def clear(self):
+        with self._lock:
+            self.dropped_commands += len(self._queue)
+            self._queue.clear()
+            self._queued_by_key.clear()
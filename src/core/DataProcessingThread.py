@@ -1,35 +1,214 @@
+import logging
 import threading
 import time
 from collections import deque
-from PyQt6.QtCore import QThread
-from core.SerialDataParser import SerialDataParser
+from typing import Optional, Union
 
+import numpy as np
 
-class DataProcessingThread(QThread):
-    def __init__(self):
-        super().__init__()
-        self.parser = SerialDataParser()
-        self.line_queue = deque()
-        self.lock = threading.Lock()
+from core.BinaryFrameDecoder import BinaryFrameDecoder
+from core.LatencyTracker import LatencyTracker, STAGE_DEQUEUE, STAGE_PARSE
+from core.SerialDataParser import SerialDataParser, SampleBlock, merge_blocks
+
+log = logging.getLogger()
+
+# Default batching policy, a batch is processed as soon as one of the limits is reached
+DEFAULT_MAX_BATCH_SIZE = 1024
+DEFAULT_MAX_LATENCY_MS = 5
+
+# the read times are `time.perf_counter_ns()`, the samples are timestamped with `time.time()`
+PERF_COUNTER_TO_TIME_OFFSET_S = time.time() - time.perf_counter()
+
+
+def read_time_to_timestamp(read_time_ns: Union[int, np.ndarray]) -> Union[float, np.ndarray]:
+    """
+    @return: the `time.time()` of a read time
+    """
+    return read_time_ns / 1E9 + PERF_COUNTER_TO_TIME_OFFSET_S
+
+
+class DataProcessingThread(threading.Thread):
+    """
+    Consumer thread for the lines (or binary telemetry data) read from the serial port.
+    A plain thread, not a QThread, so the pipeline also runs without Qt (see headless.py).
+
+    The thread is started by the first data added to it (or by `start`), so a connection that's never opened doesn't
+    have a running thread. It sleeps on a condition variable until lines arrive. Once there's at least one line in the queue it
+    waits until either `max_batch_size` lines are pending or the oldest pending line is `max_latency_ms` old and then
+    processes all the pending lines (up to `max_batch_size`) in one go.
+
+    A batch that fails (e.g. a stream listener raises) is logged and dropped, the thread goes on with the next one.
+    If the thread ends anyway, it stops taking data (`running` is False), so the queue can't grow without a consumer.
+
+    :param max_batch_size: the max number of lines processed in a single batch
+    :param max_latency_ms: the max time a line can wait in the queue before its batch gets processed,
+        0 means that the lines are processed as soon as they arrive
+    :param state: the State the data is stored to, the shared one if None
+    """
+
+    def __init__(self, max_batch_size: int = DEFAULT_MAX_BATCH_SIZE, max_latency_ms: float = DEFAULT_MAX_LATENCY_MS,
+                 state=None):
+        super().__init__(name="DataProcessingThread", daemon=True)
+        self.parser = SerialDataParser(state)
+        self.binary_decoder = BinaryFrameDecoder()
+        self.latency_tracker = LatencyTracker.get_instance()
+        # items are tuples of (read time in ns, line or a chunk of binary data), see LatencyTracker
+        self.line_queue: deque[tuple[int, Union[str, bytes]]] = deque()
+        self.condition = threading.Condition()
         self.running = True
+        self._is_start_requested = False
+
+        self.max_batch_size = max_batch_size
+        self.max_latency_ms = max_latency_ms
+
+        # metrics, written only by the processing thread
+        self.last_batch_size = 0
+        self.last_batch_lag_ms = 0.0
+        self.max_batch_lag_ms = 0.0
+        self.total_lines_processed = 0
+        self.total_batches_processed = 0
+        self.failed_batches = 0
 
     def run(self):
-        while self.running:
-            with self.lock:
-                if self.line_queue:
-                    line = self.line_queue.popleft()
-                else:
-                    line = None
+        try:
+            while True:
+                batch = self._wait_for_batch()
+                if batch is None:
+                    return
+
+                try:
+                    self.process_batch(batch)
+                except Exception:
+                    self.failed_batches += 1
+                    log.exception(f"Processing a batch of {len(batch)} items failed, it's dropped")
+        finally:
+            # nothing processes the queue anymore, the data added from now on is ignored
+            with self.condition:
+                if self.running:
+                    log.error("Data processing thread stopped unexpectedly")
+                self.running = False
+                self.line_queue.clear()
+
+    def process_batch(self, batch: list[tuple[int, Union[str, bytes]]]):
+        """
+        Parses and stores a batch of queued items, the batches have to be processed in order.
+        Also used without starting the thread, by the LineStream.
+        """
+        # lag of the batch is the time since the oldest line in it was read
+        read_time_ns = batch[0][0]
+        lag_ms = (time.perf_counter_ns() - read_time_ns) / 1_000_000
+        self.latency_tracker.record(STAGE_DEQUEUE, read_time_ns)
+
+        # every sample is timestamped with the read time of its line or of the chunk that completed its frame
+        lines = []
+        line_read_times_ns = []
+        binary_blocks: list[dict[str, SampleBlock]] = []
+        for item_read_time_ns, item in batch:
+            if isinstance(item, str):
+                lines.append(item)
+                line_read_times_ns.append(item_read_time_ns)
+            else:
+                binary_blocks.append(self.binary_decoder.feed(item, read_time_to_timestamp(item_read_time_ns)))
+
+        blocks_list = binary_blocks
+        if lines:
+            timestamps = read_time_to_timestamp(np.array(line_read_times_ns, dtype=np.float64))
+            blocks_list = [self.parser.parse_lines(lines, timestamps)] + binary_blocks
+        self.latency_tracker.record(STAGE_PARSE, read_time_ns)
+
+        if blocks_list:
+            self.parser.process_blocks(merge_blocks(blocks_list))
+        self.latency_tracker.record_stored(read_time_ns)
+
+        self.last_batch_size = len(batch)
+        self.last_batch_lag_ms = lag_ms
+        self.max_batch_lag_ms = max(self.max_batch_lag_ms, lag_ms)
+        self.total_lines_processed += len(batch)
+        self.total_batches_processed += 1
+
+    def _wait_for_batch(self) -> Optional[list[tuple[int, Union[str, bytes]]]]:
+        """
+        Blocks until a batch is ready according to the batching policy.
+        @return: list of the queued items, or None if the thread was stopped
+        """
+        with self.condition:
+            while self.running and not self.line_queue:
+                self.condition.wait()
+
+            # the first line is in the queue, wait until the batch is full or the oldest line is too old
+            deadline_ns = self.line_queue[0][0] + int(self.max_latency_ms * 1_000_000) if self.line_queue else 0
+            while self.running and len(self.line_queue) < self.max_batch_size:
+                remaining_s = (deadline_ns - time.perf_counter_ns()) / 1E9
+                if remaining_s <= 0:
+                    break
+                self.condition.wait(remaining_s)
+
+            if not self.running:
+                return None
+
+            batch_size = min(len(self.line_queue), self.max_batch_size)
+            return [self.line_queue.popleft() for _ in range(batch_size)]
+
+    def add_line(self, line: str, read_time_ns: Optional[int] = None):
+        self.add_lines([line], read_time_ns)
+
+    def add_lines(self, lines: list[str], read_time_ns: Optional[int] = None):
+        """
+        @param read_time_ns: `time.perf_counter_ns()` of the moment the lines were read, now if None
+        """
+        if not lines:
+            return
+
+        read_time_ns = time.perf_counter_ns() if read_time_ns is None else read_time_ns
+        self._start_if_needed()
+        with self.condition:
+            # stopped, nothing would process them
+            if not self.running:
+                return
+            self.line_queue.extend((read_time_ns, line) for line in lines)
+            self._notify_if_needed(len(lines))
+
+    def add_binary_data(self, data: bytes, read_time_ns: Optional[int] = None):
+        """
+        Adds a chunk of binary telemetry data, it's decoded on the processing thread
+        @param read_time_ns: `time.perf_counter_ns()` of the moment the data was read, now if None
+        """
+        if not data:
+            return
+
+        read_time_ns = time.perf_counter_ns() if read_time_ns is None else read_time_ns
+        self._start_if_needed()
+        with self.condition:
+            if not self.running:
+                return
+            self.line_queue.append((read_time_ns, data))
+            self._notify_if_needed(1)
+
+    def start(self):
+        with self.condition:
+            if self._is_start_requested:
+                return
+            self._is_start_requested = True
+        super().start()
 
-            if line:
-                self.parser.process_line(line)
+    def _start_if_needed(self):
+        if not self._is_start_requested and self.running:
+            self.start()
 
-            time.sleep(0.01)  # Sleep briefly to reduce CPU usage
+    def _notify_if_needed(self, num_of_added_lines: int):
+        # the consumer has to be woken up when the queue stops being empty (so it can start the latency timer)
+        # or when a batch is full, in all other cases it's already waiting for the deadline
+        queue_length = len(self.line_queue)
+        if queue_length == num_of_added_lines or queue_length >= self.max_batch_size:
+            self.condition.notify()
 
-    def add_line(self, line: str):
-        with self.lock:
-            self.line_queue.append(line)
+    @property
+    def queue_depth(self) -> int:
+        return len(self.line_queue)
 
     def stop(self):
-        self.running = False
-        self.wait()  # Wait for the thread to finish
+        with self.condition:
+            self.running = False
+            self.condition.notify_all()
+        if self.is_alive():
+            self.join()  # Wait for the thread to finish
@@ -0,0 +1,103 @@
+import logging
+from typing import Optional
+
+from core.ADCSCommandsSender import ADCSCommandsSender
+from core.AngularVelocityControlLoop import AngularVelocityControlLoop
+from core.DataProcessingThread import DataProcessingThread
+from core.ObservableValue import create_observable_value
+from core.RawConsole import RawConsole
+from core.SerialManager import SerialManager
+from core.SingletonMeta import Singelton
+from stores.GlobalStore import State
+
+log = logging.getLogger()
+
+DEFAULT_SESSION_NAME_PREFIX = "ADCS"
+
+
+class DeviceSession:
+    """
+    Everything needed to talk to one ADCS board: the State with its data, the SerialManager with the port, the reader
+    and the processing thread that parses the data, the ADCSCommandsSender with the command queue, the RawConsole
+    with the received lines and the host AngularVelocityControlLoop.
+
+    Nothing on the data path is shared between the sessions, every session has its own port, framer, processing
+    thread (with its own queue), store and command queue, so the boards can run at the same time. The ports are read
+    on the GUI thread in slices (see SerialManager.reader), so a noisy link can't starve the reads of the others.
+    The LatencyTracker and the RenderScheduler are still shared, they measure and draw the whole GUI.
+
+    :param name: shown in the session selector
+    """
+
+    def __init__(self, name: str, state, serial_manager: SerialManager, commands_sender: ADCSCommandsSender,
+                 raw_console: RawConsole):
+        self.name = name
+        self.state = state
+        self.serial_manager = serial_manager
+        self.commands_sender = commands_sender
+        self.raw_console = raw_console
+        # owned by the session, so the motors are stopped when the session is, whatever tab started it
+        self.control_loop = AngularVelocityControlLoop(state=state, commands_sender=commands_sender)
+
+    @classmethod
+    def create(cls, name: str) -> "DeviceSession":
+        """
+        Creates a session with its own instances of everything, independent of the shared ones
+        """
+        state = State.create()
+        serial_manager = SerialManager.create(state)
+        return cls(name, state, serial_manager, ADCSCommandsSender.create(serial_manager, state), RawConsole.create())
+
+    @property
+    def data_processing_thread(self) -> DataProcessingThread:
+        return self.serial_manager.data_processing_thread
+
+    def stop(self):
+        """
+        Stops the control loop and the motors, closes the port and stops the processing thread and the command queue
+        """
+        self.control_loop.stop()
+        # the commands that stop the motors are written before the queue is dropped
+        self.commands_sender.flush_commands()
+        self.commands_sender.stop()
+        self.serial_manager.stop()
+        log.info(f"Session {self.name} stopped")
+
+    def __str__(self):
+        return self.name
+
+
+@Singelton
+class DeviceSessionManager:
+    """
+    The sessions of the GUI, one for each connected board.
+
+    The default session is made of the shared instances (State.get_instance(), SerialManager.get_instance(), ...),
+    so the code that uses them works with the first board.
+    """
+
+    def __init__(self):
+        self.default_session = DeviceSession(
+            f"{DEFAULT_SESSION_NAME_PREFIX} 1",
+            State.get_instance(),
+            SerialManager.get_instance(),
+            ADCSCommandsSender.get_instance(),
+            RawConsole.get_instance(),
+        )
+        self.sessions: list[DeviceSession] = [self.default_session]
+        # the session the GUI shows
+        self.current_session = create_observable_value(self.default_session, "current_session")
+
+    def add_session(self, name: Optional[str] = None) -> DeviceSession:
+        name = name or f"{DEFAULT_SESSION_NAME_PREFIX} {len(self.sessions) + 1}"
+        session = DeviceSession.create(name)
+        self.sessions.append(session)
+        log.info(f"Session {name} added")
+        return session
+
+    def select_session(self, session: DeviceSession):
+        self.current_session.set(session)
+
+    def stop(self):
+        for session in self.sessions:
+            session.stop()
@@ -0,0 +1,116 @@
+import math
+import threading
+import time
+from typing import Callable, Any, Optional
+
+from PyQt6.QtCore import QObject, QCoreApplication, QThread, QTimer, pyqtSignal, pyqtSlot, Qt
+
+
+class GuiSubscriber:
+    """
+    A callback that is always called on the GUI thread.
+
+    Values posted from other threads are coalesced, only the latest value is delivered. With a throttle the callback
+    is called at most once per `throttle_ms`, values that arrive in between are delayed and coalesced as well.
+    """
+
+    def __init__(self, callback: Callable[[Any], None], throttle_ms: float = 0):
+        self.callback = callback
+        self.throttle_s = throttle_ms / 1000
+        self._last_delivery_time = -math.inf
+        self._deferred_value = None
+        self._is_deferred_delivery_scheduled = False
+
+    def __call__(self, value):
+        dispatcher = get_gui_dispatcher()
+        if dispatcher is None:
+            # there's no GUI (e.g. headless mode), just call the callback directly
+            self.callback(value)
+            return
+
+        dispatcher.post(self, value)
+
+    def deliver(self, value):
+        """
+        Called on the GUI thread by the dispatcher.
+        """
+        remaining_s = self._last_delivery_time + self.throttle_s - time.perf_counter()
+        if remaining_s > 0:
+            self._deferred_value = value
+            if not self._is_deferred_delivery_scheduled:
+                self._is_deferred_delivery_scheduled = True
+                QTimer.singleShot(math.ceil(remaining_s * 1000), self._deliver_deferred)
+            return
+
+        self._last_delivery_time = time.perf_counter()
+        self.callback(value)
+
+    def _deliver_deferred(self):
+        self._is_deferred_delivery_scheduled = False
+        value, self._deferred_value = self._deferred_value, None
+        self.deliver(value)
+
+
+class GuiDispatcher(QObject):
+    """
+    Moves values posted from worker threads onto the GUI thread.
+
+    Pending values are kept per subscriber, so a subscriber that gets multiple values before the GUI thread gets to
+    them only receives the latest one. All pending values are delivered in one queued signal.
+    """
+
+    _wakeup = pyqtSignal()
+
+    def __init__(self):
+        super().__init__()
+        self._pending: dict[GuiSubscriber, Any] = {}
+        self._lock = threading.Lock()
+        self._is_wakeup_scheduled = False
+        self._wakeup.connect(self._deliver_pending, Qt.ConnectionType.QueuedConnection)
+
+    def post(self, subscriber: GuiSubscriber, value):
+        if QThread.currentThread() == self.thread() and subscriber.throttle_s == 0:
+            subscriber.deliver(value)
+            return
+
+        with self._lock:
+            self._pending[subscriber] = value
+            if self._is_wakeup_scheduled:
+                return
+            self._is_wakeup_scheduled = True
+
+        self._wakeup.emit()
+
+    # has to be a real slot, so the queued call is delivered to the thread the dispatcher lives in
+    @pyqtSlot()
+    def _deliver_pending(self):
+        with self._lock:
+            pending = self._pending
+            self._pending = {}
+            self._is_wakeup_scheduled = False
+
+        for subscriber, value in pending.items():
+            subscriber.deliver(value)
+
+
+_gui_dispatcher: Optional[GuiDispatcher] = None
+_gui_dispatcher_lock = threading.Lock()
+
+
+def get_gui_dispatcher() -> Optional[GuiDispatcher]:
+    """
+    @return: the dispatcher living on the GUI thread, or None if there's no Qt application
+    """
+    global _gui_dispatcher
+    if _gui_dispatcher is None:
+        app = QCoreApplication.instance()
+        if app is None:
+            return None
+
+        with _gui_dispatcher_lock:
+            if _gui_dispatcher is None:
+                dispatcher = GuiDispatcher()
+                dispatcher.moveToThread(app.thread())
+                _gui_dispatcher = dispatcher
+
+    return _gui_dispatcher
@@ -3,5 +3,6 @@ import zope.interface
 
 class ISerialDataListener(zope.interface.Interface):
 
-    def on_new_line(self, line: str):
+    def on_new_lines(self, lines: list[str]):
+        """Called with a batch of the lines received in one read"""
         pass
@@ -0,0 +1,171 @@
+import csv
+import json
+import threading
+import time
+from typing import Optional
+
+import numpy as np
+
+from core.SingletonMeta import Singelton
+
+# the stages of the pipeline, the latency of each stage is measured from the moment the data was read from the port
+STAGE_READ = "read"  # framed and handed over to the processing thread
+STAGE_DEQUEUE = "dequeue"  # taken out of the processing queue
+STAGE_PARSE = "parse"  # parsed (or decoded from the binary frames)
+STAGE_STORE = "store"  # appended to the store buffers
+STAGE_RENDER = "render"  # drawn by the RenderScheduler
+STAGES = (STAGE_READ, STAGE_DEQUEUE, STAGE_PARSE, STAGE_STORE, STAGE_RENDER)
+
+# the histogram bins are log spaced from 1us to 100s
+HISTOGRAM_MIN_S = 1E-6
+HISTOGRAM_MAX_S = 100
+HISTOGRAM_BINS_PER_DECADE = 20
+
+PERCENTILES = (50, 95, 99)
+
+
+class LatencyHistogram:
+    """
+    Histogram of latencies with log spaced bins, so the percentiles have the same relative error (~6% with 20 bins
+    per decade) from microseconds to seconds while the memory and the cost of adding a sample stay constant.
+    Latencies outside the range are counted in the first or the last bin.
+    """
+
+    def __init__(self):
+        num_of_decades = np.log10(HISTOGRAM_MAX_S / HISTOGRAM_MIN_S)
+        num_of_bins = int(round(num_of_decades * HISTOGRAM_BINS_PER_DECADE))
+        self.bin_edges = np.logspace(np.log10(HISTOGRAM_MIN_S), np.log10(HISTOGRAM_MAX_S), num_of_bins + 1)
+        # the geometric centers of the bins are reported as the percentile values
+        self.bin_centers = np.sqrt(self.bin_edges[:-1] * self.bin_edges[1:])
+        self._log_min = np.log10(HISTOGRAM_MIN_S)
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.counts = np.zeros(len(self.bin_centers), dtype=np.int64)
+            self.count = 0
+            self.total_s = 0.0
+            self.max_s = 0.0
+
+    def add(self, latency_s: float):
+        latency_s = max(latency_s, 0.0)
+        index = int((np.log10(max(latency_s, HISTOGRAM_MIN_S)) - self._log_min) * HISTOGRAM_BINS_PER_DECADE)
+        index = min(index, len(self.counts) - 1)
+
+        with self._lock:
+            self.counts[index] += 1
+            self.count += 1
+            self.total_s += latency_s
+            self.max_s = max(self.max_s, latency_s)
+
+    @property
+    def mean_s(self) -> float:
+        return self.total_s / self.count if self.count else 0.0
+
+    def percentile(self, percentile: float) -> float:
+        """
+        @param percentile: e.g. 99 for p99
+        @return: the latency in seconds, 0 if there are no samples
+        """
+        with self._lock:
+            if not self.count:
+                return 0.0
+            cumulative_counts = np.cumsum(self.counts)
+            index = int(np.searchsorted(cumulative_counts, self.count * percentile / 100))
+            return float(min(self.bin_centers[min(index, len(self.bin_centers) - 1)], self.max_s))
+
+    def summary(self) -> dict[str, float]:
+        """
+        @return: count, mean, max and the percentiles, the times are in ms
+        """
+        summary = {"count": self.count, "mean_ms": float(self.mean_s * 1000), "max_ms": float(self.max_s * 1000)}
+        for percentile in PERCENTILES:
+            summary[f"p{percentile}_ms"] = self.percentile(percentile) * 1000
+        return summary
+
+
+@Singelton
+class LatencyTracker:
+    """
+    Measures the latency of the serial data from the moment it's read from the port to every stage of the pipeline.
+
+    Every read is stamped with `time.perf_counter_ns()` in SerialManager.reader, the stamp travels with the data
+    through the processing queue and each stage records `now - stamp` of the oldest data it handled into the
+    histogram of the stage. The render stage is recorded by the RenderScheduler for the oldest stored data that
+    wasn't drawn yet.
+    """
+
+    def __init__(self):
+        self.histograms: dict[str, LatencyHistogram] = {stage: LatencyHistogram() for stage in STAGES}
+        self._lock = threading.Lock()
+        self._oldest_unrendered_read_time_ns: Optional[int] = None
+
+    def record(self, stage: str, read_time_ns: int):
+        self.histograms[stage].add((time.perf_counter_ns() - read_time_ns) / 1E9)
+
+    def record_stored(self, read_time_ns: int):
+        """
+        Records the store stage and remembers the data for the render stage
+        """
+        self.record(STAGE_STORE, read_time_ns)
+        with self._lock:
+            if self._oldest_unrendered_read_time_ns is None:
+                self._oldest_unrendered_read_time_ns = read_time_ns
+
+    def record_rendered(self):
+        """
+        Called after a frame was drawn, the stored data is now on the screen
+        """
+        with self._lock:
+            read_time_ns = self._oldest_unrendered_read_time_ns
+            self._oldest_unrendered_read_time_ns = None
+
+        if read_time_ns is not None:
+            self.record(STAGE_RENDER, read_time_ns)
+
+    def reset(self):
+        for histogram in self.histograms.values():
+            histogram.reset()
+
+    def summary(self) -> dict[str, dict[str, float]]:
+        return {stage: histogram.summary() for stage, histogram in self.histograms.items()}
+
+    def export(self, path: str):
+        """
+        Exports the summary and the histograms, as CSV if the path ends with .csv, else as JSON
+        """
+        if path.lower().endswith(".csv"):
+            self.export_csv(path)
+        else:
+            self.export_json(path)
+
+    def export_json(self, path: str):
+        data = {
+            "bin_edges_s": self.histograms[STAGE_READ].bin_edges.tolist(),
+            "stages": {
+                stage: {**histogram.summary(), "counts": histogram.counts.tolist()}
+                for stage, histogram in self.histograms.items()
+            },
+        }
+        with open(path, "w") as f:
+            json.dump(data, f, indent=4)
+
+    def export_csv(self, path: str):
+        """
+        One row per stage with the summary, followed by the histogram counts of every stage per bin
+        """
+        with open(path, "w", newline="") as f:
+            writer = csv.writer(f)
+
+            summary = self.summary()
+            summary_columns = list(summary[STAGE_READ].keys())
+            writer.writerow(["stage", *summary_columns])
+            for stage, stage_summary in summary.items():
+                writer.writerow([stage, *(stage_summary[column] for column in summary_columns)])
+
+            writer.writerow([])
+            writer.writerow(["bin_start_s", "bin_end_s", *STAGES])
+            bin_edges = self.histograms[STAGE_READ].bin_edges
+            for i in range(len(bin_edges) - 1):
+                writer.writerow([bin_edges[i], bin_edges[i + 1], *(self.histograms[s].counts[i] for s in STAGES)])
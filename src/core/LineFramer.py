@@ -0,0 +1,91 @@
+import logging
+
+log = logging.getLogger()
+
+# the longest line the ADCS sends is well under 100 bytes, anything longer than this is garbage from a bad link
+DEFAULT_MAX_LINE_LENGTH = 1024
+
+
+class LineFramer:
+    """
+    Incrementally splits a byte stream into lines.
+
+    The new data is decoded and split in one go by the str methods and joined with the incomplete line of the
+    previous call, which is kept already decoded. The bytes that can't be decoded are kept as surrogates
+    (`surrogateescape`), so a character split between two reads is decoded once its line is complete. All the per
+    line work is done in C, the reads of a fast link are often just a few tens of bytes.
+
+    :param max_line_length: lines (and incomplete lines) longer than this are dropped
+    """
+
+    def __init__(self, max_line_length: int = DEFAULT_MAX_LINE_LENGTH):
+        self.max_line_length = max_line_length
+        # the incomplete line at the end of the data received so far
+        self._incomplete_line = ""
+        # set when an incomplete line was dropped, the rest of that line is dropped when it arrives
+        self._is_discarding_line = False
+
+        self.dropped_bytes = 0
+        self.decode_errors = 0
+
+    def feed(self, data: bytes) -> list[str]:
+        """
+        Adds new data to the buffer.
+        @param data: the newly received bytes
+        @return: list of the complete lines (stripped, without the empty ones) that were received
+        """
+        text = self._incomplete_line + data.decode("utf-8", "surrogateescape")
+        raw_lines = text.split("\n")
+        self._incomplete_line = raw_lines.pop()
+
+        lines = []
+        if raw_lines:
+            # no line can be too long when all of them together aren't
+            if self._is_discarding_line or not text.isascii() or (
+                    len(text) > self.max_line_length and max(map(len, raw_lines)) > self.max_line_length):
+                lines = self._check_lines(raw_lines)
+            else:
+                lines = list(filter(None, map(str.strip, raw_lines)))
+
+        if len(self._incomplete_line) > self.max_line_length:
+            log.warning(
+                f"Dropping {len(self._incomplete_line)} bytes, line is longer than {self.max_line_length} bytes"
+            )
+            self.dropped_bytes += len(self._incomplete_line)
+            self._incomplete_line = ""
+            self._is_discarding_line = True
+
+        return lines
+
+    def _check_lines(self, raw_lines: list[str]) -> list[str]:
+        """
+        The slow path of feed, for the lines that could be too long or contain bytes that weren't decoded
+        """
+        if self._is_discarding_line:
+            # the first line is the rest of a line that was too long
+            self._is_discarding_line = False
+            self.dropped_bytes += len(raw_lines[0]) + 1
+            raw_lines[0] = ""
+
+        if max(map(len, raw_lines)) > self.max_line_length:
+            self.dropped_bytes += sum(len(line) + 1 for line in raw_lines if len(line) > self.max_line_length)
+            raw_lines = [line for line in raw_lines if len(line) <= self.max_line_length]
+
+        # decode the lines with the escaped bytes again, now that they're complete, only the broken lines are lost
+        raw_lines = [
+            line if line.isascii() else self._decode(line.encode("utf-8", "surrogateescape")) for line in raw_lines
+        ]
+        return list(filter(None, map(str.strip, raw_lines)))
+
+    def _decode(self, line_bytes: bytes) -> str:
+        try:
+            return line_bytes.decode("utf-8")
+        except UnicodeDecodeError:
+            self.decode_errors += 1
+            if log.isEnabledFor(logging.ERROR):
+                log.error(f"UnicodeDecodeError for line: {line_bytes!r}")
+            return ""
+
+    def reset(self):
+        self._incomplete_line = ""
+        self._is_discarding_line = False
@@ -0,0 +1,197 @@
+import asyncio
+import logging
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Optional, Union
+
+from core.BinaryFrameDecoder import BinaryFrameDecoder
+from core.DataProcessingThread import DataProcessingThread, DEFAULT_MAX_BATCH_SIZE
+
+log = logging.getLogger()
+
+# the read of a link is paused when this many items are waiting to be processed and resumed when the queue drains
+# below the low water mark, a link that sends more than the pipeline can process can't grow the memory without limit
+DEFAULT_HIGH_WATER = 16 * DEFAULT_MAX_BATCH_SIZE
+DEFAULT_LOW_WATER = 4 * DEFAULT_MAX_BATCH_SIZE
+
+_pool: Optional[ThreadPoolExecutor] = None
+_pool_lock = threading.Lock()
+
+
+def get_processing_pool() -> ThreadPoolExecutor:
+    """
+    @return: the thread pool that processes the data of all the LineStreams, created on the first use
+    """
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            # the parsing is mostly numpy, which releases the GIL, more workers than cores don't help
+            _pool = ThreadPoolExecutor(max_workers=min(4, os.cpu_count() or 1), thread_name_prefix="LineStream")
+        return _pool
+
+
+class LineStream:
+    """
+    Processes the lines (or binary telemetry data) of one link like the DataProcessingThread, but without a thread
+    of its own: the batches of all the streams are processed by a shared thread pool, so many links (see
+    TransportConnection) don't need a thread each.
+
+    There's at most one batch of a stream in the pool at a time, the batches of a stream are processed in order
+    (the parser and the binary decoder keep the state between them). The items that arrive while a batch is being
+    processed form the next batch, so the batches get bigger when the pipeline falls behind.
+
+    The queue is bounded by backpressure instead of dropping data: `pause_reading` is called when `high_water`
+    items are waiting and `resume_reading` (on the thread of the loop) once the queue drains below `low_water`.
+
+    Has the same interface as the DataProcessingThread, the metrics are those of the underlying processor.
+
+    :param loop: the loop that reads the link, resume_reading is called on its thread
+    :param pause_reading: stops the reads of the link
+    :param resume_reading: resumes the reads of the link
+    :param state: the State the data is stored to, the shared one if None
+    """
+
+    def __init__(self, loop: asyncio.AbstractEventLoop, pause_reading: Callable[[], None],
+                 resume_reading: Callable[[], None], max_batch_size: int = DEFAULT_MAX_BATCH_SIZE,
+                 high_water: int = DEFAULT_HIGH_WATER, low_water: int = DEFAULT_LOW_WATER, state=None):
+        self.loop = loop
+        self.pause_reading = pause_reading
+        self.resume_reading = resume_reading
+        self.max_batch_size = max_batch_size
+        self.high_water = high_water
+        self.low_water = low_water
+
+        # never started, only its process_batch is used
+        self.processor = DataProcessingThread(max_batch_size, state=state)
+        self.line_queue: deque[tuple[int, Union[str, bytes]]] = deque()
+        self._lock = threading.Lock()
+        self._is_batch_scheduled = False
+        self._is_reading_paused = False
+        self.running = True
+
+        self.times_paused = 0
+        self.failed_batches = 0
+
+    def add_line(self, line: str, read_time_ns: Optional[int] = None):
+        self.add_lines([line], read_time_ns)
+
+    def add_lines(self, lines: list[str], read_time_ns: Optional[int] = None):
+        """
+        @param read_time_ns: `time.perf_counter_ns()` of the moment the lines were read, now if None
+        """
+        if not lines:
+            return
+
+        read_time_ns = time.perf_counter_ns() if read_time_ns is None else read_time_ns
+        self._add((read_time_ns, line) for line in lines)
+
+    def add_binary_data(self, data: bytes, read_time_ns: Optional[int] = None):
+        """
+        @param read_time_ns: `time.perf_counter_ns()` of the moment the data was read, now if None
+        """
+        if not data:
+            return
+
+        read_time_ns = time.perf_counter_ns() if read_time_ns is None else read_time_ns
+        self._add([(read_time_ns, data)])
+
+    def _add(self, items):
+        with self._lock:
+            if not self.running:
+                return
+            self.line_queue.extend(items)
+            should_pause = len(self.line_queue) >= self.high_water and not self._is_reading_paused
+            if should_pause:
+                self._is_reading_paused = True
+                self.times_paused += 1
+            should_schedule = not self._is_batch_scheduled
+            self._is_batch_scheduled = True
+
+        # on the thread of the loop, like the reads
+        if should_pause:
+            self.pause_reading()
+        if should_schedule:
+            get_processing_pool().submit(self._process_pending)
+
+    def _process_pending(self):
+        try:
+            self._process_batches()
+        except BaseException:
+            # the exception would be lost in the future nobody waits for, and with the flag set no batch would ever
+            # be scheduled again, the link would stay paused and stop would wait forever
+            log.exception("Processing of the queued data failed")
+            with self._lock:
+                self._is_batch_scheduled = False
+            raise
+
+    def _process_batches(self):
+        while True:
+            with self._lock:
+                if not self.line_queue or not self.running:
+                    self._is_batch_scheduled = False
+                    return
+                batch_size = min(len(self.line_queue), self.max_batch_size)
+                batch = [self.line_queue.popleft() for _ in range(batch_size)]
+
+            self._process_batch(batch)
+
+            with self._lock:
+                should_resume = self._is_reading_paused and len(self.line_queue) <= self.low_water
+                if should_resume:
+                    self._is_reading_paused = False
+            if should_resume and not self.loop.is_closed():
+                self.loop.call_soon_threadsafe(self.resume_reading)
+
+    def _process_batch(self, batch: list[tuple[int, Union[str, bytes]]]):
+        try:
+            self.processor.process_batch(batch)
+        except Exception:
+            # only this batch is lost, the stream goes on
+            self.failed_batches += 1
+            log.exception(f"Processing a batch of {len(batch)} items failed, it's dropped")
+
+    @property
+    def queue_depth(self) -> int:
+        return len(self.line_queue)
+
+    @property
+    def binary_decoder(self) -> BinaryFrameDecoder:
+        return self.processor.binary_decoder
+
+    @property
+    def last_batch_size(self) -> int:
+        return self.processor.last_batch_size
+
+    @property
+    def last_batch_lag_ms(self) -> float:
+        return self.processor.last_batch_lag_ms
+
+    @property
+    def max_batch_lag_ms(self) -> float:
+        return self.processor.max_batch_lag_ms
+
+    @property
+    def total_lines_processed(self) -> int:
+        return self.processor.total_lines_processed
+
+    @property
+    def total_batches_processed(self) -> int:
+        return self.processor.total_batches_processed
+
+    def stop(self):
+        """
+        Processes what's already queued and stops, the data added after it is ignored
+        """
+        with self._lock:
+            pending = list(self.line_queue)
+            self.line_queue.clear()
+            self.running = False
+
+        # a batch that is being processed has to finish first, the batches are processed in order
+        while self._is_batch_scheduled:
+            time.sleep(0.001)
+        for start in range(0, len(pending), self.max_batch_size):
+            self._process_batch(pending[start:start + self.max_batch_size])
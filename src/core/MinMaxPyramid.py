@@ -0,0 +1,228 @@
+import math
+from typing import Optional
+
+import numpy as np
+
+from .RingBuffer import RingBuffer
+
+# the number of samples in a bucket of the first level
+DEFAULT_BASE_BUCKET_SIZE = 4
+# every level has buckets this many times bigger than the level below
+DEFAULT_LEVEL_FACTOR = 4
+
+
+class _Level:
+    """
+    The min and max of each column of consecutive buckets of `bucket_size` samples. Bucket j covers the samples
+    [j * bucket_size, (j + 1) * bucket_size) counted from the first sample ever added, the buckets are kept in a ring
+    of `capacity` buckets, enough for the whole history of the buffer.
+
+    :param mins: view of the rows of the level in the array shared by all the levels
+    :param maxs: view of the rows of the level in the array shared by all the levels
+    """
+
+    def __init__(self, bucket_size: int, capacity: int, offset: int, mins: np.ndarray, maxs: np.ndarray):
+        self.bucket_size = bucket_size
+        self.capacity = capacity
+        self.offset = offset
+        self.mins = mins
+        self.maxs = maxs
+
+
+class MinMaxPyramid:
+    """
+    Multi resolution min/max summary of a RingBuffer for drawing long histories.
+
+    Every level keeps the min and max of buckets of samples, each level has `level_factor` times bigger buckets than
+    the one below. Only the buckets touched by new samples are updated on `update`, with the min and max of the new
+    samples, so keeping it up to date doesn't depend on the length of the history.
+
+    `envelope` returns at most two points (the min and the max) per pixel, it reads the coarsest level that still has
+    at least one bucket per pixel, so drawing the whole history costs the same no matter how long it is.
+
+    Not thread safe on its own, like the RingBuffer it's updated by one thread and read by another, a frame drawn
+    during an update can show a stale bucket.
+
+    :param buffer: the buffer to summarize, `update` has to be called after every append
+    """
+
+    def __init__(self, buffer: RingBuffer, base_bucket_size: int = DEFAULT_BASE_BUCKET_SIZE,
+                 level_factor: int = DEFAULT_LEVEL_FACTOR):
+        self.buffer = buffer
+        self.level_factor = level_factor
+
+        bucket_sizes = [base_bucket_size]
+        while bucket_sizes[-1] < buffer.capacity:
+            bucket_sizes.append(bucket_sizes[-1] * level_factor)
+        # an unaligned history can touch one bucket more than it fills
+        capacities = [math.ceil(buffer.capacity / bucket_size) + 1 for bucket_size in bucket_sizes]
+        offsets = np.cumsum([0] + capacities[:-1])
+
+        # the buckets of all the levels are in one array, so a bucket of every level can be updated at once
+        self._mins = np.zeros((sum(capacities), buffer.columns), dtype=np.float64)
+        self._maxs = np.zeros((sum(capacities), buffer.columns), dtype=np.float64)
+        self._bucket_sizes = np.array(bucket_sizes)
+        self._capacities = np.array(capacities)
+        self._offsets = offsets
+        self.levels = [
+            _Level(bucket_size, capacity, offset, self._mins[offset:offset + capacity],
+                   self._maxs[offset:offset + capacity])
+            for bucket_size, capacity, offset in zip(bucket_sizes, capacities, offsets)
+        ]
+
+        # the number of samples ever added to the buffer
+        self.total = 0
+
+    def reset(self):
+        self.total = 0
+
+    def update(self, num_of_new_samples: int):
+        """
+        Adds the new samples to the buckets
+        @param num_of_new_samples: the number of samples that were just added to the buffer
+        """
+        if num_of_new_samples <= 0:
+            return
+
+        self.total += num_of_new_samples
+        # a block bigger than the buffer only leaves its last samples, the buckets they continue are gone
+        is_continuation = num_of_new_samples <= len(self.buffer)
+        num_of_new_samples = min(num_of_new_samples, len(self.buffer))
+        new_samples = self.buffer.values()[-num_of_new_samples:]
+
+        # samples are only ever added to a bucket, so the buckets with new samples are the min/max of their old
+        # min/max and the new samples, the first level gets the samples, the others the changed buckets below
+        first_sample = self.total - num_of_new_samples
+        if first_sample // self.levels[0].bucket_size == (self.total - 1) // self.levels[0].bucket_size:
+            # the common case, a few new samples in the newest bucket
+            self._update_single_buckets(0, first_sample, new_samples.min(axis=0), new_samples.max(axis=0),
+                                        is_continuation)
+            return
+
+        first_index = first_sample
+        mins, maxs = new_samples, new_samples
+        group_size = self.levels[0].bucket_size
+        for level_index, level in enumerate(self.levels):
+            first_index, mins, maxs = self._update_level(level, first_index, mins, maxs, group_size, is_continuation)
+            group_size = self.level_factor
+
+            if len(mins) == 1:
+                # the new samples are in one bucket of this level, so they're in one bucket of every level above
+                self._update_single_buckets(level_index + 1, first_sample, mins[0], maxs[0], is_continuation)
+                break
+
+    def _update_single_buckets(self, first_level: int, first_sample: int, mins: np.ndarray, maxs: np.ndarray,
+                               is_continuation: bool):
+        """
+        Updates the bucket with the first sample of every level from `first_level` up at once
+        @param mins: the mins of the new samples
+        @param maxs: the maxs of the new samples
+        """
+        levels = slice(first_level, None)
+        buckets = first_sample // self._bucket_sizes[levels]
+        rows = self._offsets[levels] + buckets % self._capacities[levels]
+        if is_continuation:
+            is_new_bucket = (first_sample == buckets * self._bucket_sizes[levels])[:, np.newaxis]
+            self._mins[rows] = np.where(is_new_bucket, mins, np.minimum(self._mins[rows], mins))
+            self._maxs[rows] = np.where(is_new_bucket, maxs, np.maximum(self._maxs[rows], maxs))
+        else:
+            self._mins[rows] = mins
+            self._maxs[rows] = maxs
+
+    @staticmethod
+    def _update_level(level: _Level, first_index: int, mins: np.ndarray, maxs: np.ndarray, group_size: int,
+                      is_continuation: bool) -> tuple[int, np.ndarray, np.ndarray]:
+        """
+        @param first_index: the index of the first element (a sample or a bucket of the level below)
+        @param mins: the mins of the elements
+        @param maxs: the maxs of the elements
+        @param group_size: the number of elements in a bucket of the level
+        @param is_continuation: the elements continue the previous ones, the first bucket can have older elements
+        @return: the index, the mins and the maxs of the buckets that changed
+        """
+        last_index = first_index + len(mins) - 1
+        first_bucket = first_index // group_size
+        last_bucket = last_index // group_size
+
+        if first_bucket == last_bucket:
+            bucket_mins = mins.min(axis=0, keepdims=True)
+            bucket_maxs = maxs.max(axis=0, keepdims=True)
+        else:
+            bucket_starts = np.arange((first_bucket + 1) * group_size, last_index + 1, group_size) - first_index
+            bucket_starts = np.concatenate(([0], bucket_starts))
+            bucket_mins = np.minimum.reduceat(mins, bucket_starts, axis=0)
+            bucket_maxs = np.maximum.reduceat(maxs, bucket_starts, axis=0)
+
+        if is_continuation and first_index > first_bucket * group_size:
+            index = first_bucket % level.capacity
+            np.minimum(bucket_mins[0], level.mins[index], out=bucket_mins[0])
+            np.maximum(bucket_maxs[0], level.maxs[index], out=bucket_maxs[0])
+
+        # a block bigger than the history only leaves its last buckets
+        num_of_dropped_buckets = max(len(bucket_mins) - level.capacity, 0)
+        first_bucket += num_of_dropped_buckets
+        bucket_mins = bucket_mins[num_of_dropped_buckets:]
+        bucket_maxs = bucket_maxs[num_of_dropped_buckets:]
+
+        if len(bucket_mins) == 1:
+            index = first_bucket % level.capacity
+            level.mins[index] = bucket_mins[0]
+            level.maxs[index] = bucket_maxs[0]
+        else:
+            indices = np.arange(first_bucket, first_bucket + len(bucket_mins)) % level.capacity
+            level.mins[indices] = bucket_mins
+            level.maxs[indices] = bucket_maxs
+
+        return first_bucket, bucket_mins, bucket_maxs
+
+    def envelope(self, column: int, max_points: int, start: Optional[int] = None,
+                 end: Optional[int] = None) -> tuple[np.ndarray, np.ndarray]:
+        """
+        The min/max envelope of a range of the history, for drawing it `max_points` pixels wide.
+        When the range has at most two samples per pixel the samples are returned as they are.
+
+        @param column: the column of the buffer
+        @param max_points: the number of pixels, the envelope has at most two points for each of them
+        @param start: the index of the first sample of the range in the buffer (0 is the oldest sample)
+        @param end: the index after the last sample of the range, the end of the buffer if None
+        @return: the x (the index of the sample in the buffer) and the y of the points, the min and the max of each
+            pixel share the x, the first sample of the pixel
+        """
+        size = len(self.buffer)
+        start = 0 if start is None else min(max(start, 0), size)
+        end = size if end is None else min(max(end, start), size)
+        num_of_samples = end - start
+        max_points = max(max_points, 1)
+
+        if num_of_samples <= 2 * max_points:
+            return np.arange(start, end), self.buffer.column(column)[start:end]
+
+        # the coarsest level that still has at least one bucket per pixel
+        samples_per_point = num_of_samples / max_points
+        level = None
+        for candidate_level in self.levels:
+            if candidate_level.bucket_size > samples_per_point:
+                break
+            level = candidate_level
+
+        oldest_sample = self.total - size
+        if level is None:
+            # less than a bucket per pixel, the samples are cheap to reduce directly
+            positions = np.arange(start, end)
+            mins = maxs = self.buffer.column(column)[start:end]
+        else:
+            # the buckets at the edges of the range can reach up to a bucket (less than a pixel) beyond it
+            first_bucket = (oldest_sample + start) // level.bucket_size
+            last_bucket = (oldest_sample + end - 1) // level.bucket_size
+            buckets = np.arange(first_bucket, last_bucket + 1)
+            positions = np.maximum(buckets * level.bucket_size - oldest_sample, start)
+            mins = level.mins[buckets % level.capacity, column]
+            maxs = level.maxs[buckets % level.capacity, column]
+
+        # reduce the samples or buckets to exactly one min and max per pixel
+        bin_starts = np.unique(np.linspace(0, len(positions), max_points, endpoint=False).astype(np.intp))
+        x = np.repeat(positions[bin_starts], 2)
+        y = np.empty(2 * len(bin_starts), dtype=np.float64)
+        y[0::2] = np.minimum.reduceat(mins, bin_starts)
+        y[1::2] = np.maximum.reduceat(maxs, bin_starts)
+        return x, y
@@ -1,4 +1,4 @@
-from typing import TypeVar, Generic, Callable, List
+from typing import TypeVar, Generic, Callable, List, Dict
 
 T = TypeVar('T')
 
@@ -6,12 +6,27 @@ T = TypeVar('T')
 class Observable(Generic[T]):
     def __init__(self):
         self._callbacks: List[Callable[[T], None]] = []
+        self._gui_callbacks: Dict[Callable[[T], None], Callable[[T], None]] = {}
 
     def add_callback(self, callback: Callable[[T], None]):
         self._callbacks.append(callback)
 
+    def add_gui_callback(self, callback: Callable[[T], None], throttle_ms: float = 0):
+        """
+        Adds a callback that is always called on the GUI thread, use it for callbacks that update widgets.
+        When the value changes on a worker thread, the changes are coalesced and only the latest value is delivered.
+        @param callback: the callback to call with the new value
+        @param throttle_ms: the min time between two calls of the callback, the latest value is delivered after it
+        """
+        # imported here so that the observables can be used without Qt
+        from core.GuiDispatcher import GuiSubscriber
+
+        subscriber = GuiSubscriber(callback, throttle_ms)
+        self._gui_callbacks[callback] = subscriber
+        self._callbacks.append(subscriber)
+
     def remove_callback(self, callback: Callable[[T], None]):
-        self._callbacks.remove(callback)
+        self._callbacks.remove(self._gui_callbacks.pop(callback, callback))
 
     def _notify_callbacks(self, value: T):
         for callback in self._callbacks:
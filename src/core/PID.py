@@ -0,0 +1,51 @@
+import math
+
+
+class PID:
+    """
+    PID controller with the derivative on the measurement (no kick when the setpoint changes) and an integrator that
+    stops integrating while the output is saturated (anti windup).
+
+    :param output_min: the min output, the output is clamped to it
+    :param output_max: the max output, the output is clamped to it
+    """
+
+    def __init__(self, kp: float = 0, ki: float = 0, kd: float = 0,
+                 output_min: float = -math.inf, output_max: float = math.inf):
+        self.kp = kp
+        self.ki = ki
+        self.kd = kd
+        self.output_min = output_min
+        self.output_max = output_max
+        self.reset()
+
+    def set_gains(self, kp: float, ki: float, kd: float):
+        self.kp = kp
+        self.ki = ki
+        self.kd = kd
+
+    def reset(self):
+        self.integral = 0.0
+        self._last_measurement = None
+
+    def update(self, setpoint: float, measurement: float, dt: float) -> float:
+        """
+        @param dt: the time since the last update in seconds
+        @return: the clamped output
+        """
+        error = setpoint - measurement
+
+        derivative = 0.0
+        if self._last_measurement is not None and dt > 0:
+            derivative = -(measurement - self._last_measurement) / dt
+        self._last_measurement = measurement
+
+        integral = self.integral + error * dt
+        output = self.kp * error + self.ki * integral + self.kd * derivative
+        clamped_output = min(max(output, self.output_min), self.output_max)
+
+        # the integral is kept only if it doesn't push the output further into the saturation
+        if clamped_output == output or (output > clamped_output) != (error > 0):
+            self.integral = integral
+
+        return clamped_output
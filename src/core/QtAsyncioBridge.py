@@ -0,0 +1,44 @@
+import asyncio
+import logging
+from typing import Any, Coroutine
+
+from PyQt6.QtCore import QTimer, Qt
+
+from core.SingletonMeta import Singelton
+
+log = logging.getLogger()
+
+# how often the Qt event loop lets the asyncio loop handle its events, the latency it adds to the asyncio links
+DEFAULT_POLL_INTERVAL_MS = 2
+DEFAULT_TIMEOUT_S = 5
+
+
+@Singelton
+class QtAsyncioBridge:
+    """
+    An asyncio loop driven by the Qt event loop, so the asyncio links (see TransportLink) run on the GUI thread like
+    the QSerialPorts, without a thread of their own.
+
+    A timer gives the asyncio loop one iteration every `poll_interval_ms`: everything that's ready (the reads of the
+    links, the callbacks) is handled without waiting and the control goes back to Qt.
+    """
+
+    def __init__(self, poll_interval_ms: int = DEFAULT_POLL_INTERVAL_MS):
+        self.loop = asyncio.new_event_loop()
+
+        self._timer = QTimer()
+        self._timer.setTimerType(Qt.TimerType.PreciseTimer)
+        self._timer.setInterval(poll_interval_ms)
+        self._timer.timeout.connect(self._run_once)
+        self._timer.start()
+
+    def _run_once(self):
+        # the stop callback is ready, so the loop polls the links without blocking and returns after one iteration
+        self.loop.call_soon(self.loop.stop)
+        self.loop.run_forever()
+
+    def run_until_complete(self, coroutine: Coroutine[Any, Any, Any], timeout_s: float = DEFAULT_TIMEOUT_S) -> Any:
+        """
+        Runs a coroutine to the end, blocks the GUI meanwhile, e.g. to open a link from a button handler
+        """
+        return self.loop.run_until_complete(asyncio.wait_for(coroutine, timeout_s))
@@ -0,0 +1,90 @@
+from collections import deque
+from itertools import islice
+from typing import Callable, Optional
+
+from core.SingletonMeta import Singelton
+
+# the number of lines kept for the search, the views show only the last few hundred
+DEFAULT_HISTORY_LINES = 1_000_000
+
+
+@Singelton
+class RawConsole:
+    """
+    The lines received from the serial port, shown by the raw data consoles (see RawConsoleView).
+
+    The lines are kept in a bounded history. Every line gets an increasing index, the views remember the index of the
+    next line they haven't shown yet and fetch all the new lines at once when they are redrawn, so adding a line only
+    appends it to the history no matter how many views there are or whether they are visible.
+
+    Used on the GUI thread only.
+
+    :param history_lines: the max number of lines kept in the history, the oldest lines are dropped
+    """
+
+    def __init__(self, history_lines: int = DEFAULT_HISTORY_LINES):
+        self._history: deque[str] = deque(maxlen=history_lines)
+        # the index of the line after the last line in the history
+        self.end_index = 0
+        # called after lines are added, e.g. to mark the views dirty
+        self._listeners: list[Callable[[], None]] = []
+
+    @property
+    def start_index(self) -> int:
+        """
+        The index of the oldest line that is still in the history
+        """
+        return self.end_index - len(self._history)
+
+    def add_listener(self, listener: Callable[[], None]):
+        self._listeners.append(listener)
+
+    def remove_listener(self, listener: Callable[[], None]):
+        self._listeners.remove(listener)
+
+    def add_lines(self, lines: list[str]):
+        if not lines:
+            return
+
+        self._history.extend(lines)
+        self.end_index += len(lines)
+        for listener in self._listeners:
+            listener()
+
+    def lines_since(self, index: int, max_lines: Optional[int] = None,
+                    prefix: Optional[str] = None) -> tuple[list[str], int]:
+        """
+        @param index: the index of the first line to return, lines that are no longer in the history are skipped
+        @param max_lines: return only the last max_lines lines
+        @param prefix: return only the lines that start with the prefix
+        @return: the lines and the index of the next line
+        """
+        first_index = max(index, self.start_index)
+        num_of_new_lines = self.end_index - first_index
+        if num_of_new_lines <= 0:
+            return [], self.end_index
+
+        # walk the history from the end, so catching up on a long backlog only touches the lines that are returned
+        lines = []
+        for line in islice(reversed(self._history), num_of_new_lines):
+            if prefix and not line.startswith(prefix):
+                continue
+            lines.append(line)
+            if max_lines is not None and len(lines) >= max_lines:
+                break
+
+        lines.reverse()
+        return lines, self.end_index
+
+    def search(self, text: str, max_results: int = 1000) -> tuple[list[str], int]:
+        """
+        Searches the whole history for lines that contain the text
+        @return: the last max_results matching lines and the total number of matching lines
+        """
+        matches = [line for line in self._history if text in line]
+        return matches[-max_results:], len(matches)
+
+    def clear(self):
+        self._history.clear()
+        for listener in self._listeners:
+            listener()
@@ -0,0 +1,107 @@
+import struct
+import time
+from typing import BinaryIO, Optional
+
+import numpy as np
+
+RAW_SESSION_FILE_NAME = "raw_session.bin"
+MAGIC = b"ADCSRAW1"
+
+# record header: receive time in seconds, record kind, data length
+RECORD_HEADER = struct.Struct("<dBI")
+
+RECORD_DATA = 0
+RECORD_TEXT_MODE = 1
+RECORD_BINARY_MODE = 2
+
+
+class RawSessionWriter:
+    """
+    Writes the raw bytes read from the serial port, with the time they were received, so that the session can be
+    replayed through the whole pipeline later (see SessionReplayer). Works for both the text and the binary
+    telemetry, the telemetry mode changes are recorded as well.
+    """
+
+    def __init__(self, path: str, is_binary_mode: bool = False):
+        self.path = path
+        self._file: BinaryIO = open(path, "wb")
+        self._file.write(MAGIC)
+        self.write_mode(is_binary_mode)
+
+    def write_data(self, data: bytes):
+        self._file.write(RECORD_HEADER.pack(time.time(), RECORD_DATA, len(data)))
+        self._file.write(data)
+
+    def write_mode(self, is_binary_mode: bool):
+        self._file.write(RECORD_HEADER.pack(time.time(), RECORD_BINARY_MODE if is_binary_mode else RECORD_TEXT_MODE, 0))
+
+    def close(self):
+        self._file.close()
+
+
+class RawSession:
+    """
+    A recorded raw session loaded into memory.
+
+    :param timestamps: receive time of each record in seconds
+    :param kinds: kind of each record (RECORD_DATA, RECORD_TEXT_MODE or RECORD_BINARY_MODE)
+    :param data: the data of each record, empty for the mode changes
+    """
+
+    def __init__(self, timestamps: np.ndarray, kinds: list[int], data: list[bytes]):
+        self.timestamps = timestamps
+        self.kinds = kinds
+        self.data = data
+
+    def __len__(self):
+        return len(self.timestamps)
+
+    @property
+    def duration(self) -> float:
+        return float(self.timestamps[-1] - self.timestamps[0]) if len(self) else 0.0
+
+    @property
+    def size_bytes(self) -> int:
+        return sum(len(record_data) for record_data in self.data)
+
+    def index_at(self, time_s: float) -> int:
+        """
+        @param time_s: time from the start of the session
+        @return: the index of the first record at or after the time
+        """
+        if not len(self):
+            return 0
+        return int(np.searchsorted(self.timestamps, self.timestamps[0] + time_s))
+
+    @staticmethod
+    def load(path: str, lines_per_second: Optional[float] = None) -> "RawSession":
+        """
+        Loads a session recorded by the RawSessionWriter, or a plain text file with one line per line
+        (e.g. saved from the raw data console)
+        @param path: path of the session file
+        @param lines_per_second: the rate at which the lines of a plain text file are replayed
+        """
+        with open(path, "rb") as f:
+            content = f.read()
+
+        if not content.startswith(MAGIC):
+            return RawSession.from_lines(content.decode(errors="replace").splitlines(), lines_per_second or 100)
+
+        timestamps = []
+        kinds = []
+        data = []
+        position = len(MAGIC)
+        while position + RECORD_HEADER.size <= len(content):
+            timestamp, kind, length = RECORD_HEADER.unpack_from(content, position)
+            position += RECORD_HEADER.size
+            timestamps.append(timestamp)
+            kinds.append(kind)
+            data.append(content[position:position + length])
+            position += length
+
+        return RawSession(np.array(timestamps), kinds, data)
+
+    @staticmethod
+    def from_lines(lines: list[str], lines_per_second: float) -> "RawSession":
+        timestamps = np.arange(len(lines)) / lines_per_second
+        return RawSession(timestamps, [RECORD_DATA] * len(lines), [(line + "\r\n").encode() for line in lines])
@@ -0,0 +1,109 @@
+import threading
+import time
+from typing import Callable
+
+from PyQt6.QtCore import QTimer, Qt
+from PyQt6.QtWidgets import QWidget
+
+from core.LatencyTracker import LatencyTracker
+from core.ObservableValue import create_observable_value
+from core.SingletonMeta import Singelton
+
+DEFAULT_TARGET_FPS = 30
+
+# how often the achieved fps and the number of dropped redraws are published
+STATS_INTERVAL_S = 1
+
+
+class RenderTarget:
+    """
+    A part of the GUI (usually a plot) that is redrawn by the RenderScheduler.
+
+    :param widget: the widget that displays the target, the target is only rendered while the widget is visible
+    :param render: function that redraws the target with the latest data
+    """
+
+    def __init__(self, scheduler: "RenderScheduler", widget: QWidget, render: Callable[[], None]):
+        self._scheduler = scheduler
+        self.widget = widget
+        self.render = render
+        self.is_dirty = False
+
+    def mark_dirty(self):
+        """
+        Requests a redraw in the next frame. Safe to call from any thread.
+        """
+        self._scheduler.mark_dirty(self)
+
+
+@Singelton
+class RenderScheduler:
+    """
+    Redraws the registered render targets on a fixed frame rate.
+
+    Data sources only mark the targets as dirty when their data changes, every frame each dirty and visible target
+    is redrawn once. Targets that are marked dirty multiple times between two frames are redrawn only once, those
+    redraws are counted as dropped.
+    """
+
+    def __init__(self, target_fps: int = DEFAULT_TARGET_FPS):
+        self._targets: list[RenderTarget] = []
+        self._lock = threading.Lock()
+        self.latency_tracker = LatencyTracker.get_instance()
+
+        self.achieved_fps = create_observable_value(0.0, "achieved_fps")
+        self.dropped_redraws = create_observable_value(0, "dropped_redraws")
+        self._num_of_dropped_redraws = 0
+        self._frames_since_last_stats = 0
+        self._last_stats_time = time.perf_counter()
+
+        self._timer = QTimer()
+        self._timer.setTimerType(Qt.TimerType.PreciseTimer)
+        self._timer.timeout.connect(self._render_frame)
+        self.set_target_fps(target_fps)
+        self._timer.start()
+
+    def set_target_fps(self, target_fps: int):
+        self.target_fps = target_fps
+        self._timer.setInterval(int(1000 / target_fps))
+
+    def add_target(self, widget: QWidget, render: Callable[[], None]) -> RenderTarget:
+        target = RenderTarget(self, widget, render)
+        self._targets.append(target)
+        return target
+
+    def remove_target(self, target: RenderTarget):
+        self._targets.remove(target)
+
+    def mark_dirty(self, target: RenderTarget):
+        with self._lock:
+            if target.is_dirty:
+                self._num_of_dropped_redraws += 1
+            else:
+                target.is_dirty = True
+
+    def _render_frame(self):
+        rendered = False
+
+        for target in self._targets:
+            # hidden targets stay dirty, so they get redrawn as soon as they are shown
+            if not target.is_dirty or not target.widget.isVisible():
+                continue
+
+            with self._lock:
+                target.is_dirty = False
+
+            target.render()
+            rendered = True
+
+        if rendered:
+            self._frames_since_last_stats += 1
+            self.latency_tracker.record_rendered()
+
+        now = time.perf_counter()
+        elapsed = now - self._last_stats_time
+        if elapsed >= STATS_INTERVAL_S:
+            self.achieved_fps.set(round(self._frames_since_last_stats / elapsed, 1))
+            self.dropped_redraws.set(self._num_of_dropped_redraws)
+            self._frames_since_last_stats = 0
+            self._last_stats_time = now
@@ -0,0 +1,157 @@
+import asyncio
+import logging
+import time
+from typing import Callable, Optional
+
+from core.RawSession import RawSession, RECORD_DATA, RECORD_BINARY_MODE
+
+log = logging.getLogger()
+
+# speed that replays the session as fast as the pipeline can process it, the same as in SessionReplayer
+AS_FAST_AS_POSSIBLE = 0
+
+# in the as fast as possible mode the loop gets the control back after this much time, so the other links are read
+AS_FAST_AS_POSSIBLE_TIME_SLICE_S = 0.005
+
+
+class ReplayTransport(asyncio.Transport):
+    """
+    An asyncio transport that "receives" a recorded raw session, the records are passed to `protocol.data_received`
+    with their original timing multiplied by the speed, or as fast as possible. The asyncio version of the
+    SessionReplayer, so a recording can be replayed by the headless mode like a link to a board, also many of them
+    at once.
+
+    Like a real link it honors `pause_reading`, a paused replay waits (and its clock with it). The written data
+    is discarded, the recording doesn't answer the commands.
+
+    :param protocol: gets the data and connection_lost at the end of the session
+    :param speed: the replay speed, e.g. 1 for the original speed, AS_FAST_AS_POSSIBLE for as fast as possible
+    :param on_mode_changed: called with True or False when the telemetry mode of the recording changes
+    """
+
+    def __init__(self, loop: asyncio.AbstractEventLoop, protocol: asyncio.Protocol, session: RawSession,
+                 speed: float = 1, on_mode_changed: Optional[Callable[[bool], None]] = None):
+        super().__init__()
+        self.loop = loop
+        self.protocol = protocol
+        self.session = session
+        self.speed = speed
+        self.on_mode_changed = on_mode_changed
+        # the max size of the data passed at once, the records are split if they're bigger
+        self.max_size = 256 * 1024
+
+        self._next_index = 0
+        self._is_paused = False
+        self._is_closing = False
+        self._handle: Optional[asyncio.Handle] = None
+        # wall clock time and session time of the moment the playback (re)started
+        self._play_start_wall_time = 0.0
+        self._play_start_session_time = 0.0
+
+        self.replayed_bytes = 0
+        self.discarded_bytes = 0
+
+    def start(self):
+        self.protocol.connection_made(self)
+        self._restart_clock()
+        self._schedule()
+
+    def _session_time(self, index: int) -> float:
+        return float(self.session.timestamps[index] - self.session.timestamps[0])
+
+    def _restart_clock(self):
+        self._play_start_wall_time = time.perf_counter()
+        self._play_start_session_time = self._session_time(self._next_index) if self._next_index < len(self.session) \
+            else self.session.duration
+
+    def _schedule(self):
+        if self._is_paused or self._is_closing:
+            return
+
+        if self._next_index >= len(self.session):
+            log.info(f"Replay finished, {self.replayed_bytes} bytes replayed")
+            self._close(None)
+            return
+
+        if self.speed == AS_FAST_AS_POSSIBLE:
+            self._handle = self.loop.call_soon(self._replay)
+            return
+
+        delay_s = (self._session_time(self._next_index) - self._play_start_session_time) / self.speed \
+            - (time.perf_counter() - self._play_start_wall_time)
+        self._handle = self.loop.call_later(max(delay_s, 0), self._replay)
+
+    def _replay(self):
+        self._handle = None
+        slice_start = time.perf_counter()
+        session_time = self._play_start_session_time + (slice_start - self._play_start_wall_time) * self.speed
+        while self._next_index < len(self.session) and not self._is_paused and not self._is_closing:
+            if self.speed == AS_FAST_AS_POSSIBLE:
+                if time.perf_counter() - slice_start >= AS_FAST_AS_POSSIBLE_TIME_SLICE_S:
+                    break
+            elif self._session_time(self._next_index) > session_time:
+                break
+
+            self._replay_record(self._next_index)
+            self._next_index += 1
+
+        self._schedule()
+
+    def _replay_record(self, index: int):
+        kind = self.session.kinds[index]
+        if kind != RECORD_DATA:
+            if self.on_mode_changed is not None:
+                self.on_mode_changed(kind == RECORD_BINARY_MODE)
+            return
+
+        data = self.session.data[index]
+        for start in range(0, len(data), self.max_size):
+            self.protocol.data_received(data[start:start + self.max_size])
+        self.replayed_bytes += len(data)
+
+    def is_reading(self) -> bool:
+        return not self._is_paused and not self._is_closing
+
+    def pause_reading(self):
+        self._is_paused = True
+        if self._handle is not None:
+            self._handle.cancel()
+            self._handle = None
+
+    def resume_reading(self):
+        if not self._is_paused:
+            return
+        self._is_paused = False
+        self._restart_clock()
+        self._schedule()
+
+    def write(self, data: bytes):
+        self.discarded_bytes += len(data)
+
+    def get_write_buffer_size(self) -> int:
+        return 0
+
+    def set_write_buffer_limits(self, high: Optional[int] = None, low: Optional[int] = None):
+        # nothing is ever buffered
+        pass
+
+    def can_write_eof(self) -> bool:
+        return False
+
+    def is_closing(self) -> bool:
+        return self._is_closing
+
+    def close(self):
+        self._close(None)
+
+    def abort(self):
+        self._close(None)
+
+    def _close(self, exc: Optional[Exception]):
+        if self._is_closing:
+            return
+        self._is_closing = True
+        if self._handle is not None:
+            self._handle.cancel()
+            self._handle = None
+        self.loop.call_soon(self.protocol.connection_lost, exc)
@@ -0,0 +1,193 @@
+import threading
+import time
+from typing import Optional
+
+import numpy as np
+
+
+class RingBuffer:
+    """
+    Fixed capacity circular buffer of float samples with a timestamp for each sample.
+
+    Every sample is a row of `columns` values stored in one contiguous (capacity x columns) array. The storage is
+    allocated twice (the second half mirrors the first one) so that the samples can always be returned as a single
+    ordered, contiguous view without copying, while appending stays O(1).
+
+    One thread appends (and resizes), others can read. The readers take the storage and its slice under a lock
+    that only `resize` takes too, so a reader gets either the old or the new storage, never a mix of them.
+
+    :param capacity: the max number of samples that are kept, the oldest samples get overwritten
+    :param columns: the number of values in each sample
+    """
+
+    def __init__(self, capacity: int, columns: int = 1):
+        if capacity < 1:
+            raise ValueError(f"RingBuffer capacity must be at least 1, got {capacity}")
+
+        self._capacity = capacity
+        self._columns = columns
+        self._values = np.zeros((2 * capacity, columns), dtype=np.float64)
+        self._timestamps = np.zeros(2 * capacity, dtype=np.float64)
+
+        # index of the slot the next sample will be written to, always in [0, capacity)
+        self._head = 0
+        self._size = 0
+        # reentrant, so a subclass can hold it around a resize together with its own state
+        self._lock = threading.RLock()
+
+    @property
+    def capacity(self) -> int:
+        return self._capacity
+
+    @property
+    def columns(self) -> int:
+        return self._columns
+
+    def __len__(self) -> int:
+        return self._size
+
+    def append(self, values, timestamp: Optional[float] = None):
+        """
+        Appends a single sample.
+        @param values: a value for each column
+        @param timestamp: time of the sample in seconds, defaults to the current time
+        """
+        if timestamp is None:
+            timestamp = time.time()
+
+        head = self._head
+        self._values[head] = values
+        self._values[head + self._capacity] = values
+        self._timestamps[head] = timestamp
+        self._timestamps[head + self._capacity] = timestamp
+
+        self._head = (head + 1) % self._capacity
+        self._size = min(self._size + 1, self._capacity)
+
+    def extend(self, values: np.ndarray, timestamps: Optional[np.ndarray] = None):
+        """
+        Appends a block of samples at once.
+        @param values: array of shape (n, columns), or (n,) for a buffer with a single column
+        @param timestamps: array of shape (n,) with the time of each sample, defaults to the current time for all
+        """
+        values = np.asarray(values, dtype=np.float64).reshape(-1, self._columns)
+        n = len(values)
+        if n == 0:
+            return
+
+        if timestamps is None:
+            timestamps = np.full(n, time.time())
+
+        # only the last `capacity` samples can end up in the buffer
+        if n > self._capacity:
+            values = values[-self._capacity:]
+            timestamps = timestamps[-self._capacity:]
+            self._head = (self._head + n - self._capacity) % self._capacity
+            self._size = min(self._size + n - self._capacity, self._capacity)
+            n = self._capacity
+
+        # write the block into both halves, splitting it where it wraps around the end of the first half
+        first_part = min(n, self._capacity - self._head)
+        for offset in (0, self._capacity):
+            start = self._head + offset
+            self._values[start:start + first_part] = values[:first_part]
+            self._timestamps[start:start + first_part] = timestamps[:first_part]
+
+            rest = n - first_part
+            if rest:
+                self._values[offset:offset + rest] = values[first_part:]
+                self._timestamps[offset:offset + rest] = timestamps[first_part:]
+
+        self._head = (self._head + n) % self._capacity
+        self._size = min(self._size + n, self._capacity)
+
+    def _ordered_slice(self) -> slice:
+        end = self._head + self._capacity
+        return slice(end - self._size, end)
+
+    def _snapshot(self) -> tuple[np.ndarray, np.ndarray, slice]:
+        """
+        @return: the values, the timestamps and the slice of the samples in them, consistent with each other
+        """
+        with self._lock:
+            return self._values, self._timestamps, self._ordered_slice()
+
+    def values(self) -> np.ndarray:
+        """
+        @return: view of shape (len, columns) with the samples ordered from the oldest to the newest
+        """
+        values, _, ordered_slice = self._snapshot()
+        return values[ordered_slice]
+
+    def column(self, index: int) -> np.ndarray:
+        """
+        @return: view of a single column ordered from the oldest to the newest sample
+        """
+        values, _, ordered_slice = self._snapshot()
+        return values[ordered_slice, index]
+
+    def timestamps(self) -> np.ndarray:
+        """
+        @return: view of the timestamps ordered from the oldest to the newest sample
+        """
+        _, timestamps, ordered_slice = self._snapshot()
+        return timestamps[ordered_slice]
+
+    def interpolate(self, timestamps: np.ndarray) -> np.ndarray:
+        """
+        The values at other times, linearly interpolated between the samples, e.g. to align the samples of two
+        buffers before combining them. Times outside the history get the oldest or the newest sample.
+        @param timestamps: array of shape (n,) with the times in seconds
+        @return: array of shape (n, columns)
+        """
+        all_values, all_timestamps, ordered_slice = self._snapshot()
+        own_timestamps = all_timestamps[ordered_slice]
+        values = all_values[ordered_slice]
+        result = np.empty((len(timestamps), self._columns), dtype=np.float64)
+        if len(own_timestamps) == 0:
+            result.fill(np.nan)
+            return result
+
+        for column in range(self._columns):
+            result[:, column] = np.interp(timestamps, own_timestamps, values[:, column])
+        return result
+
+    def last(self) -> Optional[np.ndarray]:
+        """
+        @return: the newest sample or None if the buffer is empty
+        """
+        values, _, ordered_slice = self._snapshot()
+        if ordered_slice.stop == ordered_slice.start:
+            return None
+        return values[ordered_slice.stop - 1]
+
+    def resize(self, capacity: int):
+        """
+        Changes the capacity, keeps the newest samples that fit. The storage is allocated once and the samples are
+        copied once, so it costs about as much as appending them.
+
+        Has to be called on the thread that appends the samples, the new storage is swapped in under the lock,
+        the readers on other threads keep the old one until they read again.
+        """
+        if capacity < 1:
+            raise ValueError(f"RingBuffer capacity must be at least 1, got {capacity}")
+        if capacity == self._capacity:
+            return
+
+        size = min(self._size, capacity)
+        values = np.zeros((2 * capacity, self._columns), dtype=np.float64)
+        timestamps = np.zeros(2 * capacity, dtype=np.float64)
+        for offset in (0, capacity):
+            values[offset:offset + size] = self.values()[self._size - size:]
+            timestamps[offset:offset + size] = self.timestamps()[self._size - size:]
+
+        with self._lock:
+            self._values = values
+            self._timestamps = timestamps
+            self._capacity = capacity
+            self._head = size % capacity
+            self._size = size
+
+    def clear(self):
+        self._head = 0
+        self._size = 0
@@ -0,0 +1,170 @@
+import logging
+import re
+import time
+from abc import abstractmethod
+from typing import Optional
+
+from core.CommandAckTracker import ACK_PREFIX
+from core.DataProcessingThread import DataProcessingThread
+from core.ISerialDataListener import ISerialDataListener
+from core.ISubject import ISubject
+from core.LatencyTracker import LatencyTracker, STAGE_READ
+from core.LineFramer import LineFramer
+from core.RawSession import RawSessionWriter
+
+log = logging.getLogger()
+
+# the max number of bytes handled by a single read, the rest is read after the other pending events
+DEFAULT_MAX_READ_SIZE = 16 * 1024
+
+# the ADCS answers the commands with text acks also in binary mode, they're picked from between the frames
+BINARY_MODE_ACK = re.compile(rb"(" + ACK_PREFIX.encode() + rb" \d+)\r?\n")
+# the end of the previous read that is searched again, an ack can be split between two reads
+BINARY_MODE_ACK_TAIL_SIZE = 16
+
+
+class SerialConnection(ISubject[ISerialDataListener]):
+    """
+    The part of a connection to the ADCS that doesn't depend on how the port is read: the received data is framed
+    into lines (or passed on as binary frames), sent to the listeners and to the processing thread that parses and
+    stores it, and optionally recorded as a raw session.
+
+    SerialManager reads a QSerialPort on the GUI thread, TransportConnection reads an asyncio transport (a tty, a TCP
+    socket or a replayed session, see TransportLink), both call on_data_read with what they read.
+
+    :param state: the State the received data is stored to, the shared one if None
+    :param max_read_size: the max number of bytes handled by a single read
+    """
+
+    def __init__(self, state=None, max_read_size: int = DEFAULT_MAX_READ_SIZE):
+        super().__init__()
+        self.max_read_size = max_read_size
+        self.line_framer = LineFramer()
+        # in binary mode the data is sent to the processing thread as is, see BinaryFrameDecoder
+        self.is_binary_mode = False
+        self._binary_mode_tail = b""
+        self.raw_session_writer: Optional[RawSessionWriter] = None
+        self.latency_tracker = LatencyTracker.get_instance()
+
+        self.data_listeners: list[ISerialDataListener] = []
+
+        self.data_processing_thread = self.create_data_processor(state)
+
+    def create_data_processor(self, state) -> DataProcessingThread:
+        """
+        Creates what parses and stores the received data, a processing thread of the connection by default,
+        it's started by the first received data. Anything with the interface of the DataProcessingThread works,
+        e.g. a LineStream
+        """
+        return DataProcessingThread(state=state)
+
+    @abstractmethod
+    def write_data(self, data: str) -> bool:
+        """
+        Writes a command, the `\\r` terminator is added
+        @return: False if the data wasn't written
+        """
+
+    @abstractmethod
+    def is_port_open(self) -> bool:
+        pass
+
+    def is_writable(self) -> bool:
+        """
+        @return: False while the link can't take more data, the commands wait in their queue meanwhile
+        """
+        return self.is_port_open()
+
+    @abstractmethod
+    def close_port(self) -> bool:
+        """
+        @return: bool - True if managed to close the port, else False
+        """
+
+    def on_data_read(self, data: bytes, read_time_ns: int):
+        """
+        Called by the subclasses with the data they read from the port
+        """
+        if self.raw_session_writer is not None:
+            self.raw_session_writer.write_data(data)
+
+        self.feed_data(data, read_time_ns)
+
+    def feed_data(self, data: bytes, read_time_ns: Optional[int] = None):
+        """
+        Passes received data through the pipeline, used for the data read from the port and for replaying sessions
+        @param read_time_ns: `time.perf_counter_ns()` of the moment the data was read, now if None
+        """
+        read_time_ns = time.perf_counter_ns() if read_time_ns is None else read_time_ns
+
+        if self.is_binary_mode:
+            self.data_processing_thread.add_binary_data(data, read_time_ns)
+            self.latency_tracker.record(STAGE_READ, read_time_ns)
+            if self.data_listeners:
+                self._notify_binary_mode_acks(data)
+            return
+
+        # the framer keeps the incomplete line for the next read
+        lines = self.line_framer.feed(data)
+        if lines:
+            self.notify_listeners(lines, read_time_ns)
+            self.latency_tracker.record(STAGE_READ, read_time_ns)
+
+    def _notify_binary_mode_acks(self, data: bytes):
+        """
+        Passes the acks in the binary data to the listeners (e.g. CommandAckTracker), the frame decoder skips them
+        """
+        tail = self._binary_mode_tail
+        data = tail + data
+        self._binary_mode_tail = data[-BINARY_MODE_ACK_TAIL_SIZE:]
+        if ACK_PREFIX.encode() not in data:
+            return
+
+        # the acks that end in the tail were found with the previous read
+        lines = [match.group(1).decode() for match in BINARY_MODE_ACK.finditer(data) if match.end() > len(tail)]
+        if lines:
+            for l in self.data_listeners:
+                l.on_new_lines(lines)
+
+    def set_binary_mode(self, is_binary_mode: bool):
+        """
+        Switches between the text line protocol and the binary frames, the ADCS has to be switched as well
+        (see ADCSCommandsSender.set_telemetry_mode)
+        """
+        self.is_binary_mode = is_binary_mode
+        self.line_framer.reset()
+        self._binary_mode_tail = b""
+        if self.raw_session_writer is not None:
+            self.raw_session_writer.write_mode(is_binary_mode)
+
+    def start_raw_session_recording(self, path: str):
+        """
+        Records the raw data read from the port, so it can be replayed later (see SessionReplayer)
+        """
+        self.stop_raw_session_recording()
+        self.raw_session_writer = RawSessionWriter(path, self.is_binary_mode)
+
+    def stop_raw_session_recording(self):
+        if self.raw_session_writer is not None:
+            self.raw_session_writer.close()
+            self.raw_session_writer = None
+
+    def add_listener(self, listener: ISerialDataListener):
+        self.data_listeners.append(listener)
+
+    def remove_listener(self, listener: ISerialDataListener):
+        self.data_listeners.remove(listener)
+
+    def notify_listeners(self, lines: list[str], read_time_ns: Optional[int] = None):
+        for l in self.data_listeners:
+            l.on_new_lines(lines)
+        self.data_processing_thread.add_lines(lines, read_time_ns)
+
+    def stop(self):
+        """
+        Closes the port and stops the processing thread, the connection can't be used after it
+        """
+        if self.is_port_open():
+            self.close_port()
+        self.stop_raw_session_recording()
+        self.data_processing_thread.stop()
@@ -1,43 +1,248 @@
 import logging
 import time
+from collections import defaultdict
+from typing import Callable, Optional
 
+import numpy as np
 import zope.interface
 
-from core import ISerialDataListener
+from core.ISerialDataListener import ISerialDataListener
 from stores.GlobalStore import State
-from collections import deque
 
 log = logging.getLogger()
 
 
+class MessageType:
+    """
+    Description of a message the ADCS sends, either `prefix(v1,v2,...)` or `prefix v` in the text protocol,
+    or a frame with the `binary_type_id` in the binary protocol (see BinaryFrameDecoder).
+
+    :param num_of_values: the number of values in one message
+    :param store_method_name: name of the State method that stores a block of messages,
+        it's called with an array of shape (n, num_of_values)
+    :param binary_type_id: the type byte of the message in the binary frames
+    :param binary_dtype: numpy dtype of the values in the binary frames
+    """
+
+    def __init__(self, num_of_values: int, store_method_name: str, binary_type_id: int, binary_dtype: str = "<f4"):
+        self.num_of_values = num_of_values
+        self.store_method_name = store_method_name
+        self.binary_type_id = binary_type_id
+        self.binary_dtype = np.dtype(binary_dtype)
+
+
+# Dispatch table of the messages keyed by their prefix. To add a new message type, add a line here.
+MESSAGE_TYPES: dict[str, MessageType] = {
+    "counter": MessageType(1, "add_packet_numbers", 0x01, "<u4"),
+    "acc": MessageType(3, "add_IMU_acceleration_datapoints", 0x02),
+    "gyro": MessageType(3, "add_IMU_gyroscope_datapoints", 0x03),
+    "angle": MessageType(3, "add_IMU_angle_datapoints", 0x04),
+    "mag": MessageType(3, "add_IMU_magnetometer_datapoints", 0x05),
+    "temp": MessageType(1, "add_IMU_temperature_datapoints", 0x06),
+}
+
+# messages that aren't IMU data, they are handled by the serial data listeners (e.g. CommandAckTracker)
+IGNORED_PREFIXES = {"ack"}
+
+# the message with the packet counter of the ADCS, it's sent before the other messages of a packet
+COUNTER_PREFIX = "counter"
+
+
+class SampleBlock:
+    """
+    A block of parsed messages of one type, stored columnar
+
+    :param values: array of shape (n, num_of_values)
+    :param timestamps: array of shape (n,), the host receive time of each message in seconds (`time.time()`)
+    :param device_counters: array of shape (n,), the packet counter of the ADCS the message was sent with,
+        NaN when it isn't known, None when the messages have no counters at all
+    """
+
+    def __init__(self, values: np.ndarray, timestamps: np.ndarray, device_counters: Optional[np.ndarray] = None):
+        self.values = values
+        self.timestamps = timestamps
+        self.device_counters = device_counters
+
+    def __len__(self):
+        return len(self.values)
+
+
+def merge_blocks(blocks_list: list[dict[str, SampleBlock]]) -> dict[str, SampleBlock]:
+    """
+    Concatenates the blocks of the same message type, e.g. the blocks decoded from several chunks of binary data
+    """
+    if len(blocks_list) == 1:
+        return blocks_list[0]
+
+    blocks_by_prefix: dict[str, list[SampleBlock]] = defaultdict(list)
+    for blocks in blocks_list:
+        for prefix, block in blocks.items():
+            blocks_by_prefix[prefix].append(block)
+
+    merged_blocks = {}
+    for prefix, blocks in blocks_by_prefix.items():
+        if len(blocks) == 1:
+            merged_blocks[prefix] = blocks[0]
+            continue
+
+        device_counters = None
+        if any(block.device_counters is not None for block in blocks):
+            device_counters = np.concatenate([
+                block.device_counters if block.device_counters is not None else np.full(len(block), np.nan)
+                for block in blocks
+            ])
+        merged_blocks[prefix] = SampleBlock(
+            np.concatenate([block.values for block in blocks]),
+            np.concatenate([block.timestamps for block in blocks]),
+            device_counters,
+        )
+
+    return merged_blocks
+
+
+def split_message(line: str) -> tuple[str, str]:
+    """
+    Splits a line into the message prefix and the comma separated values
+    e.g. "gyro(1.0,2.0,3.0)" -> ("gyro", "1.0,2.0,3.0") and "temp 21.5" -> ("temp", "21.5")
+    """
+    prefix, separator, values = line.partition("(")
+    if separator:
+        return prefix, values.rstrip(")")
+
+    prefix, _, values = line.partition(" ")
+    return prefix, values
+
+
 def extract_numbers(line: str):
-    start = line.index("(") + 1
-    end = line.index(")")
-    return [float(x) for x in line[start:end].split(",")]
+    return [float(x) for x in split_message(line)[1].split(",")]
+
+
+def parse_values(payloads: list[str], num_of_values: int) -> tuple[np.ndarray, Optional[list[int]]]:
+    """
+    Parses the values of a batch of messages of the same type in one pass.
+    @param payloads: comma separated values of each message
+    @param num_of_values: the number of values in each message
+    @return: array of shape (n, num_of_values), malformed messages are left out, and the indices of the messages
+        that were kept, None if all of them were
+    """
+    # the total count alone isn't enough, a message with a value too few and one with a value too many would shift
+    # the values across the rows, so every message has to have its own num_of_values - 1 commas
+    if (np.char.count(np.asarray(payloads, dtype=np.str_), ",") == num_of_values - 1).all():
+        try:
+            values = np.fromstring(",".join(payloads), sep=",")
+            if values.size == len(payloads) * num_of_values:
+                return values.reshape(-1, num_of_values), None
+        except ValueError:
+            pass
+
+    # at least one of the messages is malformed, parse them one by one to find it
+    rows = []
+    kept_indices = []
+    for index, payload in enumerate(payloads):
+        try:
+            row = [float(x) for x in payload.split(",")]
+        except ValueError:
+            row = []
+
+        if len(row) == num_of_values:
+            rows.append(row)
+            kept_indices.append(index)
+        elif log.isEnabledFor(logging.WARNING):
+            log.warning(f"malformed message values: {payload!r}")
+
+    return np.array(rows, dtype=np.float64).reshape(-1, num_of_values), kept_indices
 
 
 @zope.interface.implementer(ISerialDataListener)
 class SerialDataParser:
-    def __init__(self):
-        self.store = State.get_instance()
+    """
+    :param store: the State the parsed data is stored to, the shared one if None
+    """
+
+    def __init__(self, store=None):
+        self.store = store if store is not None else State.get_instance()
+        self.store_methods: dict[str, Callable[[np.ndarray, Optional[np.ndarray], Optional[np.ndarray]], None]] = {
+            prefix: getattr(self.store, message_type.store_method_name)
+            for prefix, message_type in MESSAGE_TYPES.items()
+        }
+        # the counter of the last packet of the previous batch, the first messages of a batch can belong to it
+        self._last_device_counter = np.nan
 
     def process_line(self, line: str):
-        if line.startswith("counter"):
-            number = int(line[8:])  # len("counter ") == 8
-            self.store.add_packet_number(number)
+        self.process_lines([line])
+
+    def process_lines(self, lines: list[str], timestamps: Optional[np.ndarray] = None):
+        """
+        Parses a batch of lines, the values of each message type are parsed together and stored as one block.
+        """
+        self.process_blocks(self.parse_lines(lines, timestamps))
+
+    def parse_lines(self, lines: list[str], timestamps: Optional[np.ndarray] = None) -> dict[str, SampleBlock]:
+        """
+        Parses a batch of lines without storing them
+        @param timestamps: the receive time of each line, now for all of them if None
+        @return: the blocks keyed by the message prefix, every message gets the packet counter that was received
+            before it as its device counter
+        """
+        payloads: dict[str, list[str]] = defaultdict(list)
+        line_indices: dict[str, list[int]] = defaultdict(list)
+        for index, line in enumerate(lines):
+            prefix, values = split_message(line)
+            payloads[prefix].append(values)
+            line_indices[prefix].append(index)
+
+        if timestamps is None:
+            timestamps = np.full(len(lines), time.time())
+
+        parsed_values = {}
+        for prefix, message_payloads in payloads.items():
+            message_type = MESSAGE_TYPES.get(prefix)
+            if message_type is None:
+                if prefix in IGNORED_PREFIXES:
+                    continue
+                if log.isEnabledFor(logging.WARNING):
+                    log.warning(f"unknown data for parsing ({len(message_payloads)} lines): {prefix}")
+                continue
+
+            values, kept_indices = parse_values(message_payloads, message_type.num_of_values)
+            indices = np.array(line_indices[prefix], dtype=np.intp)
+            if kept_indices is not None:
+                indices = indices[kept_indices]
+            if prefix == COUNTER_PREFIX:
+                # float() parses "nan" and "inf" too, they aren't packet counters
+                is_finite = np.isfinite(values[:, 0])
+                if not is_finite.all():
+                    if log.isEnabledFor(logging.WARNING):
+                        log.warning(f"malformed counters: {np.count_nonzero(~is_finite)}")
+                    values, indices = values[is_finite], indices[is_finite]
+            if len(values):
+                parsed_values[prefix] = (values, indices)
+
+        # the counters in the order they were received, with the counter of the previous batch in front
+        counter_values, counter_indices = parsed_values.get(COUNTER_PREFIX, (np.zeros((0, 1)), np.zeros(0, np.intp)))
+        counters = np.concatenate(([self._last_device_counter], counter_values[:, 0]))
+        if len(counter_values):
+            self._last_device_counter = counter_values[-1, 0]
 
-        elif line.startswith("acc"):
-            self.store.add_IMU_acceleration_datapoint(*extract_numbers(line))
+        blocks = {}
+        for prefix, (values, indices) in parsed_values.items():
+            device_counters = None
+            if prefix != COUNTER_PREFIX:
+                device_counters = counters[np.searchsorted(counter_indices, indices)]
+            blocks[prefix] = SampleBlock(values, timestamps[indices], device_counters)
 
-        elif line.startswith("gyro"):
-            self.store.add_IMU_gyroscope_datapoint(*extract_numbers(line))
+        return blocks
 
-        elif line.startswith("angle"):
-            self.store.add_IMU_angle_datapoint(*extract_numbers(line))
+    def process_blocks(self, blocks: dict[str, SampleBlock]):
+        """
+        Stores blocks of values that were already decoded (e.g. from binary frames)
+        @param blocks: the blocks keyed by the message prefix
+        """
+        for prefix, block in blocks.items():
+            self.store_methods[prefix](block.values, block.timestamps, block.device_counters)
 
-        elif line.startswith("temp"):
-            self.store.add_IMU_temperature_datapoint(float(line[5:]))  # len("temp") == 4
+    def reset(self):
+        self._last_device_counter = np.nan
 
-        else:
-            if log.isEnabledFor(logging.WARNING):
-                log.warning("unknown data for parsing: " + line)
+    def on_new_lines(self, lines: list[str]):
+        self.process_lines(lines)
@@ -1,27 +1,40 @@
 import logging
+import time
 
+from PyQt6.QtCore import QTimer
 from PyQt6.QtSerialPort import QSerialPort, QSerialPortInfo
 
-from core.ISerialDataListener import ISerialDataListener
-from core.ISubject import ISubject
+from core.SerialConnection import SerialConnection, DEFAULT_MAX_READ_SIZE
 from core.SingletonMeta import Singelton
-from core.DataProcessingThread import DataProcessingThread
+
+# the QSerialPort buffers the writes, a port that has this much unwritten data is congested, see is_writable
+MAX_PENDING_WRITE_BYTES = 1024
+# how long closing the port waits for the buffered writes, e.g. the commands that stop the motors
+CLOSE_WRITE_TIMEOUT_MS = 100
 
 log = logging.getLogger()
 
 
 @Singelton
-class SerialManager(ISubject[ISerialDataListener]):
-    def __init__(self):
-        super().__init__()
-        self.serial_port = QSerialPort()
-        self.data = bytearray()
+class SerialManager(SerialConnection):
+    """
+    The connection to one ADCS over a QSerialPort, the shared instance belongs to the default Session,
+    see core.DeviceSession
 
-        self.data_listeners: list[ISerialDataListener] = []
-        log.info("SerialManager - constructor called")
+    The port can also be a tcp:// (e.g. a ser2net bridge) or a replay:// link, those are asyncio transports
+    (see TransportLink) run on the GUI thread by the QtAsyncioBridge.
 
-        self.data_processing_thread = DataProcessingThread()
-        self.data_processing_thread.start()
+    :param state: the State the received data is stored to, the shared one if None
+    :param max_read_size: the max number of bytes handled by a single read, see reader
+    """
+
+    def __init__(self, state=None, max_read_size: int = DEFAULT_MAX_READ_SIZE):
+        super().__init__(state, max_read_size)
+        self.serial_port = QSerialPort()
+        self._is_read_scheduled = False
+        # the open tcp:// or replay:// link (a TransportLink), the QSerialPort isn't used while it's set
+        self.transport_link = None
+        log.info("SerialManager - constructor called")
 
     @staticmethod
     def get_available_ports():
@@ -29,9 +42,16 @@ class SerialManager(ISubject[ISerialDataListener]):
 
     def open_port(self, port_name: str, baud_date: int, data_bits: int, stop_bits: float):
         log.debug("Opening port: " + port_name)
-        if self.serial_port.isOpen():
+        if self.is_port_open():
             log.warning(f"Serial port was already open ({port_name}), closing the connection")
-            self.serial_port.close()
+            self.close_port()
+
+        # imported here so that asyncio isn't imported at the startup, only when a link is opened
+        from core.TransportLink import is_link_url
+
+        if is_link_url(port_name):
+            return self._open_transport_link(port_name)
+        self.transport_link = None
 
         self.serial_port.setPortName(port_name)
         self.serial_port.setBaudRate(baud_date)
@@ -42,7 +62,24 @@ class SerialManager(ISubject[ISerialDataListener]):
 
         return self.serial_port.open(QSerialPort.OpenModeFlag.ReadWrite)
 
+    def _open_transport_link(self, port_name: str) -> bool:
+        # imported here so that the GUI doesn't start the asyncio loop until a link needs it
+        from core.QtAsyncioBridge import QtAsyncioBridge
+        from core.TransportLink import TransportLink
+
+        bridge = QtAsyncioBridge.get_instance()
+        self.transport_link = TransportLink(self, bridge.loop)
+        try:
+            return bridge.run_until_complete(self.transport_link.open(port_name))
+        except (TimeoutError, ValueError) as e:
+            log.error(f"Failed to open {port_name}: {e}")
+            return False
+
     def start_reading(self):
+        if self.transport_link is not None:
+            # the link is read from the moment it's opened
+            return
+
         if not self.serial_port.isOpen():
             log.error("Tried to start reading while no serial port was open")
             return
@@ -51,32 +88,38 @@ class SerialManager(ISubject[ISerialDataListener]):
 
     # an observer that will read data from the serial plot
     def reader(self):
-        # accumulate new data to the old one
-        self.data += self.serial_port.readAll().data()
-        lines = self.data.split(b"\n")
+        """
+        Reads at most `max_read_size` bytes. The ports of all the sessions are read on the GUI thread, if more data is
+        waiting the rest is read after the events that are already pending (the reads of the other ports, redraws),
+        so a link that floods the GUI with data doesn't starve the others.
+        """
+        self._is_read_scheduled = False
+        if not self.serial_port.isOpen():
+            return
 
-        # Process all complete lines
-        # Ignore the last line as it might be incomplete
-        for line_bytes in lines[:-1]:
-            try:
-                line = line_bytes.decode().strip()
-                self.notify_listeners(line)
-            except UnicodeDecodeError:
-                log.error("UnicodeDecodeError for line: " + line_bytes)
-                continue
+        # the latency of every stage of the pipeline is measured from this moment
+        read_time_ns = time.perf_counter_ns()
+        data = self.serial_port.read(self.max_read_size)
+        if not data:
+            return
 
-            # log.info("parsed line: " + line)
+        self.on_data_read(data, read_time_ns)
 
-        # Keep the incomplete line for the next iteration
-        self.data = lines[-1]
+        # readyRead isn't emitted again for the data that is already buffered
+        if self.serial_port.bytesAvailable() > 0 and not self._is_read_scheduled:
+            self._is_read_scheduled = True
+            QTimer.singleShot(0, self.reader)
 
     def write_data(self, data: str) -> bool:
+        if self.transport_link is not None:
+            return self.transport_link.write(data.encode() + b'\r')
+
         if not self.serial_port.isOpen():
             log.error("No port is open")
             return False
 
-        self.serial_port.writeData(data.encode() + b'\r')
-        is_data_written = self.serial_port.flush()
+        # the data is buffered by QSerialPort and written by the event loop, this doesn't wait for the port
+        is_data_written = self.serial_port.write(data.encode() + b'\r') != -1
 
         # TODO: remove this, this is here just for debugging info
         if is_data_written:
@@ -90,25 +133,27 @@ class SerialManager(ISubject[ISerialDataListener]):
         """
         @return: bool - True if managed to close the port, else False
         """
+        if self.transport_link is not None:
+            return self.transport_link.close()
+
         if not self.serial_port.isOpen():
             log.error("No port is open to close")
             return False
 
         self.serial_port.readyRead.disconnect(self.reader)
+        if self.serial_port.bytesToWrite():
+            self.serial_port.waitForBytesWritten(CLOSE_WRITE_TIMEOUT_MS)
         log.debug("Closed port: " + self.serial_port.portName())
         self.serial_port.close()
+        self.line_framer.reset()
         return True
 
-    def add_listener(self, listener: ISerialDataListener):
-        self.data_listeners.append(listener)
-
-    def remove_listener(self, listener: ISerialDataListener):
-        self.data_listeners.remove(listener)
-
-    def notify_listeners(self, line):
-        for l in self.data_listeners:
-            l.on_new_line(line)
-        self.data_processing_thread.add_line(line)
-
     def is_port_open(self) -> bool:
-        return self.serial_port.isOpen()
\ No newline at end of file
+        if self.transport_link is not None:
+            return self.transport_link.is_open()
+        return self.serial_port.isOpen()
+
+    def is_writable(self) -> bool:
+        if self.transport_link is not None:
+            return self.transport_link.is_writable()
+        return self.serial_port.isOpen() and self.serial_port.bytesToWrite() < MAX_PENDING_WRITE_BYTES
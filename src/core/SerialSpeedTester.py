@@ -14,6 +14,10 @@ class SerialSpeedTester:
     last_number = None
     num_of_skipped_packets = 0
 
+    def on_new_lines(self, lines: list[str]):
+        for line in lines:
+            self.on_new_line(line)
+
     def on_new_line(self, line: str):
         if line.startswith("temp"):
             if self.last_temp_time is None:
@@ -0,0 +1,122 @@
+import logging
+import time
+
+from PyQt6.QtCore import QTimer, Qt
+
+from core.ObservableValue import create_observable_value
+from core.RawSession import RawSession, RECORD_DATA, RECORD_BINARY_MODE
+from core.SerialManager import SerialManager
+
+log = logging.getLogger()
+
+# speed that replays the session as fast as the pipeline can process it
+AS_FAST_AS_POSSIBLE = 0
+
+TICK_INTERVAL_MS = 10
+# in the as fast as possible mode the GUI gets the control back after this much time, so it can redraw the graphs
+AS_FAST_AS_POSSIBLE_TIME_SLICE_S = 0.02
+
+
+class SessionReplayer:
+    """
+    Replays a recorded raw session through SerialManager.feed_data, so the data goes through the same
+    framing -> processing thread -> parsing -> store -> graphs pipeline as the data read from the port.
+
+    Runs on the GUI thread. The records are replayed with their original timing multiplied by the speed, or as fast
+    as possible, in which case the replay works as a throughput benchmark of the whole pipeline.
+
+    :param session: the session to replay
+    :param speed: the replay speed, e.g. 1 for the original speed, AS_FAST_AS_POSSIBLE for as fast as possible
+    :param serial_manager: the SerialManager the session is replayed through, the shared one if None
+    """
+
+    def __init__(self, session: RawSession, speed: float = 1, serial_manager=None):
+        self.session = session
+        self.speed = speed
+        self.serial_manager = serial_manager if serial_manager is not None else SerialManager.get_instance()
+
+        self.position_s = create_observable_value(0.0, "replay_position_s")
+        self.is_playing = create_observable_value(False, "replay_is_playing")
+        self.is_finished = create_observable_value(False, "replay_is_finished")
+
+        self._next_index = 0
+        # wall clock time and session time of the moment the playback (re)started
+        self._play_start_wall_time = 0.0
+        self._play_start_session_time = 0.0
+
+        self.replayed_bytes = 0
+        self.elapsed_s = 0.0
+
+        self._timer = QTimer()
+        self._timer.setTimerType(Qt.TimerType.PreciseTimer)
+        self._timer.timeout.connect(self._tick)
+
+    def set_speed(self, speed: float):
+        self.speed = speed
+        self._restart_clock()
+
+    def play(self):
+        if self.is_playing.get():
+            return
+
+        if self._next_index >= len(self.session):
+            self.seek(0)
+
+        self.is_finished.set(False)
+        self._restart_clock()
+        self._timer.start(0 if self.speed == AS_FAST_AS_POSSIBLE else TICK_INTERVAL_MS)
+        self.is_playing.set(True)
+
+    def pause(self):
+        self._timer.stop()
+        self.is_playing.set(False)
+
+    def seek(self, time_s: float):
+        """
+        @param time_s: time from the start of the session
+        """
+        self._next_index = self.session.index_at(time_s)
+        # the next data doesn't continue the partially received line or frame
+        self.serial_manager.line_framer.reset()
+        self._restart_clock()
+        self.position_s.set(time_s)
+
+    def _session_time(self, index: int) -> float:
+        return float(self.session.timestamps[index] - self.session.timestamps[0])
+
+    def _restart_clock(self):
+        self._play_start_wall_time = time.perf_counter()
+        self._play_start_session_time = self._session_time(self._next_index) if self._next_index < len(self.session) \
+            else self.session.duration
+
+    def _tick(self):
+        tick_start = time.perf_counter()
+        if self.speed == AS_FAST_AS_POSSIBLE:
+            while self._next_index < len(self.session) \
+                    and time.perf_counter() - tick_start < AS_FAST_AS_POSSIBLE_TIME_SLICE_S:
+                self._replay_record(self._next_index)
+                self._next_index += 1
+        else:
+            session_time = self._play_start_session_time + (tick_start - self._play_start_wall_time) * self.speed
+            while self._next_index < len(self.session) and self._session_time(self._next_index) <= session_time:
+                self._replay_record(self._next_index)
+                self._next_index += 1
+
+        self.elapsed_s += time.perf_counter() - tick_start
+
+        if self._next_index >= len(self.session):
+            self.position_s.set(self.session.duration)
+            self.pause()
+            self.is_finished.set(True)
+            log.info(f"Replay finished, {self.replayed_bytes} bytes replayed")
+        else:
+            self.position_s.set(self._session_time(self._next_index))
+
+    def _replay_record(self, index: int):
+        kind = self.session.kinds[index]
+        if kind == RECORD_DATA:
+            data = self.session.data[index]
+            self.serial_manager.feed_data(data)
+            self.replayed_bytes += len(data)
+        else:
+            self.serial_manager.set_binary_mode(kind == RECORD_BINARY_MODE)
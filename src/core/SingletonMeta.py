@@ -21,6 +21,13 @@ class Singelton(Generic[T]):
                     self._instance = self._decorated(*args, **kwargs)
         return self._instance
 
+    def create(self, *args: Any, **kwargs: Any) -> T:
+        """
+        Creates a new instance that is independent of the shared one (the one get_instance returns),
+        e.g. for the objects of a second Session
+        """
+        return self._decorated(*args, **kwargs)
+
     def __instancecheck__(self, instance: Any) -> bool:
         return isinstance(instance, self._decorated)
 
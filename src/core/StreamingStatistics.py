@@ -0,0 +1,243 @@
+import math
+import threading
+import time
+from collections import deque
+from typing import Optional, Union
+
+import numpy as np
+
+# the statistics are kept over these windows and over the whole session
+DEFAULT_WINDOWS_S = (1, 10)
+SESSION_WINDOW = "session"
+
+# the counter sent by the ADCS is an unsigned 32 bit integer, it wraps around to 0
+DEFAULT_COUNTER_MODULUS = 2 ** 32
+
+
+class WelfordStatistics:
+    """
+    Mean and variance computed with the Welford's algorithm, so they stay accurate for any number of values.
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.mean = 0.0
+        self._m2 = 0.0
+
+    def _add_value(self, x: float):
+        self.count += 1
+        delta = x - self.mean
+        self.mean += delta / self.count
+        self._m2 += delta * (x - self.mean)
+
+    def _remove_value(self, x: float):
+        self.count -= 1
+        if self.count == 0:
+            self.mean = 0.0
+            self._m2 = 0.0
+            return
+
+        old_mean = self.mean
+        self.mean -= (x - self.mean) / self.count
+        self._m2 -= (x - old_mean) * (x - self.mean)
+
+    @property
+    def variance(self) -> float:
+        return max(self._m2 / (self.count - 1), 0.0) if self.count > 1 else 0.0
+
+    @property
+    def std(self) -> float:
+        return math.sqrt(self.variance)
+
+    @property
+    def sum(self) -> float:
+        return self.mean * self.count
+
+
+class RunningStatistics(WelfordStatistics):
+    """
+    Mean, variance, min and max of all the added values
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.min = math.inf
+        self.max = -math.inf
+
+    def add(self, x: float):
+        self._add_value(x)
+        self.min = min(self.min, x)
+        self.max = max(self.max, x)
+
+
+class WindowedStatistics(WelfordStatistics):
+    """
+    Mean, variance, min and max of the values added in the last `window_s` seconds, all in amortized O(1) per value.
+
+    The values leaving the window are removed from the Welford's mean and variance, the min and the max are kept
+    in monotonic deques (each value is pushed and popped at most once).
+
+    :param window_s: the length of the window in seconds
+    """
+
+    def __init__(self, window_s: float):
+        super().__init__()
+        self.window_s = window_s
+        # (index, time, value) of the values in the window
+        self._samples: deque[tuple[int, float, float]] = deque()
+        # (index, value), increasing values for the min and decreasing for the max
+        self._min_candidates: deque[tuple[int, float]] = deque()
+        self._max_candidates: deque[tuple[int, float]] = deque()
+        self._next_index = 0
+
+    def add(self, t: float, x: float):
+        """
+        @param t: the time of the value in seconds, the values have to be added in time order
+        """
+        self.evict(t)
+        index = self._next_index
+        self._next_index += 1
+        self._samples.append((index, t, x))
+        self._add_value(x)
+
+        while self._min_candidates and self._min_candidates[-1][1] >= x:
+            self._min_candidates.pop()
+        self._min_candidates.append((index, x))
+        while self._max_candidates and self._max_candidates[-1][1] <= x:
+            self._max_candidates.pop()
+        self._max_candidates.append((index, x))
+
+    def evict(self, now: float):
+        """
+        Removes the values that are older than the window
+        """
+        oldest_allowed_time = now - self.window_s
+        while self._samples and self._samples[0][1] <= oldest_allowed_time:
+            index, _, x = self._samples.popleft()
+            self._remove_value(x)
+
+            if self._min_candidates[0][0] == index:
+                self._min_candidates.popleft()
+            if self._max_candidates[0][0] == index:
+                self._max_candidates.popleft()
+
+    @property
+    def min(self) -> float:
+        return self._min_candidates[0][1] if self._min_candidates else math.inf
+
+    @property
+    def max(self) -> float:
+        return self._max_candidates[0][1] if self._max_candidates else -math.inf
+
+
+class PacketStatistics:
+    """
+    Statistics of the packet stream computed from the packet counter sent by the ADCS: the packet rate, the packet
+    loss (gaps in the counter, including the wraparound) and the interval between the packets and its jitter (the
+    standard deviation of the interval), over sliding time windows and over the whole session.
+
+    Thread safe, the packets are added on the processing thread and the snapshots are taken on any thread.
+
+    :param windows_s: the lengths of the sliding windows in seconds
+    :param counter_modulus: the counter wraps around to 0 after counter_modulus - 1
+    """
+
+    def __init__(self, windows_s: tuple[float, ...] = DEFAULT_WINDOWS_S,
+                 counter_modulus: int = DEFAULT_COUNTER_MODULUS):
+        self.windows_s = windows_s
+        self.counter_modulus = counter_modulus
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            # the number of lost packets before each received packet
+            self._lost_packets = {window_s: WindowedStatistics(window_s) for window_s in self.windows_s}
+            self._intervals_ms = {window_s: WindowedStatistics(window_s) for window_s in self.windows_s}
+            self._session_intervals_ms = RunningStatistics()
+
+            self.received_packets = 0
+            self.lost_packets = 0
+            # counters that went backwards, e.g. the ADCS was restarted
+            self.counter_resets = 0
+            self._last_counter: Optional[int] = None
+            self._last_time: Optional[float] = None
+            self._start_time: Optional[float] = None
+
+    def add_packets(self, counters: np.ndarray, timestamps: np.ndarray):
+        """
+        @param counters: the packet counters
+        @param timestamps: the receive times of the packets in seconds
+        """
+        with self._lock:
+            for counter, t in zip(counters.ravel().tolist(), timestamps.ravel().tolist()):
+                self._add_packet(int(counter), t)
+
+    def _add_packet(self, counter: int, t: float):
+        lost = 0
+        if self._last_counter is not None:
+            lost = (counter - self._last_counter - 1) % self.counter_modulus
+            # a "gap" bigger than half of the counter range is a counter that went backwards
+            if lost > self.counter_modulus // 2:
+                self.counter_resets += 1
+                lost = 0
+
+            interval_ms = (t - self._last_time) * 1000
+            self._session_intervals_ms.add(interval_ms)
+            for intervals_ms in self._intervals_ms.values():
+                intervals_ms.add(t, interval_ms)
+        else:
+            self._start_time = t
+
+        for lost_packets in self._lost_packets.values():
+            lost_packets.add(t, lost)
+
+        self.received_packets += 1
+        self.lost_packets += lost
+        self._last_counter = counter
+        self._last_time = t
+
+    def snapshot(self, now: Optional[float] = None) -> dict[str, dict[str, float]]:
+        """
+        @param now: the time the windows end at, in the same clock as the timestamps, `time.time()` if None
+        @return: statistics keyed by the window ("1s", "10s", ..., "session"): packets_per_second, received, lost,
+            loss_rate (0-1) and the interval mean_ms, jitter_ms, min_ms and max_ms, the session also has the
+            counter_resets and idle_s, the time since the last packet
+        """
+        now = time.time() if now is None else now
+
+        with self._lock:
+            session_s = now - self._start_time if self._start_time is not None else 0
+            snapshot = {}
+            for window_s in self.windows_s:
+                lost_packets = self._lost_packets[window_s]
+                intervals_ms = self._intervals_ms[window_s]
+                lost_packets.evict(now)
+                intervals_ms.evict(now)
+
+                snapshot[f"{window_s:g}s"] = self._window_snapshot(
+                    # the window isn't full at the start of the session
+                    lost_packets.count, int(round(lost_packets.sum)), min(window_s, session_s), intervals_ms
+                )
+
+            snapshot[SESSION_WINDOW] = self._window_snapshot(
+                self.received_packets, self.lost_packets, session_s, self._session_intervals_ms
+            )
+            snapshot[SESSION_WINDOW]["counter_resets"] = self.counter_resets
+            snapshot[SESSION_WINDOW]["idle_s"] = now - self._last_time if self._last_time is not None else session_s
+            return snapshot
+
+    @staticmethod
+    def _window_snapshot(received: int, lost: int, window_s: float,
+                         intervals_ms: Union[RunningStatistics, WindowedStatistics]) -> dict:
+        has_intervals = intervals_ms.count > 0
+        return {
+            "packets_per_second": received / window_s if window_s > 0 else 0.0,
+            "received": received,
+            "lost": lost,
+            "loss_rate": lost / (received + lost) if received + lost else 0.0,
+            "mean_ms": intervals_ms.mean if has_intervals else 0.0,
+            "jitter_ms": intervals_ms.std,
+            "min_ms": intervals_ms.min if has_intervals else 0.0,
+            "max_ms": intervals_ms.max if has_intervals else 0.0,
+        }
@@ -0,0 +1,250 @@
+import json
+import logging
+import os
+import queue
+import threading
+import time
+from collections import defaultdict
+from typing import Optional
+
+import numpy as np
+
+from stores.GlobalStore import State
+
+log = logging.getLogger()
+
+RECORDINGS_DIR = "recordings"
+METADATA_FILE_NAME = "recording.json"
+
+# number of samples in one chunk file
+DEFAULT_CHUNK_SIZE = 8192
+# max number of blocks waiting for the writer thread, blocks that don't fit are dropped
+DEFAULT_MAX_PENDING_BLOCKS = 4096
+# an incomplete chunk is written after this many seconds, so a crash doesn't lose minutes of the slow streams
+DEFAULT_MAX_CHUNK_AGE_S = 5.0
+
+# columns of the recorded data, every chunk has a timestamp column followed by these
+COLUMNS = {
+    "counter": ["counter"],
+    "acc": ["X", "Y", "Z"],
+    "gyro": ["X", "Y", "Z"],
+    "angle": ["X", "Y", "Z"],
+    "mag": ["X", "Y", "Z"],
+    "temp": ["temp"],
+    # the motor speeds that were sent, see State.add_motor_speed
+    "motor": ["motor", "speed"],
+}
+
+
+def create_recording_directory(suffix: str = "") -> str:
+    """
+    @param suffix: appended to the name, e.g. the name of the session, so the recordings of several boards started
+        at the same time don't end up in the same directory
+    """
+    name = time.strftime("%Y-%m-%d_%H-%M-%S")
+    if suffix:
+        name += "_" + suffix.replace(" ", "_")
+    return os.path.join(RECORDINGS_DIR, name)
+
+
+class TelemetryRecorder:
+    """
+    Records the parsed IMU data stream to a directory of chunked columnar files.
+
+    Every stream (counter, acc, gyro, ...) gets its own sub directory with `.npy` chunks of shape
+    (chunk_size, 1 + number of values), the first column is the timestamp. The samples are handed over to a
+    background writer thread through a bounded queue, if the writer can't keep up the samples are dropped instead of
+    blocking the serial data processing. A chunk is also written when its oldest sample waited for max_chunk_age_s,
+    so the chunks of the slow streams can be shorter than chunk_size.
+
+    If writing fails (e.g. the disk is full) the error is kept in `error` and the following samples are dropped.
+
+    :param directory: the directory the recording is written to, it's created if it doesn't exist
+    :param store: the State that is recorded, the shared one if None
+    """
+
+    def __init__(self, directory: str, chunk_size: int = DEFAULT_CHUNK_SIZE,
+                 max_pending_blocks: int = DEFAULT_MAX_PENDING_BLOCKS, max_chunk_age_s: float = DEFAULT_MAX_CHUNK_AGE_S,
+                 store=None):
+        self.directory = directory
+        self.chunk_size = chunk_size
+        self.max_chunk_age_s = max_chunk_age_s
+        self.store = store if store is not None else State.get_instance()
+
+        self._queue: queue.Queue[Optional[tuple[str, np.ndarray]]] = queue.Queue(max_pending_blocks)
+        self._writer_thread: Optional[threading.Thread] = None
+
+        self.recorded_samples = 0
+        self.dropped_samples = 0
+        self.error: Optional[Exception] = None
+
+    @property
+    def is_recording(self) -> bool:
+        return self._writer_thread is not None
+
+    def start(self):
+        if self.is_recording:
+            return
+
+        os.makedirs(self.directory, exist_ok=True)
+        with open(os.path.join(self.directory, METADATA_FILE_NAME), "w") as f:
+            json.dump({"start_time": time.time(), "columns": COLUMNS}, f, indent=4)
+
+        self._writer_thread = threading.Thread(target=self._write_chunks, name="TelemetryRecorder", daemon=True)
+        self._writer_thread.start()
+        self.store.add_stream_listener(self.on_samples)
+        log.info(f"Recording telemetry to {self.directory}")
+
+    def stop(self):
+        """
+        Stops the recording, waits until all the queued samples are written
+        """
+        if not self.is_recording:
+            return
+
+        self.store.remove_stream_listener(self.on_samples)
+        # the writer could have died on an error with the queue full, then nobody would take the None
+        while self._writer_thread.is_alive():
+            try:
+                self._queue.put(None, timeout=0.1)
+                break
+            except queue.Full:
+                pass
+        self._writer_thread.join()
+        self._writer_thread = None
+        log.info(f"Recording stopped, {self.recorded_samples} samples recorded, {self.dropped_samples} dropped")
+
+    def on_samples(self, name: str, timestamps: np.ndarray, values: np.ndarray):
+        if self.error is not None:
+            self.dropped_samples += len(timestamps)
+            return
+
+        block = np.column_stack((timestamps, values.reshape(len(timestamps), -1)))
+        try:
+            self._queue.put_nowait((name, block))
+        except queue.Full:
+            self.dropped_samples += len(block)
+
+    def _write_chunks(self):
+        try:
+            self._write_chunks_until_stopped()
+        except Exception as e:
+            log.exception(f"Writing the recording to {self.directory} failed, the following samples are dropped")
+            self.error = e
+            # nothing is written anymore, the queued samples are dropped too
+            while True:
+                try:
+                    item = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if item is not None:
+                    self.dropped_samples += len(item[1])
+
+    def _write_chunks_until_stopped(self):
+        pending: dict[str, list[np.ndarray]] = defaultdict(list)
+        pending_lengths: dict[str, int] = defaultdict(int)
+        # the time the first pending block of a stream was received
+        pending_since: dict[str, float] = {}
+        chunk_indices: dict[str, int] = defaultdict(int)
+
+        def write_chunk(stream_name: str):
+            chunk = np.concatenate(pending.pop(stream_name))
+            pending_lengths.pop(stream_name)
+            pending_since.pop(stream_name)
+
+            stream_directory = os.path.join(self.directory, stream_name)
+            os.makedirs(stream_directory, exist_ok=True)
+            np.save(os.path.join(stream_directory, f"{chunk_indices[stream_name]:06d}.npy"), chunk)
+            chunk_indices[stream_name] += 1
+            self.recorded_samples += len(chunk)
+
+        while True:
+            try:
+                item = self._queue.get(timeout=self.max_chunk_age_s)
+            except queue.Empty:
+                pass
+            else:
+                if item is None:
+                    break
+
+                name, block = item
+                pending[name].append(block)
+                pending_lengths[name] += len(block)
+                pending_since.setdefault(name, time.monotonic())
+                if pending_lengths[name] >= self.chunk_size:
+                    write_chunk(name)
+
+            now = time.monotonic()
+            for name in [name for name, since in pending_since.items() if now - since >= self.max_chunk_age_s]:
+                write_chunk(name)
+
+        # write the incomplete chunks
+        for name in list(pending.keys()):
+            write_chunk(name)
+
+
+class RecordingReader:
+    """
+    Reads a recording made by the TelemetryRecorder.
+
+    The chunks are memory mapped, so opening even a multi-hour recording doesn't read the data, only the parts
+    that are accessed are loaded from the disk.
+    """
+
+    def __init__(self, directory: str):
+        self.directory = directory
+
+        with open(os.path.join(directory, METADATA_FILE_NAME), "r") as f:
+            metadata = json.load(f)
+        self.start_time: float = metadata["start_time"]
+        self.columns: dict[str, list[str]] = metadata["columns"]
+
+        self.chunks: dict[str, list[np.ndarray]] = {}
+        for name in sorted(os.listdir(directory)):
+            stream_directory = os.path.join(directory, name)
+            if not os.path.isdir(stream_directory):
+                continue
+
+            self.chunks[name] = [
+                np.load(os.path.join(stream_directory, chunk_file_name), mmap_mode="r")
+                for chunk_file_name in sorted(os.listdir(stream_directory))
+                if chunk_file_name.endswith(".npy")
+            ]
+
+    def streams(self) -> list[str]:
+        return list(self.chunks.keys())
+
+    def __len__(self):
+        return sum(len(chunk) for chunks in self.chunks.values() for chunk in chunks)
+
+    def read(self, name: str, start_time: Optional[float] = None, end_time: Optional[float] = None) -> np.ndarray:
+        """
+        Reads the samples of a stream, only the chunks that overlap the time range are loaded
+        @param name: the name of the stream, e.g. "gyro"
+        @param start_time: the time of the first sample to read, from the start of the recording if None
+        @param end_time: the time of the last sample to read, to the end of the recording if None
+        @return: array of shape (n, 1 + number of values), the first column is the timestamp
+        """
+        start_time = -np.inf if start_time is None else start_time
+        end_time = np.inf if end_time is None else end_time
+
+        parts = []
+        for chunk in self.chunks.get(name, []):
+            # the chunks are ordered by time, so only the first and the last timestamp have to be read
+            if len(chunk) == 0 or chunk[-1, 0] < start_time:
+                continue
+            if chunk[0, 0] > end_time:
+                break
+
+            timestamps = chunk[:, 0]
+            parts.append(chunk[np.searchsorted(timestamps, start_time):np.searchsorted(timestamps, end_time, "right")])
+
+        if not parts:
+            return np.zeros((0, 1 + len(self.columns.get(name, []))))
+        return np.concatenate(parts)
+
+    def timestamps(self, name: str) -> np.ndarray:
+        return self.read(name)[:, 0]
+
+    def values(self, name: str) -> np.ndarray:
+        return self.read(name)[:, 1:]
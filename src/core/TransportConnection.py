@@ -0,0 +1,73 @@
+import asyncio
+import logging
+
+from core.LineStream import LineStream
+from core.SerialConnection import SerialConnection, DEFAULT_MAX_READ_SIZE
+from core.TransportLink import TransportLink
+
+log = logging.getLogger()
+
+
+class TransportConnection(SerialConnection):
+    """
+    The connection to one ADCS over an asyncio transport (a tty, a TCP socket or a replayed session, see
+    TransportLink), used by the headless mode.
+
+    Made to scale to many links in one process: the links are read by the one loop and their data is processed by
+    the shared pool of the LineStreams, no link has a thread of its own. A link that sends more than can be processed
+    is paused until its queue drains, a link that can't take the commands fast enough keeps them queued (see
+    `is_writable`). Has to be used on the thread of the loop.
+
+    :param loop: the loop that reads and writes the link
+    :param state: the State the received data is stored to, the shared one if None
+    :param max_read_size: the max number of bytes handled by a single read
+    """
+
+    def __init__(self, loop: asyncio.AbstractEventLoop, state=None, max_read_size: int = DEFAULT_MAX_READ_SIZE):
+        self.loop = loop
+        self.link = TransportLink(self, loop)
+        super().__init__(state, max_read_size)
+
+    def create_data_processor(self, state) -> LineStream:
+        return LineStream(self.loop, self.link.pause_reading, self.link.resume_reading, state=state)
+
+    async def open_port(self, port_name: str, baud_rate: int = 115200, data_bits: int = 8,
+                        stop_bits: float = 1) -> bool:
+        """
+        @param port_name: a tty, tcp://host:port or replay://path?speed=1, see TransportLink.open
+        """
+        log.debug("Opening port: " + port_name)
+        return await self.link.open(port_name, baud_rate, data_bits, stop_bits)
+
+    @property
+    def port_name(self) -> str:
+        return self.link.name
+
+    @property
+    def bytes_read(self) -> int:
+        return self.link.bytes_read
+
+    @property
+    def bytes_written(self) -> int:
+        return self.link.bytes_written
+
+    def write_data(self, data: str) -> bool:
+        return self.link.write(data.encode() + b'\r')
+
+    def is_port_open(self) -> bool:
+        return self.link.is_open()
+
+    def is_writable(self) -> bool:
+        return self.link.is_writable()
+
+    def close_port(self) -> bool:
+        """
+        @return: bool - True if managed to close the port, else False
+        """
+        return self.link.close()
+
+    async def wait_closed(self):
+        """
+        Waits until the port is closed, also by the other end
+        """
+        await self.link.wait_closed()
@@ -0,0 +1,268 @@
+import asyncio
+import logging
+import os
+import time
+from typing import Optional
+from urllib.parse import urlsplit, parse_qs
+
+from core.RawSession import RawSession
+from core.ReplayTransport import ReplayTransport
+
+# POSIX only, the pty backend isn't available without it
+try:
+    import termios
+except ImportError:
+    termios = None
+
+log = logging.getLogger()
+
+TCP_URL_SCHEME = "tcp"
+REPLAY_URL_SCHEME = "replay"
+
+# the commands are small, a link that has this much unwritten data is congested and the commands wait in their queue
+# (see ADCSCommandsSender.pump_commands), so the setpoints are coalesced instead of piling up in the buffer
+WRITE_BUFFER_HIGH_WATER = 1024
+WRITE_BUFFER_LOW_WATER = 256
+
+
+def is_link_url(port_name: str) -> bool:
+    """
+    @return: True for the names that aren't serial ports, e.g. tcp://localhost:2000 or replay://recording.bin
+    """
+    return urlsplit(port_name).scheme in (TCP_URL_SCHEME, REPLAY_URL_SCHEME)
+
+
+def configure_tty(fd: int, baud_rate: int, data_bits: int = 8, stop_bits: float = 1):
+    """
+    Puts the tty into the raw mode (no echo, no line editing, no translation of the line endings) with the given
+    settings, no parity and no flow control, the same settings SerialManager uses for the QSerialPort
+    """
+    data_bits_flags = {5: termios.CS5, 6: termios.CS6, 7: termios.CS7, 8: termios.CS8}
+    iflag, oflag, cflag, lflag, _, _, cc = termios.tcgetattr(fd)
+
+    iflag &= ~(termios.IGNBRK | termios.BRKINT | termios.PARMRK | termios.ISTRIP | termios.INLCR | termios.IGNCR
+               | termios.ICRNL | termios.IXON | termios.IXOFF | termios.IXANY)
+    oflag &= ~termios.OPOST
+    lflag &= ~(termios.ECHO | termios.ECHONL | termios.ICANON | termios.ISIG | termios.IEXTEN)
+    cflag &= ~(termios.CSIZE | termios.PARENB | termios.CSTOPB | getattr(termios, "CRTSCTS", 0))
+    cflag |= termios.CLOCAL | termios.CREAD | data_bits_flags[data_bits]
+    if stop_bits == 2:
+        cflag |= termios.CSTOPB
+
+    # the reads never block, asyncio tells when there's data
+    cc[termios.VMIN] = 0
+    cc[termios.VTIME] = 0
+
+    speed = getattr(termios, f"B{baud_rate}")
+    termios.tcsetattr(fd, termios.TCSANOW, [iflag, oflag, cflag, lflag, speed, speed, cc])
+
+
+class LinkProtocol(asyncio.Protocol):
+    """
+    Forwards the events of an asyncio transport to its TransportLink
+    """
+
+    def __init__(self, link: "TransportLink"):
+        self.link = link
+
+    def data_received(self, data: bytes):
+        self.link.on_data_received(data)
+
+    def eof_received(self):
+        # the transport is closed, connection_lost follows
+        return False
+
+    def pause_writing(self):
+        self.link.is_writing_paused = True
+
+    def resume_writing(self):
+        self.link.is_writing_paused = False
+
+    def connection_lost(self, exc: Optional[Exception]):
+        self.link.on_connection_lost(exc)
+
+
+class TransportLink:
+    """
+    The asyncio transport of one link to an ADCS, the data it reads goes to `connection.on_data_read`, so it goes
+    through the same framing -> parsing -> store pipeline as the data of the QSerialPort. The backends:
+    - a tty or pty (e.g. /dev/rfcomm0 or the simulator), POSIX only
+    - a TCP socket, `tcp://host:port`, e.g. a ser2net bridge to a port on another machine
+    - a recorded raw session, `replay://path?speed=2`, replayed with its original timing (see ReplayTransport)
+
+    Nothing blocks and nothing needs a thread: the loop reads the link when it has data (at most `max_read_size`
+    bytes at once, see SerialConnection), the writes are buffered by the transport. Both directions are
+    backpressure aware, `pause_reading` stops the reads until `resume_reading` (the kernel buffer, the TCP window
+    or the replay waits meanwhile), `is_writable` is False while the transport has too much unwritten data.
+    Has to be used on the thread of the loop.
+
+    :param connection: the SerialConnection that gets the data
+    :param loop: the loop that runs the transport
+    """
+
+    def __init__(self, connection, loop: asyncio.AbstractEventLoop):
+        self.connection = connection
+        self.loop = loop
+        self.name = ""
+
+        self._read_transport: Optional[asyncio.ReadTransport] = None
+        self._write_transport: Optional[asyncio.WriteTransport] = None
+        self._closed = asyncio.Event()
+        self._closed.set()
+
+        self.is_writing_paused = False
+        self.is_reading_paused = False
+
+        self.bytes_read = 0
+        self.bytes_written = 0
+
+    async def open(self, port_name: str, baud_rate: int = 115200, data_bits: int = 8, stop_bits: float = 1) -> bool:
+        """
+        Opens a tty, a tcp:// or a replay:// link, the serial settings are used only for the tty
+        """
+        url = urlsplit(port_name)
+        if url.scheme == TCP_URL_SCHEME:
+            return await self.open_tcp(url.hostname, url.port)
+        if url.scheme == REPLAY_URL_SCHEME:
+            speed = float(parse_qs(url.query).get("speed", ["1"])[0])
+            return self.open_replay(url.netloc + url.path, speed)
+        return await self.open_tty(port_name, baud_rate, data_bits, stop_bits)
+
+    async def open_tty(self, port_name: str, baud_rate: int, data_bits: int = 8, stop_bits: float = 1) -> bool:
+        if termios is None:
+            log.error("Serial ports can be opened as an asyncio link only on POSIX systems")
+            return False
+
+        try:
+            fd = os.open(port_name, os.O_RDWR | os.O_NOCTTY | os.O_NONBLOCK)
+        except OSError as e:
+            log.error(f"Failed to open {port_name}: {e}")
+            return False
+
+        try:
+            if os.isatty(fd):
+                configure_tty(fd, baud_rate, data_bits, stop_bits)
+        except (termios.error, AttributeError, KeyError) as e:
+            os.close(fd)
+            log.error(f"Failed to configure {port_name}: {e}")
+            return False
+
+        self._before_open(port_name)
+        protocol = LinkProtocol(self)
+        # asyncio has separate transports for reading and writing a file descriptor, the write one gets a copy
+        read_file = os.fdopen(fd, "rb", buffering=0)
+        write_file = os.fdopen(os.dup(fd), "wb", buffering=0)
+        self._read_transport, _ = await self.loop.connect_read_pipe(lambda: protocol, read_file)
+        self._write_transport, _ = await self.loop.connect_write_pipe(lambda: protocol, write_file)
+        self._after_open()
+        return True
+
+    async def open_tcp(self, host: str, port: int) -> bool:
+        try:
+            transport, _ = await self.loop.create_connection(lambda: LinkProtocol(self), host, port)
+        except OSError as e:
+            log.error(f"Failed to connect to {host}:{port}: {e}")
+            return False
+
+        self._before_open(f"{TCP_URL_SCHEME}://{host}:{port}")
+        self._read_transport = self._write_transport = transport
+        self._after_open()
+        return True
+
+    def open_replay(self, path: str, speed: float = 1) -> bool:
+        try:
+            session = RawSession.load(path)
+        except OSError as e:
+            log.error(f"Failed to load {path}: {e}")
+            return False
+
+        self._before_open(f"{REPLAY_URL_SCHEME}://{path}")
+        transport = ReplayTransport(self.loop, LinkProtocol(self), session, speed,
+                                    on_mode_changed=self.connection.set_binary_mode)
+        self._read_transport = self._write_transport = transport
+        self._after_open()
+        transport.start()
+        return True
+
+    def _before_open(self, name: str):
+        if self.is_open():
+            log.warning(f"Link was already open ({self.name}), closing the connection")
+            self.close()
+
+        self.name = name
+        self.is_writing_paused = False
+        self.is_reading_paused = False
+        self._closed.clear()
+
+    def _after_open(self):
+        # the transports read up to 256KB at once by default, the reads of one link are sliced like the ones
+        # of the QSerialPort, so the other links get the loop between them
+        self._read_transport.max_size = self.connection.max_read_size
+        self._write_transport.set_write_buffer_limits(WRITE_BUFFER_HIGH_WATER, WRITE_BUFFER_LOW_WATER)
+        log.debug("Opened link: " + self.name)
+
+    def on_data_received(self, data: bytes):
+        # the latency of every stage of the pipeline is measured from this moment
+        read_time_ns = time.perf_counter_ns()
+        self.bytes_read += len(data)
+        self.connection.on_data_read(data, read_time_ns)
+
+    def on_connection_lost(self, exc: Optional[Exception]):
+        if self._closed.is_set():
+            return
+
+        if exc is not None:
+            log.error(f"{self.name} failed: {exc}")
+        else:
+            log.info(f"{self.name} was closed")
+        self.close()
+
+    def write(self, data: bytes) -> bool:
+        if not self.is_open():
+            log.error("No link is open")
+            return False
+
+        self._write_transport.write(data)
+        self.bytes_written += len(data)
+        return True
+
+    def is_open(self) -> bool:
+        return not self._closed.is_set()
+
+    def is_writable(self) -> bool:
+        return self.is_open() and not self.is_writing_paused
+
+    def pause_reading(self):
+        if self.is_open() and not self.is_reading_paused:
+            self.is_reading_paused = True
+            self._read_transport.pause_reading()
+
+    def resume_reading(self):
+        if self.is_open() and self.is_reading_paused:
+            self.is_reading_paused = False
+            self._read_transport.resume_reading()
+
+    def close(self) -> bool:
+        """
+        @return: bool - True if managed to close the link, else False
+        """
+        if not self.is_open():
+            log.error("No link is open to close")
+            return False
+
+        # set first, closing the transports calls connection_lost
+        self._closed.set()
+        self._read_transport.close()
+        if self._write_transport is not self._read_transport:
+            self._write_transport.close()
+        self._read_transport = self._write_transport = None
+
+        self.connection.line_framer.reset()
+        log.debug("Closed link: " + self.name)
+        return True
+
+    async def wait_closed(self):
+        """
+        Waits until the link is closed, also by the other end
+        """
+        await self._closed.wait()
@@ -1,7 +1,9 @@
+# only the modules that need neither Qt nor the store are imported here, so `core.X` can be imported without Qt
+# (e.g. by the headless mode) and before `stores.GlobalStore`, import SerialManager and SerialDataParser from
+# their modules
 from .ISerialDataListener import ISerialDataListener
 from .ISubject import ISubject
 from .ObservableValue import Observable, ObservableValue
-from .SerialDataParser import SerialDataParser
-from .SerialManager import SerialManager
+from .RingBuffer import RingBuffer
 from .SerialSpeedTester import SerialSpeedTester
 from .SingletonMeta import SingletonMeta
@@ -0,0 +1,278 @@
+"""
+Headless mode: reads one or more ADCS boards without the GUI, e.g. for long soak tests and logging on a machine
+without a display.
+
+The data goes through the same pipeline as in the GUI (framing -> processing -> SerialDataParser -> State), the
+commands through the same ADCSCommandsSender, only the links are asyncio transports (see TransportConnection)
+instead of QSerialPorts, so neither Qt nor pyqtgraph are imported. A link is a tty, a TCP socket (tcp://host:port,
+e.g. a ser2net bridge) or a recorded raw session (replay://path?speed=1, speed 0 for as fast as possible), all the
+links are read by one loop and processed by a shared thread pool. The statistics (packets, losses, latency, queues,
+memory) are logged periodically and can be appended to a JSON lines file, the telemetry and the raw session can be
+recorded like from the Debug Info tab.
+
+    python headless.py /dev/rfcomm0 --command "imu start" --record --stats-interval 10
+    python headless.py tcp://192.168.1.20:2000 tcp://192.168.1.21:2000 --command "imu start"
+
+The ttys can be opened only on POSIX systems, they're configured with termios.
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import resource
+import signal
+import sys
+import time
+from typing import Optional
+
+from core.ADCSCommandsSender import ADCSCommandsSender, COMMAND_PUMP_INTERVAL_MS
+from core.LatencyTracker import LatencyTracker
+from core.RawSession import RAW_SESSION_FILE_NAME
+from core.TelemetryRecorder import TelemetryRecorder, create_recording_directory
+from core.TransportConnection import TransportConnection
+from stores.GlobalStore import State
+
+log = logging.getLogger()
+
+DEFAULT_STATS_INTERVAL_S = 5
+
+
+class Link:
+    """
+    Everything the headless mode needs for one board, like a DeviceSession of the GUI
+    """
+
+    def __init__(self, state, connection: TransportConnection, commands_sender: ADCSCommandsSender):
+        self.state = state
+        self.connection = connection
+        self.commands_sender = commands_sender
+        self.telemetry_recorder: Optional[TelemetryRecorder] = None
+
+    def start_recording(self, directory: str):
+        self.telemetry_recorder = TelemetryRecorder(directory, store=self.state)
+        self.telemetry_recorder.start()
+        # the raw data is recorded as well, so the session can be replayed in the GUI
+        self.connection.start_raw_session_recording(os.path.join(directory, RAW_SESSION_FILE_NAME))
+
+    def stop(self):
+        if self.telemetry_recorder is not None:
+            self.telemetry_recorder.stop()
+        self.commands_sender.stop()
+        self.connection.stop()
+
+
+def collect_stats(state, connection: TransportConnection, commands_sender: ADCSCommandsSender,
+                  telemetry_recorder: Optional[TelemetryRecorder], start_time: float) -> dict:
+    """
+    @return: a JSON serializable snapshot of the statistics of the pipeline of one link
+    """
+    state.publish_packet_statistics()
+    processing_thread = connection.data_processing_thread
+    command_scheduler = commands_sender.command_scheduler
+
+    stats = {
+        "link": connection.port_name,
+        "time": time.time(),
+        "uptime_s": round(time.time() - start_time, 3),
+        # kilobytes on Linux
+        "max_rss_kb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+        "port": {
+            "is_open": connection.is_port_open(),
+            "is_writable": connection.is_writable(),
+            "bytes_read": connection.bytes_read,
+            "bytes_written": connection.bytes_written,
+            "framer_dropped_bytes": connection.line_framer.dropped_bytes,
+            "binary_crc_errors": processing_thread.binary_decoder.crc_errors,
+            "binary_lost_frames": processing_thread.binary_decoder.lost_frames,
+            "binary_truncated_bytes": processing_thread.binary_decoder.truncated_bytes,
+        },
+        "packets": state.packet_statistics_snapshot.get(),
+        "processing": {
+            "queue_depth": processing_thread.queue_depth,
+            "last_batch_lag_ms": processing_thread.last_batch_lag_ms,
+            "max_batch_lag_ms": processing_thread.max_batch_lag_ms,
+            "lines_processed": processing_thread.total_lines_processed,
+            "batches_processed": processing_thread.total_batches_processed,
+            "failed_batches": processing_thread.failed_batches,
+            "times_paused": processing_thread.times_paused,
+        },
+        "latency": LatencyTracker.get_instance().summary(),
+        "commands": {
+            "queued": command_scheduler.queue_depth,
+            "sent": command_scheduler.sent_commands,
+            "coalesced": command_scheduler.coalesced_commands,
+            "dropped": command_scheduler.dropped_commands,
+            "failed": command_scheduler.failed_commands,
+        },
+    }
+    if telemetry_recorder is not None:
+        stats["recording"] = {
+            "directory": telemetry_recorder.directory,
+            "recorded_samples": telemetry_recorder.recorded_samples,
+            "dropped_samples": telemetry_recorder.dropped_samples,
+            "error": None if telemetry_recorder.error is None else str(telemetry_recorder.error),
+        }
+    return stats
+
+
+def format_stats(stats: dict) -> str:
+    packets = stats["packets"]["10s"]
+    session = stats["packets"]["session"]
+    latency = stats["latency"]
+    store_latency = latency.get("store", {})
+    return (
+        f"{stats['link']}: {packets['packets_per_second']:.1f} packets/s (10s), {session['received']} received, "
+        f"{session['lost']} lost ({session['loss_rate']:.2%}) | "
+        f"queue {stats['processing']['queue_depth']}, batch lag max {stats['processing']['max_batch_lag_ms']:.1f}ms | "
+        f"store latency p50 {store_latency.get('p50_ms', 0):.2f}ms p99 {store_latency.get('p99_ms', 0):.2f}ms | "
+        f"commands {stats['commands']['sent']} sent, {stats['commands']['failed']} failed | "
+        f"max RSS {stats['max_rss_kb'] / 1024:.1f}MB"
+    )
+
+
+async def pump_commands(links: list[Link]):
+    # does what the QTimers of the senders do in the GUI
+    while True:
+        for link in links:
+            link.commands_sender.pump_commands()
+        await asyncio.sleep(COMMAND_PUMP_INTERVAL_MS / 1000)
+
+
+async def open_link(loop: asyncio.AbstractEventLoop, port_name: str, index: int, args: argparse.Namespace) \
+        -> Optional[Link]:
+    if index == 0:
+        # the shared instances, so everything that uses them works with the first link
+        state = State.get_instance()
+        connection = TransportConnection(loop, state)
+        commands_sender = ADCSCommandsSender.get_instance(connection, state, has_command_timer=False)
+    else:
+        state = State.create()
+        connection = TransportConnection(loop, state)
+        commands_sender = ADCSCommandsSender.create(connection, state, has_command_timer=False)
+    link = Link(state, connection, commands_sender)
+
+    if not await connection.open_port(port_name, args.baud, args.data_bits, args.stop_bits):
+        link.stop()
+        return None
+    log.info(f"Reading {connection.port_name}")
+
+    if args.record is not None:
+        if not args.record:
+            directory = create_recording_directory(f"headless {index + 1}" if len(args.ports) > 1 else "headless")
+        else:
+            directory = os.path.join(args.record, f"link_{index + 1}") if len(args.ports) > 1 else args.record
+        link.start_recording(directory)
+
+    if args.binary:
+        commands_sender.set_telemetry_mode(True)
+    for command in args.command:
+        commands_sender.send_command(command)
+    return link
+
+
+async def run(args: argparse.Namespace) -> int:
+    start_time = time.time()
+    loop = asyncio.get_running_loop()
+
+    links = []
+    for index, port_name in enumerate(args.ports):
+        link = await open_link(loop, port_name, index, args)
+        if link is None:
+            for opened_link in links:
+                opened_link.stop()
+            return 1
+        links.append(link)
+
+    stop_event = asyncio.Event()
+    for signal_number in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(signal_number, stop_event.set)
+    if args.duration is not None:
+        loop.call_later(args.duration, stop_event.set)
+
+    stats_file = open(args.stats_file, "a") if args.stats_file else None
+
+    def report_stats():
+        for link in links:
+            stats = collect_stats(link.state, link.connection, link.commands_sender, link.telemetry_recorder,
+                                  start_time)
+            log.info(format_stats(stats))
+            if stats_file is not None:
+                stats_file.write(json.dumps(stats) + "\n")
+        if stats_file is not None:
+            stats_file.flush()
+
+    async def report_stats_periodically():
+        while True:
+            await asyncio.sleep(args.stats_interval)
+            report_stats()
+
+    async def wait_all_closed():
+        await asyncio.gather(*(link.connection.wait_closed() for link in links))
+
+    tasks = [
+        asyncio.create_task(pump_commands(links)),
+        asyncio.create_task(report_stats_periodically()),
+    ]
+    stop_task = asyncio.create_task(stop_event.wait())
+    closed_task = asyncio.create_task(wait_all_closed())
+    await asyncio.wait([stop_task, closed_task], return_when=asyncio.FIRST_COMPLETED)
+
+    is_closed_by_other_end = closed_task.done() and not stop_task.done()
+    for task in tasks + [stop_task, closed_task]:
+        task.cancel()
+
+    # written right away, the links are still open unless the other end closed them, the transports write what
+    # they buffered before they close
+    for link in links:
+        for command in args.stop_command:
+            link.commands_sender.send_command(command)
+        link.commands_sender.pump_commands()
+
+    for link in links:
+        link.stop()
+    report_stats()
+    if stats_file is not None:
+        stats_file.close()
+
+    return 2 if is_closed_by_other_end else 0
+
+
+def parse_args(argv: Optional[list[str]] = None) -> argparse.Namespace:
+    arg_parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    arg_parser.add_argument("ports", nargs="+", metavar="port",
+                            help="the links, e.g. /dev/rfcomm0, the pty of the simulator, tcp://host:port or "
+                                 "replay://recordings/raw_session.bin?speed=0")
+    arg_parser.add_argument("--baud", type=int, default=115200)
+    arg_parser.add_argument("--data-bits", type=int, default=8, choices=[5, 6, 7, 8])
+    arg_parser.add_argument("--stop-bits", type=int, default=1, choices=[1, 2])
+    arg_parser.add_argument("--binary", action="store_true", help="switch the ADCS to the binary telemetry")
+    arg_parser.add_argument("--command", action="append", default=[],
+                            help="a command sent after the port is opened, e.g. \"imu start\", can be repeated")
+    arg_parser.add_argument("--stop-command", action="append", default=[],
+                            help="a command sent before the port is closed, e.g. \"imu stop\", can be repeated")
+    arg_parser.add_argument("--record", nargs="?", const="", metavar="DIRECTORY",
+                            help="record the telemetry and the raw session, to a new directory in recordings/ "
+                                 "if no directory is given (a subdirectory for each link if there are more)")
+    arg_parser.add_argument("--duration", type=float, help="stop after this many seconds")
+    arg_parser.add_argument("--stats-interval", type=float, default=DEFAULT_STATS_INTERVAL_S,
+                            help="seconds between two statistics reports")
+    arg_parser.add_argument("--stats-file", help="append the statistics reports to this file as JSON lines")
+    arg_parser.add_argument("--log-level", default="INFO")
+    arg_parser.add_argument("--log-file", help="log to this file instead of stderr")
+    return arg_parser.parse_args(argv)
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    args = parse_args(argv)
+    logging.basicConfig(
+        level=args.log_level.upper(),
+        filename=args.log_file,
+        format="%(asctime)s %(levelname)s %(message)s",
+    )
+    log.info("Headless mode started")
+    return asyncio.run(run(args))
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,12 +1,110 @@
+# started before the other imports, so they're measured as well
+from utils.startup_profile import StartupProfile
+startup_profile = StartupProfile.start() if __name__ == '__main__' else None
+
+import importlib
 import logging.config
 import sys
 
 import PyQt6.QtGui as QtGui
-from PyQt6.QtWidgets import (QMainWindow, QApplication, QTabWidget)
-
-from core import SerialManager, SerialDataParser
-from tabs import RawDataGraphsTab, RawDataTab, StepperCalibrationTab, AngularVelocityControlTab, SerialCommunicationTab, \
-    DebugInfoTab
+from PyQt6.QtCore import QTimer
+from PyQt6.QtWidgets import (QMainWindow, QApplication, QTabWidget, QWidget, QVBoxLayout, QHBoxLayout, QLabel,
+                             QComboBox, QPushButton, QStackedWidget)
+
+from core.DeviceSession import DeviceSession, DeviceSessionManager
+from tabs.SerialCommunicationTab import SerialCommunicationTab
+
+# (the class of the tab, its module in tabs/ has the same name; title)
+TABS = [
+    ("SerialCommunicationTab", "Serial Communication Settings"),
+    ("RawDataTab", "Raw Data"),
+    ("RawDataGraphsTab", "Raw Data Graphs"),
+    ("StepperCalibrationTab", "Stepper Calibration"),
+    ("AngularVelocityControlTab", "Angular Speed Control"),
+    ("DebugInfoTab", "Debug Info"),
+]
+
+
+class SessionTabs(QTabWidget):
+    """
+    The tabs bound to one session.
+
+    A tab is built (and its module imported) when it's shown for the first time, or when it's accessed, e.g.
+    `raw_data_graphs`. Until then it's an empty page, so the startup doesn't wait for the graphs and pyqtgraph.
+    The Serial Communication tab is built right away, the port is opened from it and it shows the received lines.
+    """
+
+    def __init__(self, parent, session: DeviceSession):
+        super().__init__(parent)
+        self.parent_window = parent
+        self.session = session
+        # class name of the tab -> the tab, the built ones
+        self._tabs: dict[str, QWidget] = {}
+
+        # the pages the tabs are built into
+        for _, title in TABS:
+            page = QWidget()
+            page_layout = QVBoxLayout(page)
+            page_layout.setContentsMargins(0, 0, 0, 0)
+            self.addTab(page, title)
+
+        self.get_tab(SerialCommunicationTab.__name__).refresh_com_ports()
+        self.currentChanged.connect(self.on_tab_selected)
+        self.setCurrentIndex(0)
+
+    def on_tab_selected(self, index: int):
+        if index >= 0:
+            self.get_tab(TABS[index][0])
+
+    def get_tab(self, class_name: str) -> QWidget:
+        """
+        @param class_name: the class of the tab, see TABS
+        @return: the tab, built if it wasn't yet
+        """
+        tab = self._tabs.get(class_name)
+        if tab is None:
+            module = importlib.import_module(f"tabs.{class_name}")
+            tab = getattr(module, class_name)(self.parent_window, self.session)
+            self._tabs[class_name] = tab
+
+            self.widget(self._index_of(class_name)).layout().addWidget(tab)
+        return tab
+
+    def select_tab(self, class_name: str) -> QWidget:
+        """
+        Shows the tab, builds it if it wasn't yet
+        @return: the tab
+        """
+        self.setCurrentIndex(self._index_of(class_name))
+        return self.get_tab(class_name)
+
+    @staticmethod
+    def _index_of(class_name: str) -> int:
+        return [tab_class_name for tab_class_name, _ in TABS].index(class_name)
+
+    @property
+    def serial_communication_tab(self) -> SerialCommunicationTab:
+        return self.get_tab("SerialCommunicationTab")
+
+    @property
+    def raw_data_tab(self):
+        return self.get_tab("RawDataTab")
+
+    @property
+    def raw_data_graphs(self):
+        return self.get_tab("RawDataGraphsTab")
+
+    @property
+    def stepper_calibration_tab(self):
+        return self.get_tab("StepperCalibrationTab")
+
+    @property
+    def angular_speed_control_tab(self):
+        return self.get_tab("AngularVelocityControlTab")
+
+    @property
+    def debug_info_tab(self):
+        return self.get_tab("DebugInfoTab")
 
 
 class MainWindow(QMainWindow):
@@ -15,32 +113,38 @@ class MainWindow(QMainWindow):
         self.init_ui()
 
         self.data = ''
+        self.session_manager = DeviceSessionManager.get_instance()
 
-        # create tabs for the main window
-        self.tabs = QTabWidget(self)
-
-        self.serial_communication_tab = SerialCommunicationTab(self)
-        self.tabs.addTab(self.serial_communication_tab, "Serial Communication Settings")
+        self.central_widget = QWidget(self)
+        self.layout_main = QVBoxLayout(self.central_widget)
+        self.layout_main.setContentsMargins(0, 0, 0, 0)
 
-        self.raw_data_tab = RawDataTab(self)
-        self.tabs.addTab(self.raw_data_tab, "Raw Data")
+        # ---- SESSIONS LAYOUT START ----
+        # every connected board has its own session and its own set of tabs, only the selected one is shown
+        self.layout_sessions = QHBoxLayout()
+        self.layout_sessions.setContentsMargins(9, 9, 9, 0)
+        self.layout_sessions.addWidget(QLabel("Board:"))
 
-        self.raw_data_graphs = RawDataGraphsTab(self)
-        self.tabs.addTab(self.raw_data_graphs, "Raw Data Graphs")
+        self.session_dropdown = QComboBox()
+        self.session_dropdown.currentIndexChanged.connect(self.on_session_selected)
+        self.layout_sessions.addWidget(self.session_dropdown)
 
-        self.stepper_calibration_tab = StepperCalibrationTab(self)
-        self.tabs.addTab(self.stepper_calibration_tab, "Stepper Calibration")
+        self.add_session_button = QPushButton("Add board")
+        self.add_session_button.clicked.connect(lambda: self.add_session(self.session_manager.add_session()))
+        self.layout_sessions.addWidget(self.add_session_button)
+        self.layout_sessions.addStretch()
+        self.layout_main.addLayout(self.layout_sessions)
+        # ---- SESSIONS LAYOUT END ----
 
-        self.angular_speed_control_tab = AngularVelocityControlTab(self)
-        self.tabs.addTab(self.angular_speed_control_tab, "Angular Speed Control")
+        self.session_tabs = QStackedWidget()
+        self.layout_main.addWidget(self.session_tabs)
 
-        self.debug_info_tab = DebugInfoTab(self)
-        self.tabs.addTab(self.debug_info_tab, "Debug Info")
+        for session in self.session_manager.sessions:
+            self.add_session(session)
 
-        self.tabs.setCurrentIndex(4)
-        self.setCentralWidget(self.tabs)
-
-        self.serial_communication_tab.refresh_com_ports()
+        # the tabs of the default session
+        self.tabs: SessionTabs = self.session_tabs.widget(0)
+        self.setCentralWidget(self.central_widget)
 
         ## debug
         # self.serial_manager = SerialManager.get_instance()
@@ -48,7 +152,19 @@ class MainWindow(QMainWindow):
         # self.serial_manager.add_listener(SerialSpeedTester())
 
     def handle_text_changed(self):
-        print(self.serial_communication_tab.text_area.toPlainText())
+        print(self.tabs.serial_communication_tab.text_area.toPlainText())
+
+    def add_session(self, session: DeviceSession):
+        self.session_tabs.addWidget(SessionTabs(self, session))
+        self.session_dropdown.addItem(session.name, session)
+        self.session_dropdown.setCurrentIndex(self.session_dropdown.count() - 1)
+
+    def on_session_selected(self, index: int):
+        if index < 0:
+            return
+
+        self.session_tabs.setCurrentIndex(index)
+        self.session_manager.select_session(self.session_dropdown.itemData(index))
 
     def init_ui(self):
         self.setWindowTitle('ADCS GUI')
@@ -64,7 +180,14 @@ class MainWindow(QMainWindow):
         self.move(qr.topLeft())
 
 
+def report_startup():
+    startup_profile.mark("window shown")
+    startup_profile.finish()
+    startup_profile.log_report()
+
+
 if __name__ == '__main__':
+    startup_profile.mark("main imported")
     logging.config.fileConfig("config/logging.conf")
     log = logging.getLogger()
     log.info("App started")
@@ -72,4 +195,8 @@ if __name__ == '__main__':
     app = QApplication(sys.argv)
     app.setStyle('fusion')
     window = MainWindow()
+    startup_profile.mark("window built")
+    # runs once the event loop has shown the window
+    QTimer.singleShot(0, report_startup)
     app.exec()
+    DeviceSessionManager.get_instance().stop()
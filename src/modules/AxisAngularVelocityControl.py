@@ -1,12 +1,12 @@
-import numpy as np
 import pyqtgraph as pg
 from PyQt6.QtCore import Qt
 from PyQt6.QtWidgets import (QWidget, QVBoxLayout, QHBoxLayout,
     QLabel, QPushButton, QSlider,
     QLineEdit)
 
-from core.ADCSCommandsSender import ADCSCommandsSender
-from stores.GlobalStore import State, MIN_ANGULAR_VELOCITY, MAX_ANGULAR_VELOCITY
+from core.DeviceSession import DeviceSession
+from stores.GlobalStore import IMUDataBuffer, MIN_ANGULAR_VELOCITY, MAX_ANGULAR_VELOCITY
+from utils.plotting import set_envelope_data
 from utils.utils import clamp
 
 # FIXME: This is a temporary solution to the slider not being able to handle floats
@@ -16,12 +16,12 @@ SLIDER_SCALAR_VALUE = 100
 axes = ["X", "Y", "Z"]
 
 class AxisAngularVelocityControl(QWidget):
-    def __init__(self, axis_name: str, parent=None):
+    def __init__(self, axis_name: str, session: DeviceSession, parent=None):
         super().__init__(parent)
         self.axis_name = axis_name
         self.parent = parent
-        self.state = State.get_instance()
-        self.ADCSCommands_sender = ADCSCommandsSender.get_instance()
+        self.state = session.state
+        self.ADCSCommands_sender = session.commands_sender
 
         layout_main_vertical = QVBoxLayout()
         layout_main_vertical.setContentsMargins(0, 0, 0, 0)
@@ -88,7 +88,30 @@ class AxisAngularVelocityControl(QWidget):
         self.angular_velocity_plot.setLabel('left', 'Angular velocity', 'deg/s')
         self.angular_velocity_plot.setBackground('transparent')
         self.angular_velocity_plot.setYRange(MIN_ANGULAR_VELOCITY, MAX_ANGULAR_VELOCITY)
-        self.angular_velocity_plot.enableAutoRange()
+        self.angular_velocity_plot.enableAutoRange('y', True)
+
+        # the x-axis always shows the whole history window (the newest samples at 0), it's only recalculated when the
+        # length of the history changes
+        self.angular_velocity_plot.setLabel('bottom', 'Time', 's')
+        self.angular_velocity_plot.setXRange(-self.state.IMU_data_history_length_s.get(), 0, padding=0)
+        self.state.IMU_data_history_length_s.add_gui_callback(
+            lambda x: self.angular_velocity_plot.setXRange(-x, 0, padding=0)
+        )
+        self.angular_velocity_plot.setMouseEnabled(x=False, y=True)
+
+        # the curves are created once and updated in place
+        pen_color_real_data = ["r", "g", "b"][axes.index(self.axis_name)]
+        self.angular_velocity_curve = self.angular_velocity_plot.plot(pen=pg.mkPen(color=pen_color_real_data))
+
+        self.angular_velocity_setpoint_line = pg.InfiniteLine(
+            angle=0,
+            movable=False,
+            pen=pg.mkPen(color="y", style=Qt.PenStyle.DashLine),
+        )
+        self.angular_velocity_plot.addItem(self.angular_velocity_setpoint_line)
+        getattr(self.state.dc_motor_values.angular_velocity_control["values"], axis_name).add_callback(
+            self.angular_velocity_setpoint_line.setValue
+        )
 
         layout_main_vertical.addWidget(self.angular_velocity_plot)
 
@@ -96,13 +119,8 @@ class AxisAngularVelocityControl(QWidget):
 
         self.set_intital_values()
 
-    def update_graph(self, angle_datapoints: np.ndarray):
-        self.angular_velocity_plot.clear()
-
-        pen_color_real_data = ["r", "g", "b"][["X", "Y", "Z"].index(self.axis_name)]
-
-        pen = pg.mkPen(color=pen_color_real_data)
-        self.angular_velocity_plot.plot(angle_datapoints, pen=pen)
+    def update_graph(self, gyroscope_data: IMUDataBuffer):
+        set_envelope_data(self.angular_velocity_curve, gyroscope_data, axes.index(self.axis_name))
 
     def handle_rotation_rate_slider_change(self):
         getattr(self.state.dc_motor_values.angular_velocity_control["values"], self.axis_name).set(
@@ -121,7 +139,9 @@ class AxisAngularVelocityControl(QWidget):
         getattr(self.state.dc_motor_values.angular_velocity_control["values"], self.axis_name).set(
             new_angular_velocity
         )
-        self.ADCSCommands_sender.set_motor_speed(axes.index(self.axis_name), new_angular_velocity)
+        # in the closed loop mode the value is a setpoint for the control loop, not a motor speed
+        if not self.parent.control_loop.is_running:
+            self.ADCSCommands_sender.set_motor_speed(axes.index(self.axis_name), new_angular_velocity)
 
 
     def handle_stop_button_clicked(self):
@@ -129,6 +149,9 @@ class AxisAngularVelocityControl(QWidget):
         self.handle_set_rotation_rate_button_clicked()
 
     def set_intital_values(self):
+        self.angular_velocity_setpoint_line.setValue(
+            getattr(self.state.dc_motor_values.angular_velocity_control["values"], self.axis_name).get()
+        )
         self.dc_motor_velocity_input.setText(
             str(getattr(self.state.dc_motor_values.angular_velocity_control["values"], self.axis_name).get())
         )
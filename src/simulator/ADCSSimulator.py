@@ -0,0 +1,297 @@
+"""
+Headless simulator of the ADCS board on a Linux pseudo-terminal.
+
+Opens a pty, prints the path of its slave side (connect the GUI to it) and speaks the same protocol as the real
+board: it streams counter/acc/gyro/angle/temp lines (or binary frames) and responds to the `imu`, `stepper`, `pwm`
+and `telemetry` commands sent by ADCSCommandsSender, the commands tagged with `#<seq>` are acknowledged with
+`ack <seq>` (see CommandAckTracker). The body rotation is simulated with simple rigid body dynamics
+driven by three reaction wheels.
+
+Run from the `src` directory:
+    python -m simulator.ADCSSimulator --rate 20 --link /tmp/ttyADCS
+"""
+import argparse
+import errno
+import logging
+import math
+import os
+import select
+import time
+import tty
+from collections import deque
+from typing import Optional
+
+import numpy as np
+
+log = logging.getLogger()
+
+GRAVITY = 9.81  # m/s^2
+DEFAULT_PWM_PERIOD = 50_000
+
+# rigid body parameters, per axis
+BODY_INERTIA = np.array([0.02, 0.02, 0.03])  # kg m^2
+BODY_DAMPING = 0.0005  # N m s/rad
+WHEEL_INERTIA = 2e-4  # kg m^2
+MOTOR_STALL_TORQUE = 0.01  # N m at full duty
+MOTOR_NO_LOAD_SPEED = 600.0  # rad/s at full duty
+# a stepper moves a balance mass, which changes the inertia of its axis by up to this fraction
+STEPPER_INERTIA_CHANGE = 0.2
+
+GYRO_NOISE = 0.05  # deg/s
+ACC_NOISE = 0.02  # m/s^2
+TEMPERATURE_NOISE = 0.01  # °C
+
+# the output waiting for the reader, the packets that don't fit are dropped whole, like a real link would
+MAX_PENDING_OUTPUT_BYTES = 64 * 1024
+
+
+class FlywheelDynamics:
+    """
+    Rigid body with three reaction wheels. The motor torque spins the wheel up and the body the other way round.
+    """
+
+    def __init__(self):
+        self.body_angular_velocity = np.zeros(3)  # rad/s
+        self.body_angle = np.zeros(3)  # rad
+        self.wheel_angular_velocity = np.zeros(3)  # rad/s
+        self.duty = np.zeros(3)  # [-1, 1]
+        self.stepper_positions = np.full(3, 50.0)  # [0, 100] %
+
+    def body_inertia(self) -> np.ndarray:
+        return BODY_INERTIA * (1 + STEPPER_INERTIA_CHANGE * (self.stepper_positions - 50) / 50)
+
+    def step(self, dt: float):
+        # DC motor, the torque falls linearly with the speed relative to the body
+        relative_wheel_velocity = self.wheel_angular_velocity - self.body_angular_velocity
+        motor_torque = MOTOR_STALL_TORQUE * (self.duty - relative_wheel_velocity / MOTOR_NO_LOAD_SPEED)
+
+        self.wheel_angular_velocity += motor_torque / WHEEL_INERTIA * dt
+        body_torque = -motor_torque - BODY_DAMPING * self.body_angular_velocity
+        self.body_angular_velocity += body_torque / self.body_inertia() * dt
+        self.body_angle += self.body_angular_velocity * dt
+
+
+class ADCSSimulator:
+    """
+    :param rate: the number of IMU packets sent per second
+    :param link: optional path of a symlink to the pty, e.g. /tmp/ttyADCS
+    """
+
+    def __init__(self, rate: float, link: Optional[str] = None, seed: Optional[int] = None):
+        self.rate = rate
+        self.link = link
+        self.dynamics = FlywheelDynamics()
+        self.random = np.random.default_rng(seed)
+
+        self.is_imu_running = True
+        self.is_binary_mode = False
+        self.pwm_period = DEFAULT_PWM_PERIOD
+        self.packet_number = 0
+        self.frame_sequence = 0
+        self.temperature = 25.0
+
+        self.sent_packets = 0
+        self.dropped_packets = 0
+
+        self.master_fd, self.slave_fd = os.openpty()
+        tty.setraw(self.slave_fd)
+        os.set_blocking(self.master_fd, False)
+        self.port_name = os.ttyname(self.slave_fd)
+        if link:
+            if os.path.islink(link):
+                os.unlink(link)
+            os.symlink(self.port_name, link)
+
+        self._command_buffer = bytearray()
+        # the pty takes only as much as its buffer has space for, the rest is written when it's writable again
+        self._pending_output = bytearray()
+        # the ends of the queued packets (counted from the start of the run) and whether they're IMU packets, a packet
+        # is sent once its last byte is written
+        self._pending_ends: deque[tuple[int, bool]] = deque()
+        self._queued_bytes = 0
+        self._written_bytes = 0
+
+    def run(self, duration_s: Optional[float] = None):
+        log.info(f"ADCS simulator running on {self.port_name}" + (f" ({self.link})" if self.link else ""))
+        packet_interval = 1 / self.rate
+        start = time.perf_counter()
+        next_packet_time = start
+
+        try:
+            while duration_s is None or time.perf_counter() - start < duration_s:
+                timeout = max(next_packet_time - time.perf_counter(), 0)
+                readable, writable, _ = select.select(
+                    [self.master_fd], [self.master_fd] if self._pending_output else [], [], timeout
+                )
+                if readable:
+                    self._read_commands()
+                if writable:
+                    self._flush_output()
+
+                # at high rates several packets are due at once, they are sent in a single write
+                now = time.perf_counter()
+                packets = []
+                while next_packet_time <= now:
+                    self.dynamics.step(packet_interval)
+                    if self.is_imu_running:
+                        packets.append(self._create_packet())
+                    next_packet_time += packet_interval
+
+                for packet in packets:
+                    self._queue_output(packet, is_packet=True)
+                if packets:
+                    self._flush_output()
+        finally:
+            self.close()
+
+    def close(self):
+        log.info(f"ADCS simulator stopped, {self.sent_packets} packets sent, {self.dropped_packets} dropped, "
+                 f"{len(self._pending_output)} bytes not written")
+        if self.link and os.path.islink(self.link):
+            os.unlink(self.link)
+        os.close(self.master_fd)
+        os.close(self.slave_fd)
+
+    def _queue_output(self, data: bytes, is_packet: bool = False):
+        """
+        @param is_packet: an IMU packet, it's dropped if the reader is too far behind, the acks never are
+        """
+        if is_packet and len(self._pending_output) >= MAX_PENDING_OUTPUT_BYTES:
+            self.dropped_packets += 1
+            return
+
+        self._pending_output += data
+        self._queued_bytes += len(data)
+        self._pending_ends.append((self._queued_bytes, is_packet))
+
+    def _flush_output(self):
+        if not self._pending_output:
+            return
+
+        try:
+            written = os.write(self.master_fd, self._pending_output)
+        except OSError as e:
+            if e.errno in (errno.EAGAIN, errno.EWOULDBLOCK):
+                return
+            if e.errno != errno.EIO:
+                raise
+            # the other side of the pty was closed, nobody will read the output
+            self.dropped_packets += sum(is_packet for _, is_packet in self._pending_ends)
+            self._written_bytes = self._queued_bytes
+            self._pending_output.clear()
+            self._pending_ends.clear()
+            return
+
+        del self._pending_output[:written]
+        self._written_bytes += written
+        while self._pending_ends and self._pending_ends[0][0] <= self._written_bytes:
+            _, is_packet = self._pending_ends.popleft()
+            self.sent_packets += is_packet
+
+    def _create_packet(self) -> bytes:
+        dynamics = self.dynamics
+        gyro = np.degrees(dynamics.body_angular_velocity) + self.random.normal(0, GYRO_NOISE, 3)
+        angle = np.degrees(dynamics.body_angle)
+
+        roll, pitch = dynamics.body_angle[0], dynamics.body_angle[1]
+        acc = GRAVITY * np.array([
+            -math.sin(pitch),
+            math.sin(roll) * math.cos(pitch),
+            math.cos(roll) * math.cos(pitch),
+        ]) + self.random.normal(0, ACC_NOISE, 3)
+
+        self.temperature += self.random.normal(0, TEMPERATURE_NOISE)
+        self.packet_number += 1
+
+        messages = {
+            "counter": [self.packet_number],
+            "acc": acc,
+            "gyro": gyro,
+            "angle": angle,
+            "temp": [self.temperature],
+        }
+
+        if self.is_binary_mode:
+            return b"".join(self._encode_frame(prefix, values) for prefix, values in messages.items())
+
+        return (
+            f"counter {self.packet_number}\r\n"
+            f"acc({acc[0]:.4f},{acc[1]:.4f},{acc[2]:.4f})\r\n"
+            f"gyro({gyro[0]:.4f},{gyro[1]:.4f},{gyro[2]:.4f})\r\n"
+            f"angle({angle[0]:.4f},{angle[1]:.4f},{angle[2]:.4f})\r\n"
+            f"temp {self.temperature:.2f}\r\n"
+        ).encode()
+
+    def _encode_frame(self, prefix: str, values) -> bytes:
+        # imported here, the text mode doesn't need the GUI pipeline modules
+        from core.BinaryFrameDecoder import encode_frame
+
+        self.frame_sequence += 1
+        return encode_frame(prefix, values, self.frame_sequence)
+
+    def _read_commands(self):
+        try:
+            self._command_buffer += os.read(self.master_fd, 4096)
+        except BlockingIOError:
+            return
+
+        # ADCSCommandsSender terminates the commands with \r
+        while True:
+            end = min((i for i in (self._command_buffer.find(b"\r"), self._command_buffer.find(b"\n")) if i != -1),
+                      default=-1)
+            if end == -1:
+                return
+
+            command = self._command_buffer[:end].decode(errors="replace").strip()
+            del self._command_buffer[:end + 1]
+            if command:
+                self.handle_command(command)
+
+    def handle_command(self, command: str):
+        log.debug(f"command: {command}")
+        parts = command.split()
+        if parts and parts[0].startswith("#"):
+            sequence, parts = parts[0][1:], parts[1:]
+            self._queue_output(f"ack {sequence}\r\n".encode())
+            self._flush_output()
+
+        try:
+            if parts == ["imu", "start"]:
+                self.is_imu_running = True
+            elif parts == ["imu", "stop"]:
+                self.is_imu_running = False
+            elif parts[0] == "stepper" and parts[2] == "move":
+                self.dynamics.stepper_positions[int(parts[1])] = min(max(float(parts[3]), 0), 100)
+            elif parts[:2] == ["pwm", "duty"]:
+                channel, duty = int(parts[2]), float(parts[3])
+                self.dynamics.duty[channel] = min(max(duty / self.pwm_period, -1), 1)
+            elif parts[:2] == ["pwm", "period"]:
+                self.pwm_period = int(parts[2])
+            elif parts[:2] == ["pwm", "prescale"]:
+                pass
+            elif parts[0] == "telemetry" and parts[1] in ("binary", "text"):
+                self.is_binary_mode = parts[1] == "binary"
+            else:
+                log.warning(f"unknown command: {command}")
+        except (IndexError, ValueError):
+            log.warning(f"invalid command: {command}")
+
+
+if __name__ == '__main__':
+    arg_parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    arg_parser.add_argument("--rate", type=float, default=20, help="IMU packets per second (the ADCS sends 20)")
+    arg_parser.add_argument("--link", help="create a symlink to the pty at this path, e.g. /tmp/ttyADCS")
+    arg_parser.add_argument("--duration", type=float, help="stop after this many seconds")
+    arg_parser.add_argument("--binary", action="store_true", help="start in the binary telemetry mode")
+    arg_parser.add_argument("--verbose", action="store_true")
+    args = arg_parser.parse_args()
+
+    logging.basicConfig(level=logging.DEBUG if args.verbose else logging.INFO, format="%(asctime)s %(message)s")
+
+    simulator = ADCSSimulator(args.rate, args.link)
+    simulator.is_binary_mode = args.binary
+    print(simulator.port_name, flush=True)
+    try:
+        simulator.run(args.duration)
+    except KeyboardInterrupt:
+        pass
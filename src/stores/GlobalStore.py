@@ -1,58 +1,123 @@
 import logging
 import math
 import time
-from typing import Dict, List, Callable, Literal
+from typing import List, Literal, Callable, Optional
 
 import numpy as np
 
-from core.ObservableValue import create_observable_value
+from core.MinMaxPyramid import MinMaxPyramid
+from core.ObservableValue import Observable, create_observable_value
 from core.SingletonMeta import Singelton
+from core.StreamingStatistics import PacketStatistics
+from core.RingBuffer import RingBuffer
 from utils.utils import Serializable
-from utils.utils import append_to_array
 
 # custom types
 Axis = Literal["X", "Y", "Z"]
 Axes = List[Axis]
-IMU_Data_Dict = Dict[Axis, np.ndarray]
 
 axes: Axes = ["X", "Y", "Z"]
 
+# called with the name of the data (e.g. "gyro"), the timestamps (n,) and the values (n, columns) of new samples
+StreamListener = Callable[[str, np.ndarray, np.ndarray], None]
+
 # TODO: move this to some settings state
 # there's a default value but it can be changed wiht a command
+# only used to size the IMU data history until the real sample rate is measured
 data_interval_delay_ms = 50
 
+# the length of the IMU data history shown on the graphs, can be changed in the settings
+DEFAULT_IMU_DATA_HISTORY_LENGTH_S = 5
+MIN_IMU_DATA_CAPACITY = 10
+MAX_IMU_DATA_CAPACITY = 10_000_000
+# the buffers are resized only when the measured sample rate changes the capacity by more than this (a fraction),
+# so the jitter of the rate doesn't resize them all the time
+IMU_DATA_CAPACITY_TOLERANCE = 0.1
+# the sample rate isn't measured from a window with a longer gap between the packets (or this long after the last
+# packet), the link was idle in it
+MAX_IMU_DATA_RATE_GAP_S = 2
+
+# how often the packet statistics snapshot is published
+PACKET_STATISTICS_PUBLISH_INTERVAL_S = 0.5
+
 MAX_ANGULAR_VELOCITY = 100  # percent
 MIN_ANGULAR_VELOCITY = -100  # percent
 
 log = logging.getLogger()
 
 
-class IMUData:
-    def __init__(self):
-        self.data: IMU_Data_Dict = {
-            "X": np.zeros(0),
-            "Y": np.zeros(0),
-            "Z": np.zeros(0),
-        }
-        self._callbacks: List[Callable[[IMU_Data_Dict], None]] = []
-
-    def add_callback(self, callback: Callable[[IMU_Data_Dict], None]):
-        self._callbacks.append(callback)
-
-    def get_callbacks(self):
-        return self._callbacks
-
-
-class IMUDataTemperature:
-    def __init__(self):
-        self.data: np.ndarray = np.zeros(0)
-        self._callbacks: List[Callable[[np.ndarray], None]] = []
+class IMUDataBuffer(RingBuffer, Observable["IMUDataBuffer"]):
+    """
+    Ring buffer with the IMU data history of a single sensor, one column per axis.
+    Every sample has the host receive time as its timestamp and the packet counter of the ADCS it was sent with as
+    its device counter (NaN when it isn't known), both kept in columns next to the values.
+    Callbacks are called with the buffer itself after new samples are added, on the thread that added them.
+    Use `add_gui_callback` for callbacks that touch widgets.
 
-    def add_callback(self, callback: Callable[[np.ndarray], None]):
-        self._callbacks.append(callback)
+    :param name: name of the sensor, same as the prefix of its messages
+    """
 
-    def get_callbacks(self):
-        return self._callbacks
+    def __init__(self, name: str, capacity: int, columns: int = len(axes)):
+        RingBuffer.__init__(self, capacity, columns)
+        Observable.__init__(self)
+        self.name = name
+        self._device_counters = RingBuffer(capacity)
+        # kept up to date on every append, the graphs draw its envelope instead of every sample
+        self.min_max_pyramid = MinMaxPyramid(self)
+
+    def append(self, values, timestamp: Optional[float] = None, device_counter: float = np.nan):
+        RingBuffer.append(self, values, timestamp)
+        self._device_counters.append(device_counter, timestamp)
+        self.min_max_pyramid.update(1)
+
+    def extend(self, values: np.ndarray, timestamps: Optional[np.ndarray] = None,
+               device_counters: Optional[np.ndarray] = None):
+        """
+        @param device_counters: array of shape (n,), NaN for all the samples if None
+        """
+        values = np.asarray(values, dtype=np.float64).reshape(-1, self.columns)
+        RingBuffer.extend(self, values, timestamps)
+        self._device_counters.extend(
+            device_counters if device_counters is not None else np.full(len(values), np.nan), timestamps
+        )
+        self.min_max_pyramid.update(len(values))
+
+    def device_counters(self) -> np.ndarray:
+        """
+        @return: view of the device counters ordered from the oldest to the newest sample
+        """
+        return self._device_counters.column(0)
+
+    def resize(self, capacity: int):
+        # the graphs don't see the samples resized before the pyramid that summarizes them
+        with self._lock:
+            RingBuffer.resize(self, capacity)
+            self._device_counters.resize(capacity)
+            # the levels depend on the capacity, it's rebuilt from the samples that were kept
+            min_max_pyramid = MinMaxPyramid(self)
+            min_max_pyramid.update(len(self))
+            self.min_max_pyramid = min_max_pyramid
+        log.debug(f"{self.name} history resized to {capacity} samples")
+
+    def clear(self):
+        RingBuffer.clear(self)
+        self._device_counters.clear()
+        self.min_max_pyramid.reset()
+
+    def envelope(self, column: int, max_points: int, start: Optional[int] = None,
+                 end: Optional[int] = None) -> tuple[np.ndarray, np.ndarray]:
+        """
+        @return: the x (sample index) and y of the min/max envelope of a column, at most two points per pixel,
+            see MinMaxPyramid.envelope
+        """
+        with self._lock:
+            return self.min_max_pyramid.envelope(column, max_points, start, end)
+
+    def get_axis(self, axis: Axis) -> np.ndarray:
+        """
+        @return: zero-copy view of the axis data, ordered from the oldest to the newest sample
+        """
+        return self.column(axes.index(axis))
 
 
 class AxisData(Serializable):
@@ -148,47 +213,68 @@ class DCMotorValues:
 
 @Singelton
 class State:
-    _instance = None
+    """
+    The data of one ADCS, the shared instance belongs to the default Session, every other Session creates its own
+    with `State.create()`
+    """
+
+    def __init__(self):
+        log.info("GLoablStore - constructor called")
 
-    stepper_values = StepperValues()
-    dc_motor_values = DCMotorValues()
+        self.stepper_values = StepperValues()
+        self.dc_motor_values = DCMotorValues()
 
-    # The length of the IMU data history in milliseconds
-    # So here 2000ms = 2s of data will be displayed on graphs
-    # TODO: this can be changed in a config
-    # watch out that when the time shrinks the np array needs to be resized
-    IMU_data_history_length_ms = 5000
+        # The length of the IMU data history in seconds, the buffers are sized for it with the measured sample rate
+        self.IMU_data_history_length_s = create_observable_value(
+            DEFAULT_IMU_DATA_HISTORY_LENGTH_S, "IMU_data_history_length_s"
+        )
 
-    IMU_max_number_of_datapoints = int(IMU_data_history_length_ms / data_interval_delay_ms)
+        # the capacity the IMU data buffers should have, they're resized to it when the next samples are added,
+        # see update_IMU_data_capacity
+        self.IMU_data_capacity = int(DEFAULT_IMU_DATA_HISTORY_LENGTH_S * 1000 / data_interval_delay_ms)
+        # the last sample rate measured while the data was streaming, the nominal one until then
+        self._IMU_data_rate = 1000 / data_interval_delay_ms
 
-    IMU_angle_data = IMUData()
-    IMU_acceleration_data = IMUData()
-    IMU_gyroscope_data = IMUData()
-    IMU_magnetometer_data = IMUData()
+        self.IMU_angle_data = IMUDataBuffer("angle", self.IMU_data_capacity)
+        self.IMU_acceleration_data = IMUDataBuffer("acc", self.IMU_data_capacity)
+        self.IMU_gyroscope_data = IMUDataBuffer("gyro", self.IMU_data_capacity)
+        self.IMU_magnetometer_data = IMUDataBuffer("mag", self.IMU_data_capacity)
 
-    IMU_temperature_data = IMUDataTemperature()
+        self.IMU_temperature_data = IMUDataBuffer("temp", self.IMU_data_capacity, columns=1)
 
-    # Debug information
-    average_data_delay = create_observable_value(0)
-    min_data_delay = create_observable_value(math.inf)
-    max_data_delay = create_observable_value(-math.inf)
-    total_packets_read = create_observable_value(0)
-    skipped_packets = create_observable_value(0)
-    _sum_data_delay = 0
+        # listeners of all the samples that are stored, see add_stream_listener
+        self._stream_listeners: List[StreamListener] = []
+
+        # Debug information
+        self.packet_statistics = PacketStatistics()
+        # snapshot of the packet_statistics, published at most every PACKET_STATISTICS_PUBLISH_INTERVAL_S
+        self.packet_statistics_snapshot = create_observable_value(
+            self.packet_statistics.snapshot(), "packet_statistics_snapshot"
+        )
+        self._last_packet_statistics_publish_time = 0.0
 
-    # settings
-    is_output_raw_data = create_observable_value(True)
+        # settings
+        self.is_output_raw_data = create_observable_value(True)
 
-    def _add_IMU_datapoint(self, IMU_data: IMUData, x: float, y: float, z: float):
-        for axis in axes:
-            IMU_data.data[axis] = append_to_array(
-                IMU_data.data[axis],
-                locals()[axis.lower()],  # returns a dict with keys IMU_data, x, y and z which are the fucntion params
-                self.IMU_max_number_of_datapoints
-            )
+        self.IMU_data_history_length_s.add_callback(lambda _: self.update_IMU_data_capacity(is_forced=True))
 
-        for callback in IMU_data.get_callbacks():
-            callback(IMU_data.data)
+    def add_stream_listener(self, listener: StreamListener):
+        """
+        Adds a listener that gets every block of samples that is stored, on the thread that stores them.
+        Unlike the buffer callbacks it sees all the samples, not just the ones that are still in the history.
+        """
+        # the list is replaced instead of modified, so it can be iterated on the processing thread without a lock
+        self._stream_listeners = self._stream_listeners + [listener]
+
+    def remove_stream_listener(self, listener: StreamListener):
+        self._stream_listeners = [l for l in self._stream_listeners if l != listener]
+
+    def _notify_stream_listeners(self, name: str, timestamps: np.ndarray, values: np.ndarray):
+        for listener in self._stream_listeners:
+            listener(name, timestamps, values)
+
+    def _add_IMU_datapoint(self, IMU_data: IMUDataBuffer, x: float, y: float, z: float):
+        self._add_IMU_datapoints(IMU_data, np.array([[x, y, z]]))
 
     def add_IMU_angle_datapoint(self, x: float, y: float, z: float):
         self._add_IMU_datapoint(self.IMU_angle_data, x, y, z)
@@ -203,37 +289,119 @@ class State:
         self._add_IMU_datapoint(self.IMU_magnetometer_data, x, y, z)
 
     def add_IMU_temperature_datapoint(self, temp: float):
-        self.IMU_temperature_data.data = append_to_array(
-            self.IMU_temperature_data.data, temp,
-            self.IMU_max_number_of_datapoints
-        )
-
-        for callback in self.IMU_temperature_data.get_callbacks():
-            callback(self.IMU_temperature_data.data)
-
-    last_packet_number = None
-    last_packet_time = None
+        self._add_IMU_datapoints(self.IMU_temperature_data, np.array([[temp]]))
+
+    # bulk versions of the methods above, the callbacks are called once per block
+    def _add_IMU_datapoints(self, IMU_data: IMUDataBuffer, values: np.ndarray, timestamps: Optional[np.ndarray] = None,
+                            device_counters: Optional[np.ndarray] = None):
+        """
+        @param timestamps: the receive time of each sample, now for all of them if None
+        @param device_counters: the packet counter of each sample, see IMUDataBuffer
+        """
+        # resized here, on the thread that adds the samples, so it never races with extend
+        if IMU_data.capacity != self.IMU_data_capacity:
+            IMU_data.resize(self.IMU_data_capacity)
+
+        if timestamps is None:
+            timestamps = np.full(len(values), time.time())
+        IMU_data.extend(values, timestamps, device_counters)
+        IMU_data._notify_callbacks(IMU_data)
+        self._notify_stream_listeners(IMU_data.name, timestamps, values)
+
+    def add_IMU_angle_datapoints(self, values: np.ndarray, timestamps: Optional[np.ndarray] = None,
+                                 device_counters: Optional[np.ndarray] = None):
+        self._add_IMU_datapoints(self.IMU_angle_data, values, timestamps, device_counters)
+
+    def add_IMU_acceleration_datapoints(self, values: np.ndarray, timestamps: Optional[np.ndarray] = None,
+                                        device_counters: Optional[np.ndarray] = None):
+        self._add_IMU_datapoints(self.IMU_acceleration_data, values, timestamps, device_counters)
+
+    def add_IMU_gyroscope_datapoints(self, values: np.ndarray, timestamps: Optional[np.ndarray] = None,
+                                     device_counters: Optional[np.ndarray] = None):
+        self._add_IMU_datapoints(self.IMU_gyroscope_data, values, timestamps, device_counters)
+
+    def add_IMU_magnetometer_datapoints(self, values: np.ndarray, timestamps: Optional[np.ndarray] = None,
+                                       device_counters: Optional[np.ndarray] = None):
+        self._add_IMU_datapoints(self.IMU_magnetometer_data, values, timestamps, device_counters)
+
+    def add_IMU_temperature_datapoints(self, values: np.ndarray, timestamps: Optional[np.ndarray] = None,
+                                       device_counters: Optional[np.ndarray] = None):
+        self._add_IMU_datapoints(self.IMU_temperature_data, values, timestamps, device_counters)
 
     def add_packet_number(self, packet_number: int):
-        self.total_packets_read.set(self.total_packets_read.get() + 1)
-
-        if self.last_packet_number is not None and self.last_packet_number + 1 != packet_number:
-            self.skipped_packets.set(self.skipped_packets.get() + 1)
-
-        now_ns = time.time_ns()
-        if self.last_packet_time is not None:
-            delay_ns = now_ns - self.last_packet_time
-            delay_ms = delay_ns / 1_000_000
-            self._sum_data_delay += delay_ms
-            self.average_data_delay.set(self._sum_data_delay / self.total_packets_read.get())
-            if self.total_packets_read.get() > 50:
-                self.min_data_delay.set(min(delay_ms, self.min_data_delay.get()))
-                self.max_data_delay.set(max(delay_ms, self.max_data_delay.get()))
-            # print(delay_ms)
+        self.add_packet_numbers(np.array([[packet_number]]))
+
+    def add_packet_numbers(self, packet_numbers: np.ndarray, timestamps: Optional[np.ndarray] = None,
+                           device_counters: Optional[np.ndarray] = None):
+        """
+        @param timestamps: the receive time of each packet number, the intervals of the packet statistics are
+            measured with them, now for all of them if None
+        @param device_counters: not used, the packet numbers are the device counters
+        """
+        if timestamps is None:
+            timestamps = np.full(len(packet_numbers), time.time())
+        self.packet_statistics.add_packets(packet_numbers, timestamps)
+
+        self.publish_packet_statistics()
+        self._notify_stream_listeners("counter", timestamps, packet_numbers)
+
+    def add_motor_speed(self, motor_index: int, speed_percentage: float):
+        """
+        Publishes a motor speed that was sent to the ADCS as the "motor" stream, so the recordings have the inputs of
+        the motors next to the response (e.g. for the Autotune)
+        """
+        self._notify_stream_listeners("motor", np.array([time.time()]), np.array([[motor_index, speed_percentage]]))
+
+    def publish_packet_statistics(self):
+        """
+        Publishes a new packet_statistics_snapshot if the last one is older than PACKET_STATISTICS_PUBLISH_INTERVAL_S.
+        The statistics change with every packet, this way the UI gets them at a low fixed rate. It's called for
+        every block of packets and periodically by the UI, so the windows keep moving when the packets stop.
+        """
+        now = time.time()
+        if now - self._last_packet_statistics_publish_time >= PACKET_STATISTICS_PUBLISH_INTERVAL_S:
+            self._last_packet_statistics_publish_time = now
+            self.packet_statistics_snapshot.set(self.packet_statistics.snapshot(now))
+            self.update_IMU_data_capacity()
+
+    def _count_IMU_samples_since(self, start_time: float) -> int:
+        """
+        @return: the most samples one of the IMU data buffers holds from start_time on
+        """
+        counts = [0]
+        for IMU_data in (self.IMU_angle_data, self.IMU_acceleration_data, self.IMU_gyroscope_data,
+                         self.IMU_magnetometer_data, self.IMU_temperature_data):
+            timestamps = IMU_data.timestamps()
+            counts.append(len(timestamps) - int(np.searchsorted(timestamps, start_time)))
+        return max(counts)
+
+    def update_IMU_data_capacity(self, is_forced: bool = False):
+        """
+        Sets the capacity of the IMU data buffers so they hold IMU_data_history_length_s of data at the measured
+        sample rate (the packet rate of the last 10s), or at the nominal rate until packets are counted.
+
+        The rate is measured only while the data is streaming, a window with a pause in it (or an idle link) would
+        give a rate that is far too low, then the capacity is kept. The capacity never drops below the number of
+        samples the buffers hold from the last IMU_data_history_length_s, so resizing never loses shown data.
+        @param is_forced: set the capacity even when it's within IMU_DATA_CAPACITY_TOLERANCE of the current one
+            (e.g. the history length was changed), also with the last measured rate
+        """
+        snapshot = self.packet_statistics_snapshot.get()
+        window = snapshot["10s"]
+        idle_s = snapshot["session"]["idle_s"]
+        # the packets of the window came until idle_s ago, the rate is measured over the time they came in
+        window_s = window["received"] / window["packets_per_second"] if window["packets_per_second"] > 0 else 0
+        is_streaming = window_s > idle_s and idle_s <= MAX_IMU_DATA_RATE_GAP_S \
+            and window["max_ms"] <= MAX_IMU_DATA_RATE_GAP_S * 1000
+        if is_streaming:
+            self._IMU_data_rate = window["received"] / (window_s - idle_s)
+        elif not is_forced:
+            return
+
+        history_length_s = self.IMU_data_history_length_s.get()
+        capacity = max(math.ceil(self._IMU_data_rate * history_length_s),
+                       self._count_IMU_samples_since(time.time() - history_length_s))
+        capacity = min(max(capacity, MIN_IMU_DATA_CAPACITY), MAX_IMU_DATA_CAPACITY)
+        if is_forced or abs(capacity - self.IMU_data_capacity) > IMU_DATA_CAPACITY_TOLERANCE * self.IMU_data_capacity:
+            self.IMU_data_capacity = capacity
 
-        self.last_packet_time = now_ns
-
-        self.last_packet_number = packet_number
-
-    def __init__(self):
-        log.info("GLoablStore - constructor called")
@@ -1,17 +1,26 @@
-from PyQt6.QtWidgets import QWidget, QVBoxLayout, QHBoxLayout
+from PyQt6.QtCore import QTimer
+from PyQt6.QtWidgets import QWidget, QVBoxLayout, QHBoxLayout, QCheckBox, QSpinBox, QLabel
 
+from core.DeviceSession import DeviceSession
+from core.RenderScheduler import RenderScheduler
 from modules.AxisAngularVelocityControl import AxisAngularVelocityControl
-from stores.GlobalStore import State, IMU_Data_Dict, axes
+from stores.GlobalStore import axes
+from widgets.AutotuneControls import AutotuneControls
 from widgets.PIDParametersInput import PIDParametersInput
 
 
+# how often the control loop metrics are displayed
+CONTROL_LOOP_METRICS_REFRESH_INTERVAL_MS = 500
+
+
 class AngularVelocityControlTab(QWidget):
-    def __init__(self, parent):
+    def __init__(self, parent, session: DeviceSession):
         super().__init__()
         self.parent = parent
-        self.state = State.get_instance()
+        self.state = session.state
 
         self.axis_controls: dict[str, AxisAngularVelocityControl] = {}
+        self.control_loop = session.control_loop
 
         self.layout_main_vertical: QVBoxLayout = QVBoxLayout(self)
         self.layout_main_vertical.setSpacing(10)
@@ -22,7 +31,7 @@ class AngularVelocityControlTab(QWidget):
         self.layout_axis_controls: QHBoxLayout = QHBoxLayout()
 
         for axis in axes:
-            axis_controller = AxisAngularVelocityControl(axis_name=axis, parent=self)
+            axis_controller = AxisAngularVelocityControl(axis_name=axis, session=session, parent=self)
             self.axis_controls[axis] = axis_controller
             self.layout_axis_controls.addWidget(axis_controller)
 
@@ -33,9 +42,65 @@ class AngularVelocityControlTab(QWidget):
             self.state.dc_motor_values.angular_velocity_control["PIDParams"],
         ))
 
+        # ---- HOST CONTROL LOOP LAYOUT START ----
+        self.layout_control_loop = QHBoxLayout()
+
+        self.control_loop_checkbox = QCheckBox("Host closed loop control")
+        self.control_loop_checkbox.setToolTip("Control the angular velocity with a PID running on this computer")
+        self.control_loop_checkbox.toggled.connect(
+            lambda is_checked: self.control_loop.start() if is_checked else self.control_loop.stop()
+        )
+        self.layout_control_loop.addWidget(self.control_loop_checkbox)
+
+        self.layout_control_loop.addWidget(QLabel("Period [ms]:"))
+        self.control_loop_period_input = QSpinBox()
+        self.control_loop_period_input.setRange(5, 1000)
+        self.control_loop_period_input.setValue(int(self.control_loop.period_s * 1000))
+        self.control_loop_period_input.valueChanged.connect(lambda x: self.control_loop.set_period(x / 1000))
+        self.layout_control_loop.addWidget(self.control_loop_period_input)
+
+        self.control_loop_metrics_label = QLabel()
+        self.layout_control_loop.addWidget(self.control_loop_metrics_label)
+        self.layout_control_loop.addStretch()
+
+        self.layout_main_vertical.addLayout(self.layout_control_loop)
+
+        self.control_loop_metrics_timer = QTimer(self)
+        self.control_loop_metrics_timer.setInterval(CONTROL_LOOP_METRICS_REFRESH_INTERVAL_MS)
+        self.control_loop_metrics_timer.timeout.connect(self.update_control_loop_metrics)
+        self.control_loop_metrics_timer.start()
+        # ---- HOST CONTROL LOOP LAYOUT END ----
+
+        self.layout_main_vertical.addWidget(AutotuneControls(
+            self,
+            self.state.dc_motor_values.angular_velocity_control["PIDParams"],
+            self.control_loop,
+        ))
+
         self.setLayout(self.layout_main_vertical)
-        self.state.IMU_gyroscope_data.add_callback(self.update_graphs)
 
-    def update_graphs(self, IMU_angular_velocity_data: IMU_Data_Dict):
+        self.render_target = RenderScheduler.get_instance().add_target(self, self.update_graphs)
+        self.state.IMU_gyroscope_data.add_callback(lambda _: self.render_target.mark_dirty())
+
+    def update_graphs(self):
         for axis in axes:
-            self.axis_controls[axis].update_graph(IMU_angular_velocity_data[axis])
+            self.axis_controls[axis].update_graph(self.state.IMU_gyroscope_data)
+
+    def update_control_loop_metrics(self):
+        if not self.control_loop.is_running:
+            if self.control_loop.error is not None:
+                self.control_loop_metrics_label.setText(f"Stopped by an error: {self.control_loop.error}")
+            else:
+                self.control_loop_metrics_label.setText("Not running")
+            # the loop stops itself when an iteration fails
+            self.control_loop_checkbox.setChecked(False)
+            return
+
+        jitter = self.control_loop.jitter.summary()
+        compute_time = self.control_loop.compute_time.summary()
+        self.control_loop_metrics_label.setText(
+            f"{self.control_loop.iterations} iterations, {self.control_loop.deadline_misses} deadline misses, "
+            f"{self.control_loop.stale_samples} without fresh data | "
+            f"jitter p50 {jitter['p50_ms']:.2f}ms p99 {jitter['p99_ms']:.2f}ms | "
+            f"compute p50 {compute_time['p50_ms']:.2f}ms p99 {compute_time['p99_ms']:.2f}ms"
+        )
@@ -1,42 +1,128 @@
-from PyQt6.QtCore import Qt
-from PyQt6.QtWidgets import QWidget, QVBoxLayout, QLabel, QCheckBox
+import os
 
-from stores.GlobalStore import State
+from PyQt6.QtCore import Qt, QTimer
+from PyQt6.QtWidgets import QWidget, QVBoxLayout, QHBoxLayout, QLabel, QCheckBox, QSpinBox, QPushButton, QFileDialog
+
+from core.DeviceSession import DeviceSession
+from core.LatencyTracker import LatencyTracker, STAGES
+from core.RenderScheduler import RenderScheduler
+from core.RawSession import RAW_SESSION_FILE_NAME
+from core.TelemetryRecorder import TelemetryRecorder, create_recording_directory
+
+# how often the processing thread metrics are polled and displayed
+PROCESSING_METRICS_REFRESH_INTERVAL_MS = 500
 
 
 class DebugInfoTab(QWidget):
-    def __init__(self, parent):
+    def __init__(self, parent, session: DeviceSession):
         super().__init__(parent)
-        self.state = State.get_instance()
+        self.session = session
+        self.state = session.state
 
         self.layout_main = QVBoxLayout()
         self.layout_main.setAlignment(Qt.AlignmentFlag.AlignTop)
 
-        self.total_packets_read_label = QLabel("Packets recieved: 0")
-        self.layout_main.addWidget(self.total_packets_read_label)
-        self.state.total_packets_read.add_callback(
-            lambda x: self.total_packets_read_label.setText(f"Packets recieved: {x}")
-        )
+        self.packet_statistics_labels: dict[str, QLabel] = {}
+        for window in self.state.packet_statistics_snapshot.get().keys():
+            self.packet_statistics_labels[window] = QLabel(f"Packets ({window}): -")
+            self.layout_main.addWidget(self.packet_statistics_labels[window])
+        self.state.packet_statistics_snapshot.add_gui_callback(self.update_packet_statistics)
 
-        self.num_of_skipped_packets_label = QLabel("Skipped packets: 0")
-        self.layout_main.addWidget(self.num_of_skipped_packets_label)
-        self.state.skipped_packets.add_callback(
-            lambda x: self.num_of_skipped_packets_label.setText(f"Skipped packets: {x}")
-        )
+        self.processing_queue_depth_label = QLabel("Processing queue depth: 0")
+        self.layout_main.addWidget(self.processing_queue_depth_label)
 
-        self.last_data_delay_label = QLabel("Average data delay: 0ms")
-        self.layout_main.addWidget(self.last_data_delay_label)
-        self.state.average_data_delay.add_callback(
-            lambda x: self.last_data_delay_label.setText(f"Average data delay: {x}ms")
-        )
+        self.processing_batch_lag_label = QLabel("Processing batch lag: 0ms (max 0ms)")
+        self.layout_main.addWidget(self.processing_batch_lag_label)
+
+        self.binary_frames_label = QLabel("Binary frames CRC errors: 0, lost frames: 0")
+        self.layout_main.addWidget(self.binary_frames_label)
+
+        # ---- COMMANDS LAYOUT START ----
+        commands_sender = session.commands_sender
+        self.command_scheduler = commands_sender.command_scheduler
+        self.ack_tracker = commands_sender.ack_tracker
+
+        self.layout_commands_budget = QHBoxLayout()
+        self.layout_commands_budget.addWidget(QLabel("Max commands per second (0 = unlimited):"))
+        self.commands_budget_input = QSpinBox()
+        self.commands_budget_input.setRange(0, 1000)
+        self.commands_budget_input.setValue(int(self.command_scheduler.max_commands_per_second))
+        self.commands_budget_input.valueChanged.connect(self.command_scheduler.set_max_commands_per_second)
+        self.layout_commands_budget.addWidget(self.commands_budget_input)
+        self.layout_commands_budget.addStretch()
+        self.layout_main.addLayout(self.layout_commands_budget)
+
+        self.commands_label = QLabel("Commands: -")
+        self.layout_main.addWidget(self.commands_label)
+
+        self.ack_tracking_checkbox = QCheckBox("Track command acknowledgements (the firmware has to support it)")
+        self.ack_tracking_checkbox.setChecked(commands_sender.is_ack_tracking_enabled)
+        self.ack_tracking_checkbox.toggled.connect(commands_sender.set_ack_tracking)
+        self.layout_main.addWidget(self.ack_tracking_checkbox)
 
-        self.min_data_delay_label = QLabel("Min data delay: 0ms")
-        self.layout_main.addWidget(self.min_data_delay_label)
-        self.state.min_data_delay.add_callback(lambda x: self.min_data_delay_label.setText(f"Min data delay: {x}ms"))
+        self.command_round_trip_label = QLabel("Command round trip times: -")
+        self.layout_main.addWidget(self.command_round_trip_label)
+        # ---- COMMANDS LAYOUT END ----
+
+        # ---- LATENCY LAYOUT START ----
+        self.latency_tracker = LatencyTracker.get_instance()
+
+        self.layout_main.addWidget(QLabel("Latency since the data was read (p50 / p95 / p99 / max):"))
+        self.latency_labels: dict[str, QLabel] = {}
+        for stage in STAGES:
+            self.latency_labels[stage] = QLabel(f"{stage}: -")
+            self.layout_main.addWidget(self.latency_labels[stage])
+
+        self.layout_latency_buttons = QHBoxLayout()
+        self.export_latency_button = QPushButton("Export latency")
+        self.export_latency_button.clicked.connect(self.export_latency)
+        self.layout_latency_buttons.addWidget(self.export_latency_button)
+
+        self.reset_latency_button = QPushButton("Reset latency")
+        self.reset_latency_button.clicked.connect(self.latency_tracker.reset)
+        self.layout_latency_buttons.addWidget(self.reset_latency_button)
+        self.layout_latency_buttons.addStretch()
+        self.layout_main.addLayout(self.layout_latency_buttons)
+        # ---- LATENCY LAYOUT END ----
+
+        self.processing_metrics_timer = QTimer(self)
+        self.processing_metrics_timer.setInterval(PROCESSING_METRICS_REFRESH_INTERVAL_MS)
+        self.processing_metrics_timer.timeout.connect(self.update_processing_metrics)
+        self.processing_metrics_timer.start()
+
+        render_scheduler = RenderScheduler.get_instance()
+
+        self.layout_target_fps = QHBoxLayout()
+        self.layout_target_fps.addWidget(QLabel("Graphs target FPS:"))
+        self.target_fps_input = QSpinBox()
+        self.target_fps_input.setRange(1, 120)
+        self.target_fps_input.setValue(render_scheduler.target_fps)
+        self.target_fps_input.valueChanged.connect(render_scheduler.set_target_fps)
+        self.layout_target_fps.addWidget(self.target_fps_input)
+        self.layout_target_fps.addStretch()
+        self.layout_main.addLayout(self.layout_target_fps)
+
+        self.achieved_fps_label = QLabel("Graphs FPS: 0")
+        self.layout_main.addWidget(self.achieved_fps_label)
+        render_scheduler.achieved_fps.add_callback(lambda x: self.achieved_fps_label.setText(f"Graphs FPS: {x}"))
+
+        self.dropped_redraws_label = QLabel("Dropped graph redraws: 0")
+        self.layout_main.addWidget(self.dropped_redraws_label)
+        render_scheduler.dropped_redraws.add_callback(
+            lambda x: self.dropped_redraws_label.setText(f"Dropped graph redraws: {x}")
+        )
 
-        self.max_data_delay_label = QLabel("Max data delay: 0ms")
-        self.layout_main.addWidget(self.max_data_delay_label)
-        self.state.max_data_delay.add_callback(lambda x: self.max_data_delay_label.setText(f"Max data delay: {x}ms"))
+        self.layout_history_length = QHBoxLayout()
+        self.layout_history_length.addWidget(QLabel("Graphs history [s]:"))
+        self.history_length_input = QSpinBox()
+        self.history_length_input.setRange(1, 3600)
+        self.history_length_input.setValue(self.state.IMU_data_history_length_s.get())
+        self.history_length_input.valueChanged.connect(self.state.IMU_data_history_length_s.set)
+        self.layout_history_length.addWidget(self.history_length_input)
+        self.history_capacity_label = QLabel()
+        self.layout_history_length.addWidget(self.history_capacity_label)
+        self.layout_history_length.addStretch()
+        self.layout_main.addLayout(self.layout_history_length)
 
         self.is_output_raw_data_checkbox = QCheckBox("Output raw data")
         self.layout_main.addWidget(self.is_output_raw_data_checkbox)
@@ -44,4 +130,117 @@ class DebugInfoTab(QWidget):
             lambda: self.state.is_output_raw_data.set(self.is_output_raw_data_checkbox.isChecked())
         )
 
+        # ---- RECORDING LAYOUT START ----
+        self.telemetry_recorder = None
+
+        self.layout_recording = QHBoxLayout()
+        self.recording_button = QPushButton("Start recording")
+        self.recording_button.clicked.connect(self.toggle_recording)
+        self.layout_recording.addWidget(self.recording_button)
+
+        self.recording_label = QLabel("Not recording")
+        self.layout_recording.addWidget(self.recording_label)
+        self.layout_recording.addStretch()
+        self.layout_main.addLayout(self.layout_recording)
+        # ---- RECORDING LAYOUT END ----
+
         self.setLayout(self.layout_main)
+
+    def toggle_recording(self):
+        if self.telemetry_recorder is None:
+            self.telemetry_recorder = TelemetryRecorder(
+                create_recording_directory(self.session.name), store=self.state
+            )
+            self.telemetry_recorder.start()
+            # the raw data is recorded as well, so the session can be replayed
+            self.session.serial_manager.start_raw_session_recording(
+                os.path.join(self.telemetry_recorder.directory, RAW_SESSION_FILE_NAME)
+            )
+            self.recording_button.setText("Stop recording")
+        else:
+            self.session.serial_manager.stop_raw_session_recording()
+            self.telemetry_recorder.stop()
+            self.recording_label.setText(
+                f"Saved {self.telemetry_recorder.recorded_samples} samples to {self.telemetry_recorder.directory}"
+            )
+            self.telemetry_recorder = None
+            self.recording_button.setText("Start recording")
+
+    def update_packet_statistics(self, snapshot: dict[str, dict[str, float]]):
+        for window, statistics in snapshot.items():
+            self.packet_statistics_labels[window].setText(
+                f"Packets ({window}): {statistics['received']} received, {statistics['lost']} lost "
+                f"({statistics['loss_rate']:.2%}), {statistics['packets_per_second']:.1f}/s, "
+                f"interval {statistics['mean_ms']:.1f}ms ± {statistics['jitter_ms']:.1f}ms "
+                f"(min {statistics['min_ms']:.1f}ms, max {statistics['max_ms']:.1f}ms)"
+            )
+
+    def update_processing_metrics(self):
+        # keeps the packet statistics windows moving when no packets are received
+        self.state.publish_packet_statistics()
+
+        processing_thread = self.session.data_processing_thread
+        self.processing_queue_depth_label.setText(
+            f"Processing queue depth: {processing_thread.queue_depth}, "
+            f"failed batches: {processing_thread.failed_batches}"
+            + ("" if processing_thread.running else " (stopped)")
+        )
+        self.processing_batch_lag_label.setText(
+            f"Processing batch lag: {processing_thread.last_batch_lag_ms:.2f}ms "
+            f"(max {processing_thread.max_batch_lag_ms:.2f}ms)"
+        )
+
+        self.history_capacity_label.setText(
+            f"{self.state.IMU_gyroscope_data.capacity} samples (target {self.state.IMU_data_capacity})"
+        )
+
+        if self.telemetry_recorder is not None and self.telemetry_recorder.error is not None:
+            self.recording_label.setText(
+                f"Recording to {self.telemetry_recorder.directory} failed: {self.telemetry_recorder.error}"
+            )
+        elif self.telemetry_recorder is not None:
+            self.recording_label.setText(
+                f"Recording to {self.telemetry_recorder.directory}, "
+                f"{self.telemetry_recorder.dropped_samples} samples dropped"
+            )
+
+        for stage, summary in self.latency_tracker.summary().items():
+            self.latency_labels[stage].setText(
+                f"{stage}: {summary['p50_ms']:.2f} / {summary['p95_ms']:.2f} / {summary['p99_ms']:.2f} / "
+                f"{summary['max_ms']:.2f}ms ({summary['count']} samples)"
+            )
+
+        self.commands_label.setText(
+            f"Commands: {self.command_scheduler.queue_depth} queued, {self.command_scheduler.sent_commands} sent, "
+            f"{self.command_scheduler.coalesced_commands} coalesced, {self.command_scheduler.dropped_commands} dropped, "
+            f"{self.command_scheduler.failed_commands} failed"
+        )
+
+        round_trip_lines = [
+            f"Commands acknowledged: {self.ack_tracker.acknowledged_commands}, "
+            f"pending: {self.ack_tracker.pending_commands}, retried: {self.ack_tracker.retried_commands}, "
+            f"timed out: {self.ack_tracker.timed_out_commands}, superseded: {self.ack_tracker.superseded_commands}"
+        ]
+        for command_type, histogram in sorted(self.ack_tracker.round_trip_times.items()):
+            summary = histogram.summary()
+            round_trip_lines.append(
+                f"  {command_type} round trip (p50 / p95 / p99 / max): {summary['p50_ms']:.1f} / "
+                f"{summary['p95_ms']:.1f} / {summary['p99_ms']:.1f} / {summary['max_ms']:.1f}ms "
+                f"({summary['count']} commands)"
+            )
+        self.command_round_trip_label.setText("\n".join(round_trip_lines))
+
+        binary_decoder = processing_thread.binary_decoder
+        self.binary_frames_label.setText(
+            f"Binary frames CRC errors: {binary_decoder.crc_errors}, lost frames: {binary_decoder.lost_frames}, "
+            f"truncated bytes: {binary_decoder.truncated_bytes}"
+        )
+
+    def export_latency(self):
+        filename, _ = QFileDialog.getSaveFileName(
+            caption="Export latency",
+            directory=os.path.join(os.getcwd(), "latency.csv"),
+            filter="CSV (*.csv);;JSON (*.json)",
+        )
+        if filename:
+            self.latency_tracker.export(filename)
@@ -1,8 +1,12 @@
-import numpy as np
+from typing import Dict
+
 import pyqtgraph as pg
 from PyQt6.QtWidgets import QWidget, QVBoxLayout
 
-from stores.GlobalStore import State, IMU_Data_Dict, axes
+from core.DeviceSession import DeviceSession
+from core.RenderScheduler import RenderScheduler
+from stores.GlobalStore import IMUDataBuffer, Axis, axes
+from utils.plotting import set_envelope_data
 
 
 def create_plot_widget() -> pg.PlotWidget:
@@ -10,14 +14,15 @@ def create_plot_widget() -> pg.PlotWidget:
     plot.showGrid(True, True)
     plot.setBackground('transparent')
     plot.enableAutoRange('y', True)
+    plot.setLabel('bottom', 'Time', 's')
     return plot
 
 
 class RawDataGraphsTab(QWidget):
-    def __init__(self, parent):
+    def __init__(self, parent, session: DeviceSession):
         super().__init__(parent)
 
-        self.state = State.get_instance()
+        self.state = session.state
 
         self.layout_main = QVBoxLayout(self)
 
@@ -41,42 +46,52 @@ class RawDataGraphsTab(QWidget):
 
         # create a plot lines for temperature
         pen = pg.mkPen(color='cyan')
-        self.temperature_plot_line = self.temperature_plot.plot(self.state.IMU_temperature_data.data, pen=pen)
+        self.temperature_plot_line = self.temperature_plot.plot(pen=pen)
 
         self.axis_plots = {
-            self.angle_plot: self.state.IMU_angle_data.data,
-            self.acceleration_plot: self.state.IMU_acceleration_data.data,
-            self.gyroscope_plot: self.state.IMU_gyroscope_data.data,
+            self.angle_plot: self.state.IMU_angle_data,
+            self.acceleration_plot: self.state.IMU_acceleration_data,
+            self.gyroscope_plot: self.state.IMU_gyroscope_data,
         }
 
-        self.axis_plot_lines: Dict[pg.PlotWidget, Dict[Axis, pg.PlotItem]] = {}
+        self.axis_plot_lines: Dict[pg.PlotWidget, Dict[Axis, pg.PlotDataItem]] = {}
 
         for plot, data in self.axis_plots.items():
             self.axis_plot_lines[plot] = {}
-            for axis, axis_data in data.items():
+            for axis in axes:
                 pen_color = ['r', 'g', 'b'][axes.index(axis)]
                 pen = pg.mkPen(color=pen_color)
-                self.axis_plot_lines[plot][axis] = plot.plot(axis_data, pen=pen)
-
-        self.state.IMU_angle_data.add_callback(self.update_angle_plot)
-        self.state.IMU_acceleration_data.add_callback(self.update_acceleration_plot)
-        self.state.IMU_gyroscope_data.add_callback(self.update_gyroscope_plot)
-        self.state.IMU_temperature_data.add_callback(self.update_temperature_plot)
+                self.axis_plot_lines[plot][axis] = plot.plot(pen=pen)
+
+        # the plots are only marked as dirty when new data arrives, the render scheduler redraws them
+        render_scheduler = RenderScheduler.get_instance()
+        render_targets = {
+            self.state.IMU_angle_data: render_scheduler.add_target(self.angle_plot, self.update_angle_plot),
+            self.state.IMU_acceleration_data: render_scheduler.add_target(
+                self.acceleration_plot, self.update_acceleration_plot
+            ),
+            self.state.IMU_gyroscope_data: render_scheduler.add_target(self.gyroscope_plot, self.update_gyroscope_plot),
+            self.state.IMU_temperature_data: render_scheduler.add_target(
+                self.temperature_plot, self.update_temperature_plot
+            ),
+        }
+        for IMU_data, render_target in render_targets.items():
+            IMU_data.add_callback(lambda _, target=render_target: target.mark_dirty())
 
         self.setLayout(self.layout_main)
 
-    def _update_plot_lines(self, plot: pg.PlotWidget, IMU_data_dict: IMU_Data_Dict):
-        for axis, data in IMU_data_dict.items():
-            self.axis_plot_lines[plot][axis].setData(data)
+    def _update_plot_lines(self, plot: pg.PlotWidget, IMU_data: IMUDataBuffer):
+        for axis_index, axis in enumerate(axes):
+            set_envelope_data(self.axis_plot_lines[plot][axis], IMU_data, axis_index)
 
-    def update_angle_plot(self, IMU_angle_data: IMU_Data_Dict):
-        self._update_plot_lines(self.angle_plot, IMU_angle_data)
+    def update_angle_plot(self):
+        self._update_plot_lines(self.angle_plot, self.state.IMU_angle_data)
 
-    def update_acceleration_plot(self, IMU_acceleration_data: IMU_Data_Dict):
-        self._update_plot_lines(self.acceleration_plot, IMU_acceleration_data)
+    def update_acceleration_plot(self):
+        self._update_plot_lines(self.acceleration_plot, self.state.IMU_acceleration_data)
 
-    def update_gyroscope_plot(self, IMU_gyroscope_data: IMU_Data_Dict):
-        self._update_plot_lines(self.gyroscope_plot, IMU_gyroscope_data)
+    def update_gyroscope_plot(self):
+        self._update_plot_lines(self.gyroscope_plot, self.state.IMU_gyroscope_data)
 
-    def update_temperature_plot(self, IMU_temperature_data: np.ndarray):
-        self.temperature_plot_line.setData(IMU_temperature_data)
+    def update_temperature_plot(self):
+        set_envelope_data(self.temperature_plot_line, self.state.IMU_temperature_data, 0)
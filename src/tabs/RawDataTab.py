@@ -1,31 +1,28 @@
-from PyQt6.QtCore import pyqtSignal
 from PyQt6.QtWidgets import (QWidget, QVBoxLayout, QLabel,
-                             QPushButton, QPlainTextEdit, QLineEdit,
+                             QPushButton, QLineEdit,
                              QHBoxLayout)
 
+from core.DeviceSession import DeviceSession
+from widgets.RawConsoleView import RawConsoleView
 
-class ClickablePlainTextEdit(QPlainTextEdit):
-    clicked = pyqtSignal()
-
-    def mousePressEvent(self, event):
-        self.clicked.emit()
-        super().mousePressEvent(event)
+# the number of lines shown in the raw data console
+RAW_DATA_MAX_LINES = 50
 
 
 class RawDataTab(QWidget):
-    def __init__(self, parent=None):
+    def __init__(self, parent, session: DeviceSession):
         super().__init__()
         self.parent = parent
+        self.session = session
 
         # Create a layout for the raw data tab
         self.raw_data_layout = QVBoxLayout(self)
 
         # Create and add widgets to the layout
-        self.text_area = ClickablePlainTextEdit()
-        self.text_area.setReadOnly(True)
-        self.text_area.setMaximumBlockCount(50)
+        self.console = RawConsoleView(RAW_DATA_MAX_LINES, model=session.raw_console)
+        self.text_area = self.console.text_area
         self.raw_data_layout.addWidget(QLabel("Raw Data:"))
-        self.raw_data_layout.addWidget(self.text_area)
+        self.raw_data_layout.addWidget(self.console)
 
         # ------ COMMAND INPUT LAYOUT START ------
         self.command_input_layout = QHBoxLayout()
@@ -46,7 +43,7 @@ class RawDataTab(QWidget):
         # Clear button
         self.clear_button = QPushButton("Clear")
         self.raw_data_layout.addWidget(self.clear_button)
-        self.clear_button.clicked.connect(self.text_area.clear)
+        self.clear_button.clicked.connect(self.console.clear)
 
         # Set up the layout for the raw data tab
         self.setLayout(self.raw_data_layout)
@@ -58,4 +55,4 @@ class RawDataTab(QWidget):
 
         self.command_input.clear()
         # self.text_area.appendPlainText(command)
-        self.parent.serial_communication_tab.write_data(command)
+        self.session.commands_sender.send_command(command)
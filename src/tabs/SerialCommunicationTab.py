@@ -1,26 +1,29 @@
 import logging
 
-from PyQt6.QtGui import QTextCursor
 from PyQt6.QtSerialPort import QSerialPortInfo
 from PyQt6.QtWidgets import (QWidget, QVBoxLayout, QHBoxLayout,
     QComboBox, QLabel, QPushButton,
-    QPlainTextEdit)
+    QCheckBox)
 from zope.interface import implementer
 
-from core import SerialManager, ISerialDataListener
-from stores.GlobalStore import State
+from core import ISerialDataListener
+from core.DeviceSession import DeviceSession
+from widgets.RawConsoleView import RawConsoleView
+from widgets.SessionReplayControls import SessionReplayControls
 
 log = logging.getLogger()
 
 
 @implementer(ISerialDataListener)
 class SerialCommunicationTab(QWidget):
-    def __init__(self, parent=None):
+    def __init__(self, parent, session: DeviceSession):
         super().__init__()
         self.parent = parent
-        self.state = State.get_instance()
-        self.serial_manager = SerialManager.get_instance()
+        self.session = session
+        self.state = session.state
+        self.serial_manager = session.serial_manager
         self.serial_manager.add_listener(self)
+        self.raw_console = session.raw_console
 
         # Create a layout for the serial communication tab
         self.serial_layout = QVBoxLayout(self)
@@ -34,6 +37,8 @@ class SerialCommunicationTab(QWidget):
 
         # COM Port dropdown
         self.com_port_dropdown = QComboBox()
+        # editable, so a port that isn't listed (e.g. the pty of the simulator) can be typed in
+        self.com_port_dropdown.setEditable(True)
         self.serial_layout.addWidget(QLabel("COM Port:"))
         self.serial_layout.addWidget(self.com_port_dropdown)
 
@@ -84,13 +89,24 @@ class SerialCommunicationTab(QWidget):
         self.serial_layout.addWidget(self.close_button)
         self.close_button.clicked.connect(self.close_port)
 
-        # Raw data text area
-        self.text_area = QPlainTextEdit()
+        # Binary telemetry checkbox
+        self.binary_telemetry_checkbox = QCheckBox("Binary telemetry")
+        self.binary_telemetry_checkbox.setToolTip("Receive the IMU data as binary frames instead of text lines")
+        self.serial_layout.addWidget(self.binary_telemetry_checkbox)
+        self.binary_telemetry_checkbox.clicked.connect(self.set_telemetry_mode)
+
+        # Replay of recorded sessions
+        self.serial_layout.addWidget(QLabel("Replay:"))
+        self.serial_layout.addWidget(SessionReplayControls(self, self.serial_manager))
+
+        # Raw data console
+        self.console = RawConsoleView(model=self.raw_console)
+        self.text_area = self.console.text_area
         self.serial_layout.addWidget(QLabel("Received Data:"))
-        self.serial_layout.addWidget(self.text_area)
+        self.serial_layout.addWidget(self.console)
 
         self.clear_button = QPushButton("Clear")
-        self.clear_button.clicked.connect(self.text_area.clear)
+        self.clear_button.clicked.connect(self.console.clear)
         self.serial_layout.addWidget(self.clear_button)
 
         self.setLayout(self.serial_layout)
@@ -117,7 +133,7 @@ class SerialCommunicationTab(QWidget):
 
         if not port_name:
             log.debug("No port selected")
-            self.text_area.appendPlainText("No port selected")
+            self.console.append_message("No port selected")
             return
 
         # Set up serial port
@@ -128,30 +144,30 @@ class SerialCommunicationTab(QWidget):
         opened = self.serial_manager.open_port(port_name, baud_rate, data_bits, stop_bits)
 
         if opened:
-            self.text_area.clear()
-            self.text_area.appendPlainText("Port opened")
+            self.console.clear()
+            self.console.append_message("Port opened")
             self.serial_manager.start_reading()
             log.debug("Port opened: " + port_name)
         else:
-            self.text_area.appendPlainText("Port failed to open")
+            self.console.append_message("Port failed to open")
             log.debug("Failed to open serial port: " + port_name)
 
-    def update_text_area(self, text):
-        self.text_area.appendPlainText(text)
-        self.text_area.moveCursor(QTextCursor.MoveOperation.End)
-
-        self.parent.raw_data_tab.text_area.appendPlainText(text)
-        self.parent.raw_data_tab.text_area.moveCursor(QTextCursor.MoveOperation.End)
+    def set_telemetry_mode(self, is_binary_mode: bool):
+        if self.session.commands_sender.set_telemetry_mode(is_binary_mode):
+            self.console.append_message(f"Telemetry mode: {'binary' if is_binary_mode else 'text'}")
+        else:
+            self.binary_telemetry_checkbox.setChecked(not is_binary_mode)
+            self.console.append_message("Failed to change the telemetry mode")
 
     def close_port(self):
         closed = self.serial_manager.close_port()
 
         if closed:
-            self.text_area.appendPlainText("Port closed")
-            self.text_area.moveCursor(QTextCursor.MoveOperation.End)
+            self.console.append_message("Port closed")
         else:
-            self.text_area.appendPlainText("No port is open")
+            self.console.append_message("No port is open")
 
-    def on_new_line(self, line: str):
+    def on_new_lines(self, lines: list[str]):
         if self.state.is_output_raw_data.get():
-            self.update_text_area(line)
+            # the consoles show the new lines in their next frame
+            self.raw_console.add_lines(lines)
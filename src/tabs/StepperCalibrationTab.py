@@ -2,10 +2,9 @@ from PyQt6.QtCore import Qt
 from PyQt6.QtGui import QAction
 from PyQt6.QtWidgets import (QWidget, QVBoxLayout, QHBoxLayout, QLabel, QSlider, QPushButton, QLineEdit)
 
-from core.ADCSCommandsSender import ADCSCommandsSender
-from stores.GlobalStore import State
+from core.DeviceSession import DeviceSession
 from utils.saving_and_loading import save_json_data, load_json_data
-from utils.utils import create_debounce_timer, action_to_button
+from utils.qt_utils import create_debounce_timer, action_to_button
 from validators.DoubleValidator import DoubleValidator
 from validators.schemas import stepper_values_schema
 
@@ -15,10 +14,11 @@ debounce_timer_ms = 300
 
 
 class StepperCalibrationTab(QWidget):
-    def __init__(self, parent=None):
+    def __init__(self, parent, session: DeviceSession):
         super().__init__(parent=parent)
 
         self.parent = parent
+        self.session = session
 
         self.layout_main = QVBoxLayout(self)
         self.layout_main.setAlignment(Qt.AlignmentFlag.AlignTop)
@@ -29,7 +29,7 @@ class StepperCalibrationTab(QWidget):
         self.layout_stepper_controls = QHBoxLayout()
 
         for axis in axes:
-            stepper_controls = _StepperControls(axis_name=axis, parent=self)
+            stepper_controls = _StepperControls(axis_name=axis, session=session, parent=self)
             self.layout_stepper_controls.addWidget(stepper_controls)
 
         self.layout_main.addLayout(self.layout_stepper_controls)
@@ -53,26 +53,24 @@ class StepperCalibrationTab(QWidget):
 
         return toolbar
 
-    @staticmethod
-    def save_stepper_values_file():
-        save_json_data(State().stepper_values, "Save stepper values", "stepper_values.json")
+    def save_stepper_values_file(self):
+        save_json_data(self.session.state.stepper_values, "Save stepper values", "stepper_values.json")
 
-    @staticmethod
-    def open_stepper_values_file():
+    def open_stepper_values_file(self):
         data = load_json_data(stepper_values_schema, "Open stepper values")
 
-        State().stepper_values.update(data)
+        self.session.state.stepper_values.update(data)
 
 
 class _StepperControls(QWidget):
-    def __init__(self, axis_name: str, parent=None):
+    def __init__(self, axis_name: str, session: DeviceSession, parent=None):
         super().__init__(parent=parent)
 
         self.axis_name = axis_name
         self.parent = parent
-        self.ADCSCommands_sender = ADCSCommandsSender.get_instance()
+        self.ADCSCommands_sender = session.commands_sender
 
-        self.stepper_value = getattr(State.get_instance().stepper_values, axis_name)
+        self.stepper_value = getattr(session.state.stepper_values, axis_name)
 
         self.layout_main = QVBoxLayout(self)
         self.layout_main.setAlignment(Qt.AlignmentFlag.AlignTop)
@@ -1,6 +1,2 @@
-from .AngularVelocityControlTab import AngularVelocityControlTab
-from .DebugInfoTab import DebugInfoTab
-from .RawDataGraphsTab import RawDataGraphsTab
-from .RawDataTab import RawDataTab
-from .SerialCommunicationTab import SerialCommunicationTab
-from .StepperCalibrationTab import StepperCalibrationTab
+# the tabs aren't imported here, import them from their modules, so building one tab (see main.SessionTabs) doesn't
+# import the others with their dependencies (e.g. pyqtgraph)
@@ -0,0 +1,40 @@
+import time
+from typing import Optional
+
+import numpy as np
+import pyqtgraph as pg
+
+from stores.GlobalStore import IMUDataBuffer
+
+
+def set_envelope_data(curve: pg.PlotDataItem, IMU_data: IMUDataBuffer, column: int, now: Optional[float] = None):
+    """
+    Draws the min/max envelope of a column instead of all of its samples, one min and max per pixel of the visible
+    part of the plot, so the cost of drawing depends on the width of the plot, not on the length of the history.
+
+    The x is the time of the samples relative to `now` in seconds (the newest samples are at 0 and older ones scroll
+    to the left), so gaps in the data show up as gaps instead of being squeezed out.
+
+    @param now: `time.time()`, now if None
+    """
+    now = time.time() if now is None else now
+    # the processing thread keeps appending, the envelope is limited to the samples of this snapshot
+    timestamps = IMU_data.timestamps()
+    size = len(timestamps)
+
+    view_box = curve.getViewBox()
+    if view_box is None:
+        x, y = IMU_data.envelope(column, size, 0, size)
+    elif view_box.autoRangeEnabled()[0]:
+        # the view follows the data, the whole history is visible
+        x, y = IMU_data.envelope(column, max(int(view_box.width()), 1), 0, size)
+    else:
+        (x_min, x_max), _ = view_box.viewRange()
+        # one sample more on each side, so the line goes all the way to the edges
+        start = min(max(int(np.searchsorted(timestamps, now + x_min)) - 1, 0), size)
+        end = min(int(np.searchsorted(timestamps, now + x_max, "right")) + 1, size)
+        x, y = IMU_data.envelope(column, max(int(view_box.width()), 1), start, end)
+
+    # in case the buffer was resized since the snapshot, an index past it would abort the GUI
+    x = np.minimum(x.astype(np.intp), size - 1)
+    curve.setData(timestamps[x] - now, y)
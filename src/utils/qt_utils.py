@@ -0,0 +1,19 @@
+from typing import Callable
+
+from PyQt6.QtCore import QTimer
+from PyQt6.QtGui import QAction
+from PyQt6.QtWidgets import QToolButton
+
+
+def create_debounce_timer(debounce_time_ms: int, callback: Callable[[], None]) -> QTimer:
+    debounce_timer = QTimer()
+    debounce_timer.setInterval(debounce_time_ms)
+    debounce_timer.setSingleShot(True)
+    debounce_timer.timeout.connect(callback)
+    return debounce_timer
+
+
+def action_to_button(action: QAction) -> QToolButton:
+    button = QToolButton()
+    button.setDefaultAction(action)
+    return button
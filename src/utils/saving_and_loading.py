@@ -4,7 +4,6 @@ from json.decoder import JSONDecodeError
 from typing import TypeVar, Optional
 
 from PyQt6.QtWidgets import QFileDialog, QMessageBox
-from jsonschema import validate, ValidationError
 
 from utils.utils import custom_JSON_encoder
 
@@ -69,6 +68,9 @@ def load_json_data(schema, caption: str, inital_dir: str = "") -> Optional[T]:
             )
             return
 
+    # imported here so that jsonschema (slow to import) isn't imported at the startup, only when a file is opened
+    from jsonschema import validate, ValidationError
+
     try:
         validate(data, schema)
     except ValidationError as e:
@@ -0,0 +1,113 @@
+import builtins
+import importlib.util
+import logging
+import sys
+import time
+from collections import defaultdict
+
+log = logging.getLogger()
+
+# the number of the slowest modules and packages in the report
+DEFAULT_TOP_COUNT = 10
+
+
+class StartupProfile:
+    """
+    Measures the startup of the GUI: how long the imports take (like `python -X importtime`, the time of every
+    module with and without the modules it imported) and how long it takes until the window is shown.
+
+    The imports are timed by wrapping `builtins.__import__`, so only the imports after `start` are measured,
+    it has to be started at the top of main.py. Only the first import of a module is timed, the ones that
+    find it in `sys.modules` cost nothing. The wrapper is removed by `finish`.
+    """
+
+    def __init__(self):
+        self.start_time = time.perf_counter()
+        self.marks: list[tuple[str, float]] = []
+        # module name -> (time with the imported modules, time without them) in seconds
+        self.import_times: dict[str, tuple[float, float]] = {}
+        self._original_import = None
+        # the time of the imports of the modules that are being imported, the innermost one last
+        self._nested_import_times: list[float] = []
+
+    @staticmethod
+    def start() -> "StartupProfile":
+        profile = StartupProfile()
+        profile._original_import = builtins.__import__
+        builtins.__import__ = profile._timed_import
+        return profile
+
+    def _timed_import(self, name, globals=None, locals=None, fromlist=(), level=0):
+        module_name = name
+        if level > 0:
+            try:
+                module_name = importlib.util.resolve_name("." * level + name, (globals or {}).get("__package__"))
+            except (ImportError, ValueError):
+                pass
+
+        if module_name in sys.modules:
+            # `from package import module` imports the module if the package doesn't have it yet
+            module = sys.modules[module_name]
+            missing_names = [from_name for from_name in fromlist or () if from_name != "*"
+                             and not hasattr(module, from_name)]
+            if not missing_names:
+                return self._original_import(name, globals, locals, fromlist, level)
+            module_name = f"{module_name}.{missing_names[0]}"
+
+        self._nested_import_times.append(0.0)
+        start = time.perf_counter()
+        try:
+            return self._original_import(name, globals, locals, fromlist, level)
+        finally:
+            duration = time.perf_counter() - start
+            nested_duration = self._nested_import_times.pop()
+            if self._nested_import_times:
+                self._nested_import_times[-1] += duration
+            self.import_times[module_name] = (duration, duration - nested_duration)
+
+    def mark(self, name: str):
+        """
+        Records the time since the start, e.g. "window shown"
+        """
+        self.marks.append((name, time.perf_counter() - self.start_time))
+
+    def finish(self):
+        """
+        Stops timing the imports
+        """
+        if self._original_import is not None:
+            builtins.__import__ = self._original_import
+            self._original_import = None
+
+    @property
+    def total_import_time(self) -> float:
+        return sum(self_time for _, self_time in self.import_times.values())
+
+    def package_times(self) -> dict[str, float]:
+        """
+        @return: the import time of every top level package, the time of its own modules
+        """
+        package_times = defaultdict(float)
+        for module_name, (_, self_time) in self.import_times.items():
+            package_times[module_name.split(".")[0]] += self_time
+        return dict(package_times)
+
+    def report(self, top_count: int = DEFAULT_TOP_COUNT) -> str:
+        lines = [
+            ", ".join(f"{name} {duration * 1000:.0f}ms" for name, duration in self.marks)
+            + f" | import time {self.total_import_time * 1000:.0f}ms ({len(self.import_times)} modules)"
+        ]
+
+        package_times = sorted(self.package_times().items(), key=lambda item: item[1], reverse=True)
+        lines.append("  slowest packages: " + ", ".join(
+            f"{package} {duration * 1000:.1f}ms" for package, duration in package_times[:top_count]
+        ))
+
+        lines.append("  slowest modules (cumulative | self):")
+        import_times = sorted(self.import_times.items(), key=lambda item: item[1][0], reverse=True)
+        for module_name, (cumulative_time, self_time) in import_times[:top_count]:
+            lines.append(f"    {cumulative_time * 1000:7.1f}ms | {self_time * 1000:6.1f}ms  {module_name}")
+        return "\n".join(lines)
+
+    def log_report(self, top_count: int = DEFAULT_TOP_COUNT):
+        log.info("Startup: " + self.report(top_count))
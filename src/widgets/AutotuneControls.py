@@ -0,0 +1,186 @@
+import logging
+import os
+import threading
+from typing import Optional
+
+from PyQt6.QtCore import QTimer
+from PyQt6.QtWidgets import QWidget, QHBoxLayout, QPushButton, QComboBox, QLabel, QSpinBox, QDoubleSpinBox, \
+    QFileDialog
+
+from core.Autotune import StepExperiment, FOPDTModel, PIDGains, TUNING_RULES, compute_pid_gains, fit_recording
+from core.AngularVelocityControlLoop import AngularVelocityControlLoop
+from core.GuiDispatcher import GuiSubscriber
+from core.TelemetryRecorder import RecordingReader, RECORDINGS_DIR
+from stores.GlobalStore import PIDParametersData, axes
+
+log = logging.getLogger()
+
+# how often the running experiment is updated
+EXPERIMENT_UPDATE_INTERVAL_MS = 20
+
+
+class AutotuneControls(QWidget):
+    """
+    Controls for tuning the PID from a step response, see core.Autotune.
+    The step test runs live on one axis, the fit can also be done on a recording that contains the motor speeds.
+    The fit runs on a thread of its own, it can take a second.
+    """
+
+    def __init__(self, parent, PIDData: PIDParametersData, control_loop: AngularVelocityControlLoop):
+        super().__init__(parent)
+        self.PIDData = PIDData
+        self.control_loop = control_loop
+
+        self.experiment: Optional[StepExperiment] = None
+        self.model: Optional[FOPDTModel] = None
+        self.gains: Optional[PIDGains] = None
+        self.is_fitting = False
+        # the fitted model (or the error of the fit) is delivered on the GUI thread
+        self._fit_finished = GuiSubscriber(self._on_fit_finished)
+
+        self.layout_main = QHBoxLayout(self)
+        self.layout_main.setContentsMargins(0, 0, 0, 0)
+
+        self.layout_main.addWidget(QLabel("Autotune axis:"))
+        self.axis_dropdown = QComboBox()
+        self.axis_dropdown.addItems(axes)
+        self.layout_main.addWidget(self.axis_dropdown)
+
+        self.layout_main.addWidget(QLabel("Step [%]:"))
+        self.step_input = QSpinBox()
+        self.step_input.setRange(-100, 100)
+        self.step_input.setValue(30)
+        self.layout_main.addWidget(self.step_input)
+
+        self.layout_main.addWidget(QLabel("Duration [s]:"))
+        self.duration_input = QDoubleSpinBox()
+        self.duration_input.setRange(0.5, 60)
+        self.duration_input.setValue(5)
+        self.layout_main.addWidget(self.duration_input)
+
+        self.tuning_rule_dropdown = QComboBox()
+        self.tuning_rule_dropdown.addItems(TUNING_RULES)
+        self.tuning_rule_dropdown.currentTextChanged.connect(lambda _: self.update_gains())
+        self.layout_main.addWidget(self.tuning_rule_dropdown)
+
+        self.run_button = QPushButton("Run step test")
+        self.run_button.clicked.connect(self.toggle_experiment)
+        self.layout_main.addWidget(self.run_button)
+
+        self.fit_recording_button = QPushButton("Fit recording")
+        self.fit_recording_button.clicked.connect(self.open_recording)
+        self.layout_main.addWidget(self.fit_recording_button)
+
+        self.apply_button = QPushButton("Apply gains")
+        self.apply_button.setEnabled(False)
+        self.apply_button.clicked.connect(lambda: self.gains.apply(self.PIDData))
+        self.layout_main.addWidget(self.apply_button)
+
+        self.result_label = QLabel()
+        self.layout_main.addWidget(self.result_label)
+        self.layout_main.addStretch()
+
+        self.experiment_timer = QTimer(self)
+        self.experiment_timer.setInterval(EXPERIMENT_UPDATE_INTERVAL_MS)
+        self.experiment_timer.timeout.connect(self.update_experiment)
+
+        self.setLayout(self.layout_main)
+
+    def toggle_experiment(self):
+        if self.is_fitting:
+            return
+
+        if self.experiment is not None:
+            self.experiment.stop()
+            self.finish_experiment()
+            return
+
+        if self.control_loop.is_running:
+            self.result_label.setText("Stop the host control loop first")
+            return
+
+        self.experiment = StepExperiment(
+            self.axis_dropdown.currentIndex(), self.step_input.value(), step_s=self.duration_input.value(),
+            state=self.control_loop.state, commands_sender=self.control_loop.commands_sender,
+        )
+        self.experiment.start()
+        self.experiment_timer.start()
+        self.run_button.setText("Stop step test")
+
+    def update_experiment(self):
+        self.experiment.update()
+        if not self.experiment.is_finished:
+            self.result_label.setText(f"Running... {self.experiment.progress * 100:.0f}%")
+            return
+
+        self.finish_experiment()
+
+    def finish_experiment(self):
+        self.experiment_timer.stop()
+        self.run_button.setText("Run step test")
+        experiment, self.experiment = self.experiment, None
+        self.set_model(experiment.fit)
+
+    def open_recording(self):
+        if self.is_fitting:
+            return
+
+        directory = QFileDialog.getExistingDirectory(
+            caption="Open recording",
+            directory=os.path.join(os.getcwd(), RECORDINGS_DIR),
+        )
+        if not directory:
+            return
+
+        axis_index = self.axis_dropdown.currentIndex()
+        self.set_model(lambda: fit_recording(RecordingReader(directory), axis_index))
+
+    def set_model(self, fit):
+        """
+        Runs the fit on a thread, the model is set once it finishes
+        @param fit: returns the fitted model, raises ValueError if the data can't be fitted
+        """
+        self.is_fitting = True
+        self.run_button.setEnabled(False)
+        self.fit_recording_button.setEnabled(False)
+        self.apply_button.setEnabled(False)
+        self.result_label.setText("Fitting...")
+
+        def run_fit():
+            try:
+                self._fit_finished((fit(), None))
+            except Exception as e:
+                if not isinstance(e, ValueError):
+                    log.exception("Autotune fit failed")
+                self._fit_finished((None, e))
+
+        threading.Thread(target=run_fit, name="AutotuneFit", daemon=True).start()
+
+    def _on_fit_finished(self, result):
+        self.is_fitting = False
+        self.run_button.setEnabled(True)
+        self.fit_recording_button.setEnabled(True)
+
+        self.model, error = result
+        if error is not None:
+            log.warning(f"Autotune failed: {error}")
+            self.gains = None
+            self.apply_button.setEnabled(False)
+            self.result_label.setText(f"Fit failed: {error}")
+            return
+
+        log.info(f"Autotune model: {self.model}")
+        self.update_gains()
+
+    def update_gains(self):
+        if self.model is None:
+            return
+
+        try:
+            self.gains = compute_pid_gains(self.model, self.tuning_rule_dropdown.currentText())
+        except ValueError as e:
+            self.gains = None
+            self.result_label.setText(f"{self.model} | {e}")
+        else:
+            self.result_label.setText(f"{self.model} | {self.gains}")
+        self.apply_button.setEnabled(self.gains is not None)
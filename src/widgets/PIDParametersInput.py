@@ -3,7 +3,8 @@ from PyQt6.QtWidgets import QWidget, QHBoxLayout, QLabel, QLineEdit
 
 from stores.GlobalStore import PIDParametersData
 from utils.saving_and_loading import save_json_data, load_json_data
-from utils.utils import action_to_button, int_or_float_to_str
+from utils.qt_utils import action_to_button
+from utils.utils import int_or_float_to_str
 from validators import DoubleValidator
 from validators.schemas import PID_values_schema
 
@@ -0,0 +1,133 @@
+from PyQt6.QtCore import pyqtSignal
+from PyQt6.QtWidgets import QWidget, QVBoxLayout, QHBoxLayout, QPlainTextEdit, QCheckBox, QLineEdit, QLabel
+
+from core.RawConsole import RawConsole
+from core.RenderScheduler import RenderScheduler
+
+# the max number of lines shown in the console
+DEFAULT_MAX_LINES = 500
+
+
+class ClickablePlainTextEdit(QPlainTextEdit):
+    clicked = pyqtSignal()
+
+    def mousePressEvent(self, event):
+        self.clicked.emit()
+        super().mousePressEvent(event)
+
+
+class RawConsoleView(QWidget):
+    """
+    Shows the last lines of the RawConsole.
+
+    The console is redrawn by the RenderScheduler, all the lines received since the last frame are appended with a
+    single `appendPlainText` and only the last `max_lines` of them are shown. When the console is hidden or paused it
+    isn't redrawn at all, it catches up with the latest lines once it's shown again.
+
+    :param max_lines: the max number of lines shown in the console
+    :param model: the RawConsole of the session, the shared one if None
+    """
+
+    def __init__(self, max_lines: int = DEFAULT_MAX_LINES, parent=None, model=None):
+        super().__init__(parent)
+        self.model = model if model is not None else RawConsole.get_instance()
+        self.max_lines = max_lines
+        self.prefix = ""
+        self.is_searching = False
+        # the index of the next line of the model that isn't shown yet
+        self._next_index = self.model.end_index
+
+        self.layout_main = QVBoxLayout(self)
+        self.layout_main.setContentsMargins(0, 0, 0, 0)
+
+        # ---- TOOLBAR LAYOUT START ----
+        self.layout_toolbar = QHBoxLayout()
+
+        self.pause_checkbox = QCheckBox("Pause")
+        self.pause_checkbox.toggled.connect(lambda is_paused: is_paused or self.render_target.mark_dirty())
+        self.layout_toolbar.addWidget(self.pause_checkbox)
+
+        self.filter_input = QLineEdit()
+        self.filter_input.setPlaceholderText("Filter by prefix, e.g. gyro")
+        self.filter_input.textChanged.connect(self.set_filter)
+        self.layout_toolbar.addWidget(self.filter_input)
+
+        self.search_input = QLineEdit()
+        self.search_input.setPlaceholderText("Search the history...")
+        self.search_input.returnPressed.connect(self.search)
+        self.layout_toolbar.addWidget(self.search_input)
+
+        self.search_results_label = QLabel()
+        self.layout_toolbar.addWidget(self.search_results_label)
+
+        self.layout_main.addLayout(self.layout_toolbar)
+        # ---- TOOLBAR LAYOUT END ----
+
+        self.text_area = ClickablePlainTextEdit()
+        self.text_area.setReadOnly(True)
+        self.text_area.setUndoRedoEnabled(False)
+        self.text_area.setMaximumBlockCount(max_lines)
+        self.layout_main.addWidget(self.text_area)
+
+        self.setLayout(self.layout_main)
+
+        self.render_target = RenderScheduler.get_instance().add_target(self, self.render)
+        self.model.add_listener(self.render_target.mark_dirty)
+
+    def render(self):
+        if self.pause_checkbox.isChecked() or self.is_searching:
+            return
+
+        lines, self._next_index = self.model.lines_since(self._next_index, self.max_lines, self.prefix)
+        if not lines:
+            return
+
+        scrollbar = self.text_area.verticalScrollBar()
+        is_scrolled_to_end = scrollbar.value() == scrollbar.maximum()
+
+        if len(lines) >= self.max_lines:
+            # all the shown lines are replaced, there's no point in appending and then trimming them
+            self.text_area.setPlainText("\n".join(lines))
+        else:
+            self.text_area.appendPlainText("\n".join(lines))
+
+        # the console doesn't jump to the end while the user is scrolling through it
+        if is_scrolled_to_end:
+            scrollbar.setValue(scrollbar.maximum())
+
+    def reload(self):
+        """
+        Shows the last lines of the history again, e.g. after the filter was changed
+        """
+        self.text_area.clear()
+        self._next_index = self.model.start_index
+        self.render_target.mark_dirty()
+
+    def set_filter(self, prefix: str):
+        self.prefix = prefix.strip()
+        if not self.is_searching:
+            self.reload()
+
+    def search(self):
+        text = self.search_input.text()
+        if not text:
+            self.is_searching = False
+            self.search_results_label.clear()
+            self.reload()
+            return
+
+        self.is_searching = True
+        matches, num_of_matches = self.model.search(text, self.max_lines)
+        self.text_area.setPlainText("\n".join(matches))
+        self.search_results_label.setText(
+            f"{num_of_matches} matches" + (f", last {len(matches)} shown" if num_of_matches > len(matches) else "")
+        )
+
+    def append_message(self, message: str):
+        """
+        Shows a message that isn't part of the received data, e.g. that the port was opened
+        """
+        self.text_area.appendPlainText(message)
+
+    def clear(self):
+        self.text_area.clear()
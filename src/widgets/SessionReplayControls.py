@@ -0,0 +1,99 @@
+import os
+from typing import Optional
+
+from PyQt6.QtCore import Qt
+from PyQt6.QtWidgets import QWidget, QHBoxLayout, QPushButton, QComboBox, QSlider, QLabel, QFileDialog
+
+from core.RawSession import RawSession, RAW_SESSION_FILE_NAME
+from core.SessionReplayer import SessionReplayer, AS_FAST_AS_POSSIBLE
+from core.TelemetryRecorder import RECORDINGS_DIR
+
+REPLAY_SPEEDS = {
+    "0.5x": 0.5,
+    "1x": 1,
+    "2x": 2,
+    "5x": 5,
+    "10x": 10,
+    "As fast as possible": AS_FAST_AS_POSSIBLE,
+}
+
+# the seek slider position is in tenths of a second
+SEEK_SLIDER_SCALAR = 10
+
+
+class SessionReplayControls(QWidget):
+    """
+    Controls for replaying a recorded raw session through the pipeline, see SessionReplayer
+
+    :param serial_manager: the SerialManager the session is replayed through, the shared one if None
+    """
+
+    def __init__(self, parent=None, serial_manager=None):
+        super().__init__(parent)
+        self.serial_manager = serial_manager
+        self.replayer: Optional[SessionReplayer] = None
+
+        self.layout_main = QHBoxLayout(self)
+        self.layout_main.setContentsMargins(0, 0, 0, 0)
+
+        self.open_button = QPushButton("Open session")
+        self.open_button.clicked.connect(self.open_session)
+        self.layout_main.addWidget(self.open_button)
+
+        self.speed_dropdown = QComboBox()
+        self.speed_dropdown.addItems(REPLAY_SPEEDS.keys())
+        self.speed_dropdown.setCurrentText("1x")
+        self.speed_dropdown.currentTextChanged.connect(
+            lambda text: self.replayer and self.replayer.set_speed(REPLAY_SPEEDS[text])
+        )
+        self.layout_main.addWidget(self.speed_dropdown)
+
+        self.play_button = QPushButton("Play")
+        self.play_button.setEnabled(False)
+        self.play_button.clicked.connect(self.toggle_playing)
+        self.layout_main.addWidget(self.play_button)
+
+        self.seek_slider = QSlider(Qt.Orientation.Horizontal)
+        self.seek_slider.setEnabled(False)
+        self.seek_slider.sliderReleased.connect(
+            lambda: self.replayer.seek(self.seek_slider.value() / SEEK_SLIDER_SCALAR)
+        )
+        self.layout_main.addWidget(self.seek_slider)
+
+        self.position_label = QLabel("No session")
+        self.layout_main.addWidget(self.position_label)
+
+        self.setLayout(self.layout_main)
+
+    def open_session(self):
+        filename, _ = QFileDialog.getOpenFileName(
+            caption="Open session",
+            directory=os.path.join(os.getcwd(), RECORDINGS_DIR),
+            filter=f"Raw sessions ({RAW_SESSION_FILE_NAME});;Text files (*.txt);;All files (*.*)",
+        )
+        if not filename:
+            return
+
+        if self.replayer is not None:
+            self.replayer.pause()
+
+        session = RawSession.load(filename)
+        self.replayer = SessionReplayer(session, REPLAY_SPEEDS[self.speed_dropdown.currentText()], self.serial_manager)
+        self.replayer.is_playing.add_callback(lambda x: self.play_button.setText("Pause" if x else "Play"))
+        self.replayer.position_s.add_callback(self.update_position)
+
+        self.seek_slider.setRange(0, int(session.duration * SEEK_SLIDER_SCALAR))
+        self.seek_slider.setEnabled(True)
+        self.play_button.setEnabled(True)
+        self.update_position(0)
+
+    def toggle_playing(self):
+        if self.replayer.is_playing.get():
+            self.replayer.pause()
+        else:
+            self.replayer.play()
+
+    def update_position(self, position_s: float):
+        if not self.seek_slider.isSliderDown():
+            self.seek_slider.setValue(int(position_s * SEEK_SLIDER_SCALAR))
+        self.position_label.setText(f"{position_s:.1f}s / {self.replayer.session.duration:.1f}s")